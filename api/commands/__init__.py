@@ -9,6 +9,7 @@ and registered with the main Typer application.
 from .database import check_db, init_db, reset_db
 from .serve import serve
 from .shell import shell
+from .users import import_users_command
 from .version import version
 
-__all__ = ["check_db", "init_db", "reset_db", "serve", "shell", "version"]
+__all__ = ["check_db", "import_users_command", "init_db", "reset_db", "serve", "shell", "version"]
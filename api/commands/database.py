@@ -8,12 +8,18 @@ including database initialization, migration, and maintenance operations.
 import asyncio
 
 import typer
+from sqlalchemy import Connection, inspect
 from sqlmodel import text
 from typing_extensions import Annotated
 
 from api.setup.database import create_db_and_tables, engine
 
 
+def table_names(connection: Connection) -> list[str]:
+    """Names of the tables in the connected database, on any backend"""
+    return inspect(connection).get_table_names()
+
+
 def database():
     """
     Database management commands.
@@ -58,8 +64,7 @@ def init_db(
 
             async def show_table_info():
                 async with engine.begin() as conn:
-                    result = await conn.execute(text("SELECT name FROM sqlite_master WHERE type='table'"))
-                    tables = [row[0] for row in result.fetchall()]
+                    tables = await conn.run_sync(table_names)
 
                     if tables:
                         typer.echo(f"📊 Created tables: {', '.join(tables)}")
@@ -91,8 +96,7 @@ def check_db(
 
             if verbose:
                 # Get table information
-                result = await conn.execute(text("SELECT name FROM sqlite_master WHERE type='table'"))
-                tables = [row[0] for row in result.fetchall()]
+                tables = await conn.run_sync(table_names)
 
                 if tables:
                     typer.echo(f"📊 Tables found: {len(tables)}")
@@ -103,7 +107,8 @@ def check_db(
                     typer.echo("\n📈 Row counts:")
                     for table in tables:
                         try:
-                            count_result = await conn.execute(text(f"SELECT COUNT(*) FROM {table}"))  # noqa: S608
+                            quoted = conn.dialect.identifier_preparer.quote(table)
+                            count_result = await conn.execute(text(f"SELECT COUNT(*) FROM {quoted}"))  # noqa: S608
                             count = count_result.scalar()
                             typer.echo(f"  - {table}: {count} rows")
                         except Exception:
@@ -112,6 +117,9 @@ def check_db(
                     typer.echo("📊 No tables found")
 
                 # Database file info
+                if conn.dialect.name != "sqlite":
+                    typer.echo(f"🗄️  Database: {engine.url.render_as_string(hide_password=True)}")
+                    return
                 db_info_result = await conn.execute(text("PRAGMA database_list"))
                 db_info = db_info_result.fetchall()
                 for db in db_info:
@@ -0,0 +1,69 @@
+"""
+Users Command Module
+
+This module contains user management commands for the FastAPI application,
+such as importing accounts in bulk.
+"""
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import typer
+from typing_extensions import Annotated
+
+from api.services.user_import import DEFAULT_BATCH_SIZE, import_users, read_rows
+from api.setup.database import async_session_maker
+
+
+def import_users_command(
+    file: Annotated[
+        Path,
+        typer.Argument(
+            exists=True, dir_okay=False, readable=True, help="CSV (with a header row) or NDJSON (.ndjson/.jsonl) file"
+        ),
+    ],
+    batch_size: Annotated[
+        int, typer.Option("--batch-size", min=1, help="Users inserted per transaction")
+    ] = DEFAULT_BATCH_SIZE,
+    workers: Annotated[
+        int | None, typer.Option("--workers", "-w", min=1, help="Hashing processes (default: one per core)")
+    ] = None,
+    verbose: Annotated[bool, typer.Option("--verbose", "-v", help="List every row that was not imported")] = False,
+):
+    """
+    Import users from a CSV or NDJSON file.
+
+    Each row needs an email and password, and may set is_active, is_superuser
+    and is_verified. Passwords are hashed across a process pool and users are
+    inserted in batches; emails that are already registered (or repeated in
+    the file) are skipped.
+    """
+    workers = workers or os.cpu_count() or 1
+
+    async def run():
+        # Spawned rather than forked: the event loop and database threads are
+        # already running, and forking a threaded process is unsafe
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            return await import_users(read_rows(file), async_session_maker, executor, workers, batch_size)
+
+    try:
+        typer.echo(f"🔄 Importing users from {file} with {workers} hashing processes...")
+        report = asyncio.run(run())
+    except Exception as e:
+        typer.echo(f"❌ User import failed: {e!s}")
+        raise typer.Exit(1) from e
+
+    typer.echo(
+        f"✅ Imported {report.created} of {report.rows} users in {report.seconds:.1f}s "
+        f"({report.users_per_second:.0f} users/s)"
+    )
+    if report.duplicates:
+        typer.echo(f"⏭️  Skipped {report.duplicates} duplicate emails")
+    if report.invalid:
+        typer.echo(f"⚠️  Skipped {len(report.invalid)} invalid rows")
+        if verbose:
+            for line, reason in report.invalid:
+                typer.echo(f"  - line {line}: {reason}")
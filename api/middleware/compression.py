@@ -0,0 +1,365 @@
+"""
+Response compression.
+
+``CompressionMiddleware`` negotiates zstd, brotli or gzip from the request's
+``Accept-Encoding`` (zstd and brotli only when the optional ``zstandard`` /
+``brotli`` packages are installed) and compresses responses whose content
+type is on an allowlist and whose body reaches a size threshold.
+
+Fully-buffered bodies are compressed in one go. Those of responses meant to
+be served again, with an ETag or ``Cache-Control: public``, are kept in a
+small content-addressed cache per encoding, so a body that is sent again
+unchanged (a cached list page) is compressed only once; one-off bodies are
+left out so they cannot push those out.
+Streaming responses are compressed chunk by chunk and flushed after every
+chunk, so NDJSON lines still reach the client as they are produced.
+
+Strong ETags on responses that may be compressed are weakened, since the
+bytes sent then differ from the ones the tag was computed for.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import zlib
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from typing import Any, Protocol
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.services.metrics import metrics
+
+try:
+    import brotli  # pyright: ignore[reportMissingImports]
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard  # pyright: ignore[reportMissingImports]
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+DEFAULT_MINIMUM_SIZE = 500
+
+DEFAULT_COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/*",
+)
+
+# Bodies at least this large are compressed in a worker thread so the event
+# loop keeps serving other requests meanwhile
+THREAD_MINIMUM_SIZE = 128 * 1024
+
+DEFAULT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Responses whose status forbids or makes a body pointless
+_BODYLESS_STATUSES = {204, 206, 304}
+
+
+class StreamCompressor(Protocol):
+    def compress(self, chunk: bytes) -> bytes:
+        """Compress a chunk and flush it, so it can be decoded on arrival"""
+        ...
+
+    def finish(self) -> bytes:
+        """Return the end of the compressed stream"""
+        ...
+
+
+class Codec(Protocol):
+    name: str
+
+    def compress(self, body: bytes) -> bytes: ...
+
+    def stream(self) -> StreamCompressor: ...
+
+
+class _GzipStream:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class GzipCodec:
+    name = "gzip"
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def compress(self, body: bytes) -> bytes:
+        return gzip.compress(body, compresslevel=self.level, mtime=0)
+
+    def stream(self) -> StreamCompressor:
+        return _GzipStream(self.level)
+
+
+class _BrotliStream:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)  # pyright: ignore[reportOptionalMemberAccess]
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.process(chunk) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class BrotliCodec:
+    name = "br"
+
+    def __init__(self, quality: int = 4):
+        self.quality = quality
+
+    def compress(self, body: bytes) -> bytes:
+        return brotli.compress(body, quality=self.quality)  # pyright: ignore[reportOptionalMemberAccess]
+
+    def stream(self) -> StreamCompressor:
+        return _BrotliStream(self.quality)
+
+
+class _ZstdStream:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()  # pyright: ignore[reportOptionalMemberAccess]
+
+    def compress(self, chunk: bytes) -> bytes:
+        flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK  # pyright: ignore[reportOptionalMemberAccess]
+        return self._compressor.compress(chunk) + self._compressor.flush(flush_block)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class ZstdCodec:
+    name = "zstd"
+
+    def __init__(self, level: int = 3):
+        self.level = level
+
+    def compress(self, body: bytes) -> bytes:
+        return zstandard.ZstdCompressor(level=self.level).compress(body)  # pyright: ignore[reportOptionalMemberAccess]
+
+    def stream(self) -> StreamCompressor:
+        return _ZstdStream(self.level)
+
+
+def available_codecs() -> list[Codec]:
+    """Every codec this process can use, most preferred first"""
+    codecs: list[Codec] = []
+    if zstandard is not None:
+        codecs.append(ZstdCodec())
+    if brotli is not None:
+        codecs.append(BrotliCodec())
+    codecs.append(GzipCodec())
+    return codecs
+
+
+def negotiate(accept_encoding: str, codecs: Iterable[Codec]) -> Codec | None:
+    """
+    Pick a codec the client accepts.
+
+    Among the encodings with the highest q-value, the earliest in ``codecs``
+    (the server's preference) wins.
+    """
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+
+    best: Codec | None = None
+    best_quality = 0.0
+    for codec in codecs:
+        quality = accepted.get(codec.name, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = codec, quality
+    return best
+
+
+class PrecompressedCache:
+    """Compressed bodies keyed by encoding and a digest of the uncompressed body, bounded by total size."""
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[tuple[str, bytes], bytes] = OrderedDict()
+
+    @staticmethod
+    def key(encoding: str, body: bytes) -> tuple[str, bytes]:
+        return encoding, hashlib.blake2b(body, digest_size=16).digest()
+
+    def get(self, key: tuple[str, bytes]) -> bytes | None:
+        compressed = self._entries.get(key)
+        if compressed is not None:
+            self._entries.move_to_end(key)
+        return compressed
+
+    def put(self, key: tuple[str, bytes], compressed: bytes) -> None:
+        if len(compressed) > self.max_bytes or key in self._entries:
+            return
+        self._entries[key] = compressed
+        self.size += len(compressed)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+
+def _media_type_matches(content_type: str, allowed: tuple[str, ...]) -> bool:
+    media_type = content_type.partition(";")[0].strip().lower()
+    return media_type in allowed or f"{media_type.partition('/')[0]}/*" in allowed
+
+
+def _is_public(cache_control: str) -> bool:
+    return any(directive.strip().lower() == "public" for directive in cache_control.split(","))
+
+
+async def _run(fn: Callable[..., bytes], data: bytes, *args: Any) -> bytes:
+    if len(data) >= THREAD_MINIMUM_SIZE:
+        return await asyncio.to_thread(fn, data, *args)
+    return fn(data, *args)
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = DEFAULT_MINIMUM_SIZE,
+        compressible_types: tuple[str, ...] = DEFAULT_COMPRESSIBLE_TYPES,
+        codecs: list[Codec] | None = None,
+        cache: PrecompressedCache | None = None,
+    ):
+        """
+        Args:
+            app: The ASGI app to wrap
+            minimum_size: Fully-buffered bodies smaller than this are sent as-is
+            compressible_types: Media types to compress; ``type/*`` matches a
+                whole family
+            codecs: Codecs in order of preference (defaults to every available one)
+            cache: Where compressed bodies are kept for reuse (defaults to a
+                fresh ``PrecompressedCache``)
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compressible_types = compressible_types
+        self.codecs = codecs if codecs is not None else available_codecs()
+        self.cache = cache if cache is not None else PrecompressedCache()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        codec = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.codecs)
+        await _CompressionResponder(self, codec, send).run(scope, receive)
+
+
+class _CompressionResponder:
+    """Compresses one response, deciding once its headers and first body chunk are known."""
+
+    def __init__(self, middleware: CompressionMiddleware, codec: Codec | None, send: Send):
+        self.middleware = middleware
+        self.codec = codec
+        self.send = send
+        self.start_message: Message | None = None
+        self.stream: StreamCompressor | None = None
+        self.passthrough = False
+        self.cacheable = False
+
+    async def run(self, scope: Scope, receive: Receive) -> None:
+        await self.middleware.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self._on_start(message)
+            if self.passthrough:
+                await self.send(message)
+            else:
+                # Held back until the first body chunk shows how to encode it
+                self.start_message = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body: bytes = message.get("body", b"")
+        more_body: bool = message.get("more_body", False)
+
+        if self.stream is not None:
+            compressed = await _run(self.stream.compress, body) if body else b""
+            if not more_body:
+                compressed += self.stream.finish()
+            await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+            return
+
+        assert self.start_message is not None and self.codec is not None
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        if not more_body:
+            if len(body) < self.middleware.minimum_size:
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+            compressed = await self._compress_body(self.codec, body)
+            headers["content-encoding"] = self.codec.name
+            headers["content-length"] = str(len(compressed))
+            await self.send(self.start_message)
+            await self.send({"type": "http.response.body", "body": compressed})
+            return
+
+        # Streaming: the final length is unknown, so it goes out chunked
+        self.stream = self.codec.stream()
+        headers["content-encoding"] = self.codec.name
+        del headers["content-length"]
+        await self.send(self.start_message)
+        await self.send(
+            {"type": "http.response.body", "body": await _run(self.stream.compress, body), "more_body": True}
+        )
+
+    def _on_start(self, message: Message) -> None:
+        headers = MutableHeaders(raw=message["headers"])
+        compressible = (
+            message["status"] not in _BODYLESS_STATUSES
+            and "content-encoding" not in headers
+            and _media_type_matches(headers.get("content-type", ""), self.middleware.compressible_types)
+        )
+        if compressible:
+            # The representation depends on Accept-Encoding whether or not this one is compressed
+            headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/") and self.codec is not None and (compressible or message["status"] == 304):
+            # A strong tag promises identical bytes, which no longer holds once
+            # the body may be re-encoded; 304s are weakened to match the 200s
+            headers["etag"] = f"W/{etag}"
+        self.passthrough = not compressible or self.codec is None
+        self.cacheable = etag is not None or _is_public(headers.get("cache-control", ""))
+
+    async def _compress_body(self, codec: Codec, body: bytes) -> bytes:
+        if not self.cacheable:
+            return await _run(codec.compress, body)
+        cache = self.middleware.cache
+        key = cache.key(codec.name, body)
+        compressed = cache.get(key)
+        if compressed is not None:
+            metrics.incr("compression.cache_hits")
+            return compressed
+        metrics.incr("compression.cache_misses")
+        compressed = await _run(codec.compress, body)
+        cache.put(key, compressed)
+        return compressed
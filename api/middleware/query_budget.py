@@ -0,0 +1,126 @@
+"""
+Statement budgets and cancellation for requests.
+
+``QueryBudgetMiddleware`` gives every HTTP request a ``QueryBudget`` (see
+``api.services.query_budget``): each of its database statements may run for
+the route's timeout, and no longer. Routes are named by method and path as
+declared (``"GET /api/v1/posts/{post_id}"``); routes without an override get
+the default.
+
+The middleware also watches for the client going away. The app reads the
+request body through it, a message at a time; once the server reports a
+disconnect before the response was sent in full, the budget is cancelled, which
+interrupts a running SQLite statement, and the request's task is cancelled,
+which abandons any other query (asyncpg cancels it on the server) and stops
+a streaming response. Servers also report a disconnect after every complete
+response, which leaves background tasks and dependency cleanup running.
+
+The ``*_handler`` functions turn what a budget (or the pool) gives up with
+into quick answers: 504 for a statement past its budget, 503 with
+``Retry-After`` when no pooled connection came free in time.
+"""
+
+import asyncio
+from typing import Any
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.services.metrics import metrics
+from api.services.query_budget import QueryBudget, current_budget
+
+# Seconds clients are told to wait before retrying when the pool is exhausted
+POOL_RETRY_AFTER = 1
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, app: ASGIApp, statement_timeout_ms: int = 0, route_timeouts_ms: dict[str, int] | None = None):
+        """
+        Args:
+            app: The ASGI app to wrap
+            statement_timeout_ms: How long each statement may run, unless its
+                route has an override (0 for no limit)
+            route_timeouts_ms: Overrides by ``"METHOD /path"``, with the path
+                as the route declares it
+        """
+        self.app = app
+        self.statement_timeout_ms = statement_timeout_ms
+        self.route_timeouts_ms = route_timeouts_ms or {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget = QueryBudget(lambda: self.timeout(scope))
+        token = current_budget.set(budget)
+        try:
+            await _run_until_disconnect(self.app, scope, receive, send, budget)
+        finally:
+            current_budget.reset(token)
+
+    def timeout(self, scope: Scope) -> float | None:
+        """Seconds each statement of the request in ``scope`` may run, None for no limit"""
+        timeout_ms = self.statement_timeout_ms
+        # The router records the route it matched in the scope
+        if (route := scope.get("route")) is not None:
+            timeout_ms = self.route_timeouts_ms.get(f"{scope['method']} {route.path_format}", timeout_ms)
+        return timeout_ms / 1000 if timeout_ms > 0 else None
+
+
+async def _run_until_disconnect(app: ASGIApp, scope: Scope, receive: Receive, send: Send, budget: QueryBudget) -> None:
+    # A single slot, so a large body is still read only as fast as the app
+    # consumes it
+    messages: asyncio.Queue[Message] = asyncio.Queue(maxsize=1)
+    responded = False
+
+    async def send_tracked(message: Message) -> None:
+        nonlocal responded
+        if message["type"] == "http.response.body" and not message.get("more_body", False):
+            responded = True
+        await send(message)
+
+    # Tasks copy the current context, budget included
+    app_task = asyncio.ensure_future(app(scope, messages.get, send_tracked))
+
+    async def watch() -> None:
+        while (message := await receive())["type"] != "http.disconnect":
+            await messages.put(message)
+        # Once the response is complete a disconnect is the end of the request,
+        # not the client giving up on it
+        if not responded and not app_task.done():
+            metrics.incr("requests.disconnected")
+            budget.cancel()
+            app_task.cancel()
+
+    watcher = asyncio.ensure_future(watch())
+    try:
+        await app_task
+    except asyncio.CancelledError:
+        # Nobody is left to answer; anything else (the server shutting down)
+        # propagates
+        if not budget.cancelled:
+            raise
+    finally:
+        watcher.cancel()
+
+
+async def statement_timeout_handler(_request: Request, exc: Any) -> Response:
+    """A statement ran past its budget: 504"""
+    return JSONResponse({"detail": str(exc)}, status_code=504)
+
+
+async def statement_cancelled_handler(_request: Request, _exc: Any) -> Response:
+    """The client disconnected; nothing will read this"""
+    return Response(status_code=499)
+
+
+async def pool_timeout_handler(_request: Request, _exc: Any) -> Response:
+    """No pooled connection came free in time: 503, worth retrying shortly"""
+    metrics.incr("db.pool_timeouts")
+    return JSONResponse(
+        {"detail": "Database is busy, retry shortly"},
+        status_code=503,
+        headers={"Retry-After": str(POOL_RETRY_AFTER)},
+    )
@@ -1,5 +1,6 @@
 from .comment import Comment
 from .post import Post
+from .table_version import TableVersion
 from .user import User
 
-__all__ = ["Comment", "Post", "User"]
+__all__ = ["Comment", "Post", "TableVersion", "User"]
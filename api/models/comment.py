@@ -1,25 +1,33 @@
 import uuid
 from typing import TYPE_CHECKING, Optional
 
-from sqlalchemy import UUID, Column, ForeignKey, Integer, String
+from sqlalchemy import UUID, Column, ForeignKey, Index, Integer, String
 from sqlmodel import Field, Relationship, SQLModel
 
+from api.services.excerpts import EXCERPT_LENGTH
+
 if TYPE_CHECKING:
     from api.models.post import Post
     from api.models.user import User
 
 
 class Comment(SQLModel, table=True):
+    # (post_id, id) serves both post-scoped lookups and keyset pages ordered by id
+    __table_args__ = (Index("ix_comment_post_id_id", "post_id", "id"),)
+
     id: int | None = Field(default=None, primary_key=True)
     body: str = Field(max_length=10000, sa_type=String(10000))
+    # excerpt and version are maintained by the repositories, as on Post
+    excerpt: str = Field(default="", sa_type=String(EXCERPT_LENGTH), sa_column_kwargs={"server_default": ""})
     is_published: bool = Field(default=False)
+    version: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
     user_id: uuid.UUID | None = Field(
         default=None,
         sa_column=Column(UUID, ForeignKey("user.id", ondelete="CASCADE"), index=True),
     )
     post_id: int | None = Field(
         default=None,
-        sa_column=Column(Integer, ForeignKey("post.id", ondelete="CASCADE"), index=True),
+        sa_column=Column(Integer, ForeignKey("post.id", ondelete="CASCADE")),
     )
 
     # Relationships
@@ -1,8 +1,11 @@
 import uuid
 from typing import TYPE_CHECKING, List, Optional
 
+from sqlalchemy import String
 from sqlmodel import Field, Relationship, SQLModel
 
+from api.services.excerpts import EXCERPT_LENGTH
+
 if TYPE_CHECKING:
     from api.models.comment import Comment
     from api.models.user import User
@@ -12,11 +15,19 @@ class Post(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
     title: str = Field(index=True)
     body: str = Field()
+    # Derived from body by the repositories on every write
+    excerpt: str = Field(default="", sa_type=String(EXCERPT_LENGTH), sa_column_kwargs={"server_default": ""})
     is_published: bool = Field()
-    user_id: uuid.UUID | None = Field(default=None, foreign_key="user.id")
+    # Stamped by the repositories with the table's change counter on every write
+    version: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    user_id: uuid.UUID | None = Field(default=None, foreign_key="user.id", ondelete="CASCADE", index=True)
 
     # Relationships
     author: Optional["User"] = Relationship(back_populates="posts")
+    # Comments are removed by the database's ON DELETE CASCADE rather than
+    # being loaded and deleted one by one.
     comments: List["Comment"] = Relationship(
-        back_populates="post", sa_relationship_kwargs={"cascade": "all, delete-orphan"}
+        back_populates="post",
+        sa_relationship_kwargs={"cascade": "all, delete-orphan", "order_by": "Comment.id"},
+        passive_deletes=True,
     )
@@ -0,0 +1,25 @@
+from typing import Any
+
+from sqlalchemy import Connection, Table, event, insert
+from sqlmodel import Field, SQLModel
+
+
+class TableVersion(SQLModel, table=True):
+    """
+    Change counter of one table.
+
+    Repositories stamp the rows they write with a version past their table's
+    counter, and advance the counter as the transaction commits, so a version
+    read from here (or from a row) changes whenever the data behind it does.
+    """
+
+    __tablename__ = "table_version"  # pyright: ignore[reportAssignmentType]
+
+    table_name: str = Field(primary_key=True)
+    version: int = Field(default=0)
+
+
+@event.listens_for(TableVersion.__table__, "after_create")
+def _seed_table_versions(target: Table, connection: Connection, **_kw: Any) -> None:
+    # One counter per table up front, so bumping is always a plain UPDATE
+    connection.execute(insert(target), [{"table_name": name, "version": 0} for name in target.metadata.tables])
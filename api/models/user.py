@@ -18,7 +18,11 @@ class User(SQLModel, table=True):
     is_verified: bool = Field(default=False)
 
     # Relationships
-    posts: List["Post"] = Relationship(back_populates="author")
+    # Posts and comments are removed by the database's ON DELETE CASCADE
+    # rather than being loaded and deleted one by one.
+    posts: List["Post"] = Relationship(
+        back_populates="author", sa_relationship_kwargs={"cascade": "all, delete-orphan"}, passive_deletes=True
+    )
     comments: List["Comment"] = Relationship(
-        back_populates="author", sa_relationship_kwargs={"cascade": "all, delete-orphan"}
+        back_populates="author", sa_relationship_kwargs={"cascade": "all, delete-orphan"}, passive_deletes=True
     )
@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+
+from api.schemas.admin import ResponseCacheStats
+from api.services.metrics import metrics
+from api.setup.dependencies import CurrentSuperuserDep, ResponseCacheDep
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_model=dict[str, int])
+async def read_metrics(_: CurrentSuperuserDep) -> dict[str, int]:
+    return metrics.snapshot()
+
+
+@router.get("/response-cache", response_model=ResponseCacheStats)
+async def read_response_cache_stats(_: CurrentSuperuserDep, response_cache: ResponseCacheDep) -> ResponseCacheStats:
+    return await response_cache.stats()
+
+
+@router.delete("/response-cache", status_code=204)
+async def clear_response_cache(_: CurrentSuperuserDep, response_cache: ResponseCacheDep):
+    await response_cache.store.clear()
@@ -1,51 +1,153 @@
-from fastapi import APIRouter, HTTPException
+import uuid
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from sqlalchemy.exc import IntegrityError
 
 from api.models.comment import Comment
-from api.setup.dependencies import CommentsRepositoryDep, CurrentUserDep
+from api.schemas.bulk import BulkCreateResult
+from api.schemas.comment import CommentCreate, CommentRead
+from api.schemas.pagination import Page
+from api.services.bulk import bulk_openapi_extra, read_bulk_batches
+from api.services.conditional import conditional, not_modified, versioned_etag
+from api.services.pagination import build_page
+from api.services.repositories.base_repository import NotOwnerError, RecordNotFoundError
+from api.services.responses import FastJSONResponse
+from api.services.singleflight import SingleFlightRoute
+from api.services.streaming import NDJSON_MEDIA_TYPE, ndjson_response
+from api.setup.dependencies import (
+    CommentFieldsDep,
+    CommentsReaderDep,
+    CommentsRepositoryDep,
+    CommentWriterDep,
+    CurrentUserDep,
+    PageRequestDep,
+    ResponseCacheDep,
+    StreamRequestedDep,
+)
+
+router = APIRouter(route_class=SingleFlightRoute)
+
+
+@router.get(
+    "", response_model=Page[CommentRead], responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}}, tags=["comments"]
+)
+async def list_comments(
+    request: Request,
+    comments_repository: CommentsReaderDep,
+    page_request: PageRequestDep,
+    stream: StreamRequestedDep,
+    fields: CommentFieldsDep,
+    response_cache: ResponseCacheDep,
+    post_id: int | None = None,
+    user_id: uuid.UUID | None = None,
+) -> Response:
+    if stream:
+        return ndjson_response(
+            CommentRead.from_row(comment, fields)
+            async for comment in comments_repository.stream_comments(post_id=post_id, user_id=user_id, fields=fields)
+        )
+
+    etag = versioned_etag(request, *await comments_repository.table_versions(Comment))
+    if cached := not_modified(request, etag):
+        return cached
 
-router = APIRouter()
+    async def render() -> Response:
+        comments = await comments_repository.page_comments(
+            page_request.limit, page_request.after_id, post_id=post_id, user_id=user_id, fields=fields
+        )
+        page = build_page(comments, page_request)
+        return FastJSONResponse(Page(items=CommentRead.from_rows(page.items, fields), next_cursor=page.next_cursor))
 
+    return conditional(request, await response_cache.fetch(etag, render), etag)
 
-@router.get("", response_model=list[Comment], tags=["comments"])
-async def list_comments(comments_repository: CommentsRepositoryDep) -> list[Comment]:
-    comments = await comments_repository.all_comments()
-    return list(comments)
 
+@router.get("/{comment_id}", response_model=CommentRead, tags=["comments"])
+async def find_comment(comment_id: int, request: Request, comments_repository: CommentsReaderDep) -> Response:
+    if "if-none-match" in request.headers:
+        # Revalidations are decided on the comment's version, before loading it
+        version = await comments_repository.comment_version(comment_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Comment not found")
+        if cached := not_modified(request, versioned_etag(request, version)):
+            return cached
 
-@router.get("/{comment_id}", response_model=Comment, tags=["comments"])
-async def find_comment(comment_id: int, comments_repository: CommentsRepositoryDep) -> Comment:
     comment = await comments_repository.find_comment(comment_id)
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
-    return comment
+    return conditional(request, FastJSONResponse(comment), versioned_etag(request, comment.version))
 
 
-@router.post("", response_model=Comment, status_code=201, tags=["comments"])
-async def create_comment(comment: Comment, comments_repository: CommentsRepositoryDep, user: CurrentUserDep) -> Comment:
+@router.post("", response_model=CommentRead, status_code=201, tags=["comments"])
+async def create_comment(
+    comment: Comment,
+    comments_repository: CommentsRepositoryDep,
+    comment_writer: CommentWriterDep,
+    user: CurrentUserDep,
+) -> Response:
     comment.user_id = user.id
-    return await comments_repository.create_comment(comment)
+    # Checked up front, so a comment on a missing post answers 404 rather than
+    # failing its (group) commit
+    if comment.post_id is not None and not await comments_repository.post_exists(comment.post_id):
+        raise HTTPException(status_code=404, detail="Post not found")
+    try:
+        if comment_writer is not None:
+            # Groups are written on sessions of their own, so this one hands
+            # its connection back first: the writer pool may hold just one.
+            # Committing also keeps this client's reads on the primary for a while.
+            await comments_repository.commit()
+            # Answered once the group the comment was written with has committed
+            created_comment = await comment_writer.submit(comment)
+        else:
+            created_comment = await comments_repository.create_comment(comment)
+            await comments_repository.commit()
+    except IntegrityError as e:
+        # The post was deleted since the check
+        raise HTTPException(status_code=409, detail="Comment references a post that does not exist") from e
+    return FastJSONResponse(created_comment, status_code=201)
 
 
-@router.put("/{comment_id}", response_model=Comment, tags=["comments"])
+@router.post(
+    "/bulk",
+    response_model=BulkCreateResult,
+    status_code=201,
+    openapi_extra=bulk_openapi_extra(CommentCreate),
+    tags=["comments"],
+)
+async def bulk_create_comments(
+    request: Request, comments_repository: CommentsRepositoryDep, user: CurrentUserDep
+) -> BulkCreateResult:
+    ids: list[int] = []
+    try:
+        async for comments in read_bulk_batches(request, CommentCreate):
+            ids.extend(await comments_repository.bulk_create_comments(comments, user.id))
+    except IntegrityError as e:
+        raise HTTPException(status_code=409, detail="Bulk create references a post that does not exist") from e
+    await comments_repository.commit()
+    return BulkCreateResult(ids=ids)
+
+
+@router.put("/{comment_id}", response_model=CommentRead, tags=["comments"])
 async def update_comment(
     comment_id: int, comment: Comment, comments_repository: CommentsRepositoryDep, user: CurrentUserDep
-) -> Comment:
-    existing_comment = await comments_repository.find_comment(comment_id)
-    if not existing_comment:
-        raise HTTPException(status_code=404, detail="Comment not found")
-    if existing_comment.user_id != user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to update this comment")
+) -> Response:
+    try:
+        updated_comment = await comments_repository.update_owned_comment(comment_id, user.id, comment)
+    except RecordNotFoundError as e:
+        raise HTTPException(status_code=404, detail="Comment not found") from e
+    except NotOwnerError as e:
+        raise HTTPException(status_code=403, detail="Not authorized to update this comment") from e
 
-    updated_comment = await comments_repository.update_comment(comment_id, comment)
-    return updated_comment  # type: ignore
+    await comments_repository.commit()
+    return FastJSONResponse(updated_comment)
 
 
 @router.delete("/{comment_id}", status_code=204, tags=["comments"])
 async def delete_comment(comment_id: int, comments_repository: CommentsRepositoryDep, user: CurrentUserDep):
-    existing_comment = await comments_repository.find_comment(comment_id)
-    if not existing_comment:
-        raise HTTPException(status_code=404, detail="Comment not found")
-    if existing_comment.user_id != user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this comment")
+    try:
+        await comments_repository.delete_owned_comment(comment_id, user.id)
+    except RecordNotFoundError as e:
+        raise HTTPException(status_code=404, detail="Comment not found") from e
+    except NotOwnerError as e:
+        raise HTTPException(status_code=403, detail="Not authorized to delete this comment") from e
 
-    await comments_repository.delete_comment(comment_id)
+    await comments_repository.commit()
@@ -1,37 +1,151 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 
+from api.models.comment import Comment
 from api.models.post import Post
-from api.setup.dependencies import CurrentUserDep, PostsRepositoryDep
+from api.schemas.bulk import BulkCreateResult
+from api.schemas.comment import CommentRead
+from api.schemas.pagination import Page
+from api.schemas.post import PostCreate, PostRead
+from api.services.bulk import bulk_openapi_extra, read_bulk_batches
+from api.services.conditional import conditional, not_modified, versioned_etag
+from api.services.pagination import build_page
+from api.services.responses import FastJSONResponse
+from api.services.singleflight import SingleFlightRoute
+from api.services.streaming import NDJSON_MEDIA_TYPE, ndjson_response
+from api.setup.dependencies import (
+    CommentFieldsDep,
+    CommentsReaderDep,
+    CurrentUserDep,
+    PageRequestDep,
+    PostExpandDep,
+    PostFieldsDep,
+    PostsReaderDep,
+    PostsRepositoryDep,
+    RequestedIdsDep,
+    ResponseCacheDep,
+    StreamRequestedDep,
+)
 
-router = APIRouter()
+router = APIRouter(route_class=SingleFlightRoute)
 
 
-@router.get("", response_model=list[Post], tags=["posts"])
-async def list_posts(posts_repository: PostsRepositoryDep) -> list[Post]:
-    posts = await posts_repository.all_posts()
-    return list(posts)
+@router.get("", response_model=Page[PostRead], responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}}, tags=["posts"])
+async def list_posts(
+    request: Request,
+    posts_repository: PostsReaderDep,
+    page_request: PageRequestDep,
+    stream: StreamRequestedDep,
+    ids: RequestedIdsDep,
+    expand: PostExpandDep,
+    fields: PostFieldsDep,
+    response_cache: ResponseCacheDep,
+) -> Response:
+    if stream and ids is None:
+        return ndjson_response(
+            PostRead.from_post(post, expand, fields)
+            async for post in posts_repository.stream_posts(expand=expand, fields=fields)
+        )
 
+    async def render() -> Response:
+        if ids is not None:
+            posts = await posts_repository.find_posts(ids, expand=expand, fields=fields)
+            return FastJSONResponse(Page(items=PostRead.from_posts(posts, expand, fields)))
+        posts = await posts_repository.page_posts(
+            page_request.limit, page_request.after_id, expand=expand, fields=fields
+        )
+        page = build_page(posts, page_request)
+        return FastJSONResponse(
+            Page(items=PostRead.from_posts(page.items, expand, fields), next_cursor=page.next_cursor)
+        )
 
-@router.get("/{post_id}", response_model=Post, tags=["posts"])
-async def find_post(post_id: int, posts_repository: PostsRepositoryDep) -> Post:
-    post = await posts_repository.find_post(post_id)
+    # An expanded author is only the post's user_id, so it changes with the post
+    related = [Comment] if "comments" in expand else []
+    etag = versioned_etag(request, *await posts_repository.table_versions(Post, *related))
+    if cached := not_modified(request, etag):
+        return cached
+    return conditional(request, await response_cache.fetch(etag, render), etag)
+
+
+@router.get("/{post_id}", response_model=PostRead, tags=["posts"])
+async def find_post(
+    post_id: int, request: Request, posts_repository: PostsReaderDep, expand: PostExpandDep
+) -> Response:
+    related = await posts_repository.table_versions(Comment) if "comments" in expand else ()
+    if "if-none-match" in request.headers:
+        # Revalidations are decided on the post's version, before loading it
+        version = await posts_repository.post_version(post_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Post not found")
+        if cached := not_modified(request, versioned_etag(request, version, *related)):
+            return cached
+
+    post = await posts_repository.find_post(post_id, expand=expand)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
-    return post
+    return conditional(
+        request,
+        FastJSONResponse(PostRead.from_post(post, expand) if expand else post),
+        versioned_etag(request, post.version, *related),
+    )
+
+
+@router.get("/{post_id}/comments", response_model=Page[CommentRead], tags=["comments"])
+async def list_post_comments(
+    post_id: int,
+    request: Request,
+    comments_repository: CommentsReaderDep,
+    page_request: PageRequestDep,
+    fields: CommentFieldsDep,
+    response_cache: ResponseCacheDep,
+) -> Response:
+    etag = versioned_etag(request, *await comments_repository.table_versions(Comment))
+    if cached := not_modified(request, etag):
+        return cached
 
+    async def render() -> Response:
+        comments = await comments_repository.page_comments(
+            page_request.limit, page_request.after_id, post_id=post_id, fields=fields
+        )
+        page = build_page(comments, page_request)
+        return FastJSONResponse(Page(items=CommentRead.from_rows(page.items, fields), next_cursor=page.next_cursor))
 
-@router.post("", response_model=Post, status_code=201, tags=["posts"])
-async def create_post(post: Post, posts_repository: PostsRepositoryDep, user: CurrentUserDep) -> Post:
+    return conditional(request, await response_cache.fetch(etag, render), etag)
+
+
+@router.post("", response_model=PostRead, status_code=201, tags=["posts"])
+async def create_post(post: Post, posts_repository: PostsRepositoryDep, user: CurrentUserDep) -> Response:
     post.user_id = user.id
-    return await posts_repository.create_post(post)
+    created_post = await posts_repository.create_post(post)
+    await posts_repository.commit()
+    return FastJSONResponse(created_post, status_code=201)
+
+
+@router.post(
+    "/bulk",
+    response_model=BulkCreateResult,
+    status_code=201,
+    openapi_extra=bulk_openapi_extra(PostCreate),
+    tags=["posts"],
+)
+async def bulk_create_posts(
+    request: Request, posts_repository: PostsRepositoryDep, user: CurrentUserDep
+) -> BulkCreateResult:
+    ids: list[int] = []
+    async for posts in read_bulk_batches(request, PostCreate):
+        ids.extend(await posts_repository.bulk_create_posts(posts, user.id))
+    await posts_repository.commit()
+    return BulkCreateResult(ids=ids)
 
 
-@router.put("/{post_id}", response_model=Post, tags=["posts"])
-async def update_post(post_id: int, post: Post, posts_repository: PostsRepositoryDep, _user: CurrentUserDep) -> Post:
+@router.put("/{post_id}", response_model=PostRead, tags=["posts"])
+async def update_post(
+    post_id: int, post: Post, posts_repository: PostsRepositoryDep, _user: CurrentUserDep
+) -> Response:
     updated_post = await posts_repository.update_post(post_id, post)
     if not updated_post:
         raise HTTPException(status_code=404, detail="Post not found")
-    return updated_post
+    await posts_repository.commit()
+    return FastJSONResponse(updated_post)
 
 
 @router.delete("/{post_id}", status_code=204, tags=["posts"])
@@ -39,3 +153,4 @@ async def delete_post(post_id: int, posts_repository: PostsRepositoryDep, _user:
     success = await posts_repository.delete_post(post_id)
     if not success:
         raise HTTPException(status_code=404, detail="Post not found")
+    await posts_repository.commit()
@@ -6,6 +6,25 @@ These schemas define the structure and validation for data exchanged
 through the API endpoints.
 """
 
+from .admin import ResponseCacheStats
+from .bulk import BulkCreateResult
+from .comment import CommentCreate, CommentRead
+from .pagination import Page
+from .post import AuthorRead, PostCreate, PostRead
+from .sparse import SparseModel
 from .user import UserCreate, UserRead, UserUpdate
 
-__all__ = ["UserCreate", "UserRead", "UserUpdate"]
+__all__ = [
+    "AuthorRead",
+    "BulkCreateResult",
+    "CommentCreate",
+    "CommentRead",
+    "Page",
+    "PostCreate",
+    "PostRead",
+    "ResponseCacheStats",
+    "SparseModel",
+    "UserCreate",
+    "UserRead",
+    "UserUpdate",
+]
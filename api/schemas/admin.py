@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+
+
+class ResponseCacheStats(BaseModel):
+    """Schema for the state of the list response cache."""
+
+    backend: str
+    entries: int
+    bytes: int
+    max_bytes: int
+    hits: int
+    misses: int
+    hit_ratio: float
@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+
+
+class BulkCreateResult(BaseModel):
+    """Schema for the result of a bulk create request."""
+
+    ids: list[int]
@@ -0,0 +1,25 @@
+import uuid
+
+from sqlmodel import Field, SQLModel
+
+from api.schemas.sparse import SparseModel
+
+
+class CommentCreate(SQLModel):
+    """Schema for one comment in a bulk create request."""
+
+    body: str = Field(max_length=10000)
+    is_published: bool = False
+    post_id: int | None = None
+
+
+class CommentRead(SparseModel):
+    """Schema for a comment as returned by list routes."""
+
+    id: int | None = None
+    body: str | None = None
+    excerpt: str | None = None
+    is_published: bool | None = None
+    version: int | None = None
+    user_id: uuid.UUID | None = None
+    post_id: int | None = None
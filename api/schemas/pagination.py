@@ -0,0 +1,12 @@
+from typing import Generic, TypeVar
+
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    """Schema for a single page of a cursor-paginated listing."""
+
+    items: list[T]
+    next_cursor: str | None = None
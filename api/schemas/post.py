@@ -0,0 +1,59 @@
+import uuid
+from collections.abc import Sequence
+from typing import Any
+
+from sqlmodel import SQLModel
+
+from api.models.post import Post
+from api.schemas.comment import CommentRead
+from api.schemas.sparse import SparseModel
+
+
+class PostCreate(SQLModel):
+    """Schema for one post in a bulk create request."""
+
+    title: str
+    body: str
+    is_published: bool
+
+
+class AuthorRead(SQLModel):
+    """Schema for the author nested in an expanded post; post routes are public, so no email."""
+
+    id: uuid.UUID
+
+
+class PostRead(SparseModel):
+    """Schema for a post as returned by list and detail routes."""
+
+    id: int | None = None
+    title: str | None = None
+    body: str | None = None
+    excerpt: str | None = None
+    is_published: bool | None = None
+    version: int | None = None
+    user_id: uuid.UUID | None = None
+    author: AuthorRead | None = None
+    comments: list[CommentRead] | None = None
+
+    @classmethod
+    def from_post(
+        cls, post: Post, expand: frozenset[str] = frozenset(), fields: frozenset[str] | None = None
+    ) -> "PostRead":
+        """Build from a post whose ``fields`` and ``expand`` relations have been loaded"""
+        relations: dict[str, Any] = {}
+        if "author" in expand:
+            author = post.author
+            relations["author"] = AuthorRead.model_construct(id=author.id) if author else None
+        if "comments" in expand:
+            relations["comments"] = [CommentRead.from_row(comment) for comment in post.comments]
+        return cls.from_row(post, fields, **relations)
+
+    @classmethod
+    def from_posts(
+        cls, posts: Sequence[Post], expand: frozenset[str] = frozenset(), fields: frozenset[str] | None = None
+    ) -> Sequence[SQLModel]:
+        """The posts themselves when nothing is expanded or left out, otherwise read models"""
+        if not expand:
+            return cls.from_rows(posts, fields)
+        return [cls.from_post(post, expand, fields) for post in posts]
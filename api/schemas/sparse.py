@@ -0,0 +1,43 @@
+from collections.abc import Collection, Sequence
+from typing import Any, Self
+
+from pydantic import SerializerFunctionWrapHandler, model_serializer
+from sqlmodel import SQLModel
+
+
+class SparseModel(SQLModel):
+    """
+    Base for read schemas that can carry a subset of their fields.
+
+    Fields that were never set (not requested through ``fields=`` or
+    ``expand=``) are omitted from the response instead of being sent as null.
+
+    Responses that want every column skip these schemas and encode the table
+    rows themselves: pydantic-core serializes table models straight to JSON,
+    without the dump/validate/encode passes of ``response_model``.
+    """
+
+    # No return annotation: one would replace the serialization JSON schema
+    @model_serializer(mode="wrap")
+    def _omit_unset(self, handler: SerializerFunctionWrapHandler):
+        data: dict[str, Any] = handler(self)
+        return {name: value for name, value in data.items() if name in self.model_fields_set}
+
+    @classmethod
+    def from_row(cls, row: SQLModel, fields: Collection[str] | None = None, **relations: Any) -> Self:
+        """
+        Build from a table model without validating, reading only ``fields``
+        (every column when None) so columns that were not loaded are never touched.
+
+        The row was validated on write and its columns already have the schema's
+        types, so validating again would only cost time.
+        """
+        names = fields if fields is not None else type(row).model_fields
+        return cls.model_construct(**{name: getattr(row, name) for name in names}, **relations)
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[SQLModel], fields: Collection[str] | None = None) -> Sequence[SQLModel]:
+        """The rows themselves when every column is wanted, otherwise sparse read models"""
+        if fields is None:
+            return rows
+        return [cls.from_row(row, fields) for row in rows]
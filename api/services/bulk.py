@@ -0,0 +1,125 @@
+"""
+Bulk create request helpers.
+
+Bulk endpoints accept either a JSON array or an NDJSON stream
+(``Content-Type: application/x-ndjson``). Items are validated and handed
+to the repository in fixed-size batches, so one request can carry tens of
+thousands of rows without a per-row round trip.
+
+NDJSON bodies are read incrementally, a batch at a time, so their size is
+not limited. A JSON array has to be read whole before it can be parsed, so
+arrays are limited to ``BULK_JSON_MAX_BYTES`` (413 beyond it); larger
+imports are sent as NDJSON.
+"""
+
+from collections.abc import AsyncIterable, AsyncIterator
+from functools import cache
+from typing import Any, TypeVar
+
+from fastapi import HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from api.services.streaming import NDJSON_MEDIA_TYPE
+
+BULK_BATCH_SIZE = 1000
+
+# Largest JSON array body accepted, about 40,000 typical posts
+BULK_JSON_MAX_BYTES = 8 * 1024 * 1024
+
+ItemT = TypeVar("ItemT", bound=BaseModel)
+
+
+@cache
+def _batch_adapter(item_type: type[ItemT]) -> TypeAdapter[list[ItemT]]:
+    return TypeAdapter(list[item_type])
+
+
+def bulk_openapi_extra(item_type: type[BaseModel]) -> dict[str, Any]:
+    """Describe a bulk request body for the OpenAPI schema"""
+    item_schema = item_type.model_json_schema()
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"type": "array", "items": item_schema}},
+                NDJSON_MEDIA_TYPE: {"schema": item_schema},
+            },
+        }
+    }
+
+
+def _validate_batch(adapter: TypeAdapter[list[ItemT]], payload: bytes, offset: int) -> list[ItemT]:
+    try:
+        return adapter.validate_json(payload)
+    except ValidationError as e:
+        # Report item positions relative to the whole request, not the batch
+        errors: list[dict[str, Any]] = []
+        for error in e.errors(include_url=False):
+            loc = error["loc"]
+            if loc and isinstance(loc[0], int):
+                loc = (loc[0] + offset, *loc[1:])
+            errors.append({**error, "loc": ("body", *loc)})
+        raise RequestValidationError(errors) from e
+
+
+async def _ndjson_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+async def _read_json_body(request: Request, max_bytes: int) -> bytes:
+    too_large = HTTPException(
+        status_code=413, detail=f"JSON array bodies are limited to {max_bytes} bytes; send larger imports as NDJSON"
+    )
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_bytes:
+        raise too_large
+    # Counted as it arrives, so an oversized body is never held in full
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise too_large
+    return bytes(body)
+
+
+async def read_bulk_batches(
+    request: Request,
+    item_type: type[ItemT],
+    batch_size: int = BULK_BATCH_SIZE,
+    max_json_bytes: int = BULK_JSON_MAX_BYTES,
+) -> AsyncIterator[list[ItemT]]:
+    """
+    Validate a bulk request body and yield its items in batches.
+
+    Raises:
+        RequestValidationError: If any item is invalid (FastAPI answers 422)
+        HTTPException: 413 if a JSON array body is over ``max_json_bytes``
+    """
+    adapter = _batch_adapter(item_type)
+
+    if request.headers.get("content-type", "").startswith(NDJSON_MEDIA_TYPE):
+        lines: list[bytes] = []
+        offset = 0
+        async for line in _ndjson_lines(request.stream()):
+            lines.append(line)
+            if len(lines) >= batch_size:
+                # Joining the lines into one array validates the batch in a single call
+                yield _validate_batch(adapter, b"[" + b",".join(lines) + b"]", offset)
+                offset += len(lines)
+                lines.clear()
+        if lines:
+            yield _validate_batch(adapter, b"[" + b",".join(lines) + b"]", offset)
+        return
+
+    items = _validate_batch(adapter, await _read_json_body(request, max_json_bytes), 0)
+    for start in range(0, len(items), batch_size):
+        yield items[start : start + batch_size]
@@ -0,0 +1,85 @@
+"""
+Conditional GETs.
+
+Read routes tag their responses with a strong ETag and answer
+``If-None-Match`` revalidations with ``304 Not Modified``. Where possible the
+tag is derived from change counters (a row's ``version`` or a table's counter,
+see ``BaseRepository.mark_changed``), which are read before the data so the
+304 is decided without loading or encoding the body. Representations that
+include data without a counter are tagged by a digest of their encoded body
+instead, which still saves the transfer.
+
+Responses are ``no-cache``: clients and shared caches may keep them but must
+revalidate on every use. Responses to requests that carry credentials are
+``private`` and vary on them, so a shared cache never stores them and a
+browser does not reuse one session's copy for another.
+"""
+
+import hashlib
+
+from fastapi import Request, Response
+
+from api.services.metrics import metrics
+from api.services.singleflight import normalized_query
+
+_CREDENTIAL_HEADERS = ("authorization", "cookie")
+
+
+def make_etag(*parts: object) -> str:
+    """A strong ETag identifying the representation described by ``parts``"""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def versioned_etag(request: Request, *versions: int) -> str:
+    """An ETag for a route's response, from its path, normalised query and the versions of what it reads"""
+    return make_etag(request.url.path, normalized_query(request), *versions)
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Whether an ``If-None-Match`` header matches ``etag``.
+
+    Uses the weak comparison ``If-None-Match`` calls for, so a tag weakened on
+    the way (e.g. by compression) still matches.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in tags
+
+
+def cache_headers(request: Request, etag: str) -> dict[str, str]:
+    """ETag, Cache-Control and Vary headers for a response to ``request``"""
+    if any(header in request.headers for header in _CREDENTIAL_HEADERS):
+        return {"etag": etag, "cache-control": "private, no-cache", "vary": "Authorization, Cookie"}
+    return {"etag": etag, "cache-control": "public, no-cache"}
+
+
+def not_modified(request: Request, etag: str) -> Response | None:
+    """A 304 response if the client already holds the representation tagged ``etag``, otherwise None"""
+    if not etag_matches(request.headers.get("if-none-match"), etag):
+        return None
+    metrics.incr("conditional.not_modified")
+    return Response(status_code=304, headers=cache_headers(request, etag))
+
+
+def conditional(request: Request, response: Response, etag: str | None = None) -> Response:
+    """
+    Add the caching headers to a full response.
+
+    Without an ``etag`` the response is tagged by a digest of its body, and a
+    revalidation matching that tag is answered with 304 instead.
+    """
+    if etag is None:
+        etag = f'"{hashlib.blake2b(response.body, digest_size=12).hexdigest()}"'
+        if cached := not_modified(request, etag):
+            return cached
+    for name, value in cache_headers(request, etag).items():
+        if name == "vary":
+            response.headers.add_vary_header(value)
+        else:
+            response.headers[name] = value
+    return response
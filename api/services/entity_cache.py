@@ -0,0 +1,118 @@
+"""
+In-process read-through cache for single-entity lookups.
+
+Detail routes look the same rows up over and over. An ``EntityCache`` keeps
+recently read rows by primary key, including "no such row" answers (for a
+shorter time), in a bounded LRU whose entries also expire after a TTL.
+
+Entries are snapshots of the row's columns, never the ORM object itself:
+every hit builds a fresh, session-less model, so a caller mutating what it
+got back cannot change what the next caller sees.
+
+Repositories invalidate the keys they write when they write them and again
+once the unit of work commits. A load that overlaps an invalidation is not
+stored, so a read that raced a write cannot put the old row back. Other
+worker processes are not told about writes; the TTL bounds how stale their
+copies can get.
+"""
+
+import time
+from collections import OrderedDict, defaultdict
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any, Generic, TypeVar
+from weakref import WeakSet
+
+from sqlalchemy import inspect
+from sqlmodel import SQLModel
+
+from api.services.metrics import metrics
+
+ModelT = TypeVar("ModelT", bound=SQLModel)
+
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_TTL = 30.0
+DEFAULT_NEGATIVE_TTL = 5.0
+
+# Live caches by table name, so writes to a table can find the caches to invalidate
+_caches: defaultdict[str, "WeakSet[EntityCache[Any]]"] = defaultdict(WeakSet)
+
+
+def caches_for(table_name: str) -> list["EntityCache[Any]"]:
+    """Every live entity cache of a table's rows"""
+    return list(_caches.get(table_name, ()))
+
+
+class EntityCache(Generic[ModelT]):
+    """Bounded LRU/TTL cache of rows of one model, keyed by primary key."""
+
+    def __init__(
+        self,
+        model: type[ModelT],
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: float = DEFAULT_TTL,
+        negative_ttl: float = DEFAULT_NEGATIVE_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            model: The table model cached; writes to its table through any
+                repository invalidate the cache
+            max_entries: Entries kept before the least recently used is evicted
+            ttl: Seconds a row is served from the cache
+            negative_ttl: Seconds a missing row is remembered as missing
+            clock: Monotonic time source, replaceable in tests
+        """
+        self.model = model
+        self.name = f"{inspect(model).local_table.name}_cache"
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._clock = clock
+        # key -> (expires at, column snapshot or None for a missing row)
+        self._entries: OrderedDict[Hashable, tuple[float, dict[str, Any] | None]] = OrderedDict()
+        self._generation = 0
+        _caches[inspect(model).local_table.name].add(self)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get_or_load(self, key: Hashable, load: Callable[[], Awaitable[ModelT | None]]) -> ModelT | None:
+        """Return the cached row for ``key``, calling ``load`` and caching its result on a miss"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, snapshot = entry
+            if expires_at > self._clock():
+                self._entries.move_to_end(key)
+                metrics.incr(f"{self.name}.hits")
+                return None if snapshot is None else self.model.model_validate(snapshot)
+            del self._entries[key]
+            metrics.incr(f"{self.name}.expirations")
+
+        metrics.incr(f"{self.name}.misses")
+        generation = self._generation
+        row = await load()
+        if generation == self._generation:
+            self._store(key, row)
+        return row
+
+    def invalidate(self, *keys: Hashable) -> None:
+        """Forget ``keys``, and keep loads already in flight from storing what they read"""
+        self._generation += 1
+        for key in keys:
+            self._entries.pop(key, None)
+        metrics.incr(f"{self.name}.invalidations", len(keys))
+
+    def clear(self) -> None:
+        """Forget every entry"""
+        self._generation += 1
+        self._entries.clear()
+
+    def _store(self, key: Hashable, row: ModelT | None) -> None:
+        if row is None:
+            self._entries[key] = (self._clock() + self.negative_ttl, None)
+        else:
+            self._entries[key] = (self._clock() + self.ttl, row.model_dump())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            metrics.incr(f"{self.name}.evictions")
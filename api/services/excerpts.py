@@ -0,0 +1,39 @@
+"""
+Precomputed excerpts for list views.
+
+Posts and comments store a short plain-text excerpt of their body alongside
+it, so listings can show a preview without reading or sending bodies of up
+to 10,000 characters. Repositories refresh the excerpt on every write that
+sets a body.
+"""
+
+from sqlmodel import SQLModel
+
+EXCERPT_LENGTH = 200
+
+_ELLIPSIS = "…"
+
+
+def make_excerpt(body: str, length: int = EXCERPT_LENGTH) -> str:
+    """Collapse whitespace and cut ``body`` to at most ``length`` characters on a word boundary"""
+    text = " ".join(body.split())
+    if len(text) <= length:
+        return text
+    cut = text[: length - len(_ELLIPSIS)]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut.rstrip() + _ELLIPSIS
+
+
+def refresh_excerpt(update_data: SQLModel, exclude: set[str]) -> set[str]:
+    """
+    Recompute the excerpt of partial update data that sets a body.
+
+    Returns the fields to exclude from the update: ``exclude`` itself, plus
+    ``excerpt`` when the body is unchanged so a client-supplied excerpt is
+    never written.
+    """
+    if "body" not in update_data.model_fields_set:
+        return exclude | {"excerpt"}
+    update_data.excerpt = make_excerpt(update_data.body)  # pyright: ignore[reportAttributeAccessIssue]
+    return exclude
@@ -0,0 +1,120 @@
+"""
+Group commit for small, frequent inserts.
+
+Every insert committed on its own pays for a transaction and a disk sync.
+A ``GroupCommitter`` instead holds each submitted item for a short window
+(or until enough items arrived), writes the whole group with one call to
+its commit function, in one transaction, and then resolves every caller
+with its own result. While a group is being committed the next one keeps
+filling, so groups grow as the disk slows down.
+
+Callers are only answered once their group has committed, so a client
+never sees a write that could still be lost. If a group fails, its items
+are retried one by one, so one bad row (say, a missing foreign key) fails
+only its own caller.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Sequence
+from typing import Generic, TypeVar
+
+from api.services.metrics import metrics
+
+ItemT = TypeVar("ItemT")
+ResultT = TypeVar("ResultT")
+
+
+class GroupCommitter(Generic[ItemT, ResultT]):
+    """Merge concurrently submitted items into shared transactions."""
+
+    def __init__(
+        self,
+        commit_fn: Callable[[Sequence[ItemT]], Awaitable[Sequence[ResultT]]],
+        window: float,
+        max_items: int,
+        name: str = "group_commit",
+    ):
+        """
+        Args:
+            commit_fn: Writes and commits many items in one transaction,
+                returning one result per item in input order
+            window: Seconds the first item of a group waits for others
+            max_items: Items that end the window early, and the most
+                committed in one call
+            name: Prefix of the metrics recorded
+        """
+        self._commit_fn = commit_fn
+        self.window = window
+        self.max_items = max_items
+        self.name = name
+        self._pending: list[tuple[ItemT, asyncio.Future[ResultT]]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._committing = False
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def submit(self, item: ItemT) -> ResultT:
+        """Commit ``item`` together with the items submitted around it, and return its result"""
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[ResultT] = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_items:
+            self._dispatch()
+        elif self._timer is None and not self._committing:
+            self._timer = loop.call_later(self.window, self._dispatch)
+        return await future
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._committing:
+            # The running commit loop picks the pending items up when it is done
+            return
+        self._committing = True
+        task = asyncio.ensure_future(self._commit_pending())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _commit_pending(self) -> None:
+        try:
+            while self._pending:
+                group, self._pending = self._pending[: self.max_items], self._pending[self.max_items :]
+                # Callers that gave up before their group was written are left out
+                group = [(item, future) for item, future in group if not future.done()]
+                if group:
+                    await self._commit_group(group)
+        finally:
+            self._committing = False
+
+    async def _commit_group(self, group: list[tuple[ItemT, asyncio.Future[ResultT]]]) -> None:
+        metrics.incr(f"{self.name}.groups")
+        metrics.incr(f"{self.name}.items", len(group))
+        try:
+            results = await self._commit_fn([item for item, _ in group])
+        except Exception as e:
+            if len(group) == 1:
+                _set_exception(group[0][1], e)
+                return
+            metrics.incr(f"{self.name}.fallbacks")
+            for item, future in group:
+                try:
+                    (result,) = await self._commit_fn([item])
+                except Exception as item_error:
+                    _set_exception(future, item_error)
+                else:
+                    _set_result(future, result)
+            return
+
+        for (_, future), result in zip(group, results, strict=True):
+            _set_result(future, result)
+
+
+# Callers cancelled meanwhile are no longer waiting for their outcome
+def _set_result(future: asyncio.Future[ResultT], result: ResultT) -> None:
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future: asyncio.Future[ResultT], exception: Exception) -> None:
+    if not future.done():
+        future.set_exception(exception)
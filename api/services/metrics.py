@@ -0,0 +1,36 @@
+"""
+In-process counters for the performance layers.
+
+Caches, coalescing and pools record hits, misses and similar events here so
+they can be inspected through the admin metrics endpoint. Counters are per
+process and reset on restart; they are meant for quick diagnosis, not as a
+replacement for a real metrics backend.
+"""
+
+from collections import Counter
+
+
+class Metrics:
+    """A named set of monotonically increasing counters."""
+
+    def __init__(self):
+        self._counters: Counter[str] = Counter()
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        """Increase the counter ``name`` by ``amount``"""
+        self._counters[name] += amount
+
+    def get(self, name: str) -> int:
+        """Return the current value of a counter (0 if never incremented)"""
+        return self._counters[name]
+
+    def snapshot(self) -> dict[str, int]:
+        """Return a copy of every counter, sorted by name"""
+        return dict(sorted(self._counters.items()))
+
+    def reset(self) -> None:
+        """Drop every counter"""
+        self._counters.clear()
+
+
+metrics = Metrics()
@@ -0,0 +1,71 @@
+"""
+Keyset (cursor) pagination helpers.
+
+Pages are addressed by an opaque cursor that encodes the ``id`` of the last
+row on the previous page, so fetching the next page is an index seek
+(``WHERE id > :last_id ORDER BY id LIMIT :n``) rather than an OFFSET scan.
+"""
+
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any, Protocol, TypeVar
+
+from api.schemas.pagination import Page
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+class _HasId(Protocol):
+    id: Any
+
+
+RowT = TypeVar("RowT", bound=_HasId)
+
+
+@dataclass(frozen=True)
+class PageRequest:
+    """A decoded page request: the page size and the id to seek past."""
+
+    limit: int = DEFAULT_PAGE_SIZE
+    after_id: int | None = None
+
+
+def encode_cursor(last_id: int) -> str:
+    """Encode the id of the last row on a page as an opaque cursor"""
+    payload = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Decode a cursor produced by ``encode_cursor`` back into a row id"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        last_id = payload["id"]
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError) as e:
+        raise InvalidCursorError("Invalid pagination cursor") from e
+
+    if not isinstance(last_id, int) or isinstance(last_id, bool):
+        raise InvalidCursorError("Invalid pagination cursor")
+    return last_id
+
+
+def build_page(rows: Sequence[RowT], page_request: PageRequest) -> "Page[RowT]":
+    """
+    Build a response page from rows fetched with ``limit + 1``.
+
+    The extra row only signals that another page exists; it is dropped from
+    the response and the cursor points at the last row that is returned.
+    """
+    items = list(rows[: page_request.limit])
+    has_more = len(rows) > page_request.limit
+    next_cursor = encode_cursor(items[-1].id) if has_more and items else None
+    return Page(items=items, next_cursor=next_cursor)
@@ -0,0 +1,73 @@
+"""
+Bounded thread pool for password hashing.
+
+argon2 and bcrypt take tens of milliseconds per call by design. Run inline,
+every login, registration or password change stalls the event loop and
+every other request on the worker with it. ``UserManager`` sends those calls
+to a ``PasswordPool`` instead. Both hashers release the GIL while they work,
+so threads are enough; the pool size caps how many hashes run at once, and
+further calls queue for a free thread.
+
+Calls, queued calls and time spent waiting for and running on a thread are
+recorded in the admin metrics under ``password_pool.*``.
+"""
+
+import asyncio
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypeVar
+
+from fastapi_users.password import PasswordHelper
+
+from api.services.metrics import metrics
+
+ResultT = TypeVar("ResultT")
+
+
+class PasswordPool:
+    """Run password helper calls on at most ``max_workers`` threads."""
+
+    def __init__(self, max_workers: int):
+        """
+        Args:
+            max_workers: Hashes run at once; 0 runs them inline on the event loop
+        """
+        self.max_workers = max_workers
+        self.in_flight = 0
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="password") if max_workers > 0 else None
+
+    async def run(self, fn: Callable[..., ResultT], *args: object) -> ResultT:
+        """Call ``fn(*args)`` on a pool thread and wait for the result"""
+        metrics.incr("password_pool.calls")
+        if self._executor is None:
+            return fn(*args)
+
+        if self.in_flight >= self.max_workers:
+            metrics.incr("password_pool.queued")
+        submitted = time.perf_counter()
+
+        def timed() -> tuple[float, float, ResultT]:
+            started = time.perf_counter()
+            result = fn(*args)
+            return started, time.perf_counter(), result
+
+        self.in_flight += 1
+        try:
+            started, finished, result = await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            self.in_flight -= 1
+        metrics.incr("password_pool.wait_ms", round((started - submitted) * 1000))
+        metrics.incr("password_pool.run_ms", round((finished - started) * 1000))
+        return result
+
+
+def hash_passwords(passwords: list[str]) -> list[str]:
+    """
+    Hash ``passwords`` with the default fastapi-users helper.
+
+    Importable by process pool workers without loading the application, for
+    bulk jobs that hash across every core.
+    """
+    helper = PasswordHelper()
+    return [helper.hash(password) for password in passwords]
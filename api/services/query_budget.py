@@ -0,0 +1,186 @@
+"""
+Per-request budgets for database statements.
+
+Each HTTP request gets a ``QueryBudget`` (see
+``api.middleware.query_budget``): how long any one of its statements may
+run, and whether the client has gone away. The database engines read the
+current request's budget whenever they run a statement:
+
+* SQLite connections check it from a progress handler every few thousand
+  virtual machine steps, and interrupt the statement once it is over time
+  or the request was abandoned;
+* Postgres transactions get the budget as their ``statement_timeout``.
+
+Either way the statement fails with ``StatementTimeoutError`` (or
+``StatementCancelledError`` once the client disconnected). Statements run
+outside a request, such as CLI commands and migrations, have no budget.
+A streamed statement is timed until its first row only, as it then runs for
+as long as the client keeps reading, but is cancelled when it disconnects.
+"""
+
+import time
+from collections.abc import Callable
+from contextvars import ContextVar
+from functools import cached_property
+from typing import Any
+
+from sqlalchemy import Connection, event
+from sqlalchemy.engine import ExceptionContext
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.util import await_only
+
+from api.services.metrics import metrics
+
+# SQLite virtual machine steps between checks of the budget: a few
+# microseconds of work, so checks cost well under a percent
+SQLITE_PROGRESS_STEPS = 1000
+
+# Postgres' code for a statement cancelled by its timeout (or a cancel request)
+_QUERY_CANCELED = "57014"
+
+
+class StatementTimeoutError(Exception):
+    """Raised when a statement runs past its request's budget."""
+
+
+class StatementCancelledError(Exception):
+    """Raised when a statement is interrupted because its request's client disconnected."""
+
+
+class QueryBudget:
+    """How long each statement of one request may run, and whether the request was abandoned."""
+
+    def __init__(self, timeout: Callable[[], float | None]):
+        """
+        Args:
+            timeout: Returns the seconds each statement may run (None for no
+                limit). Called once, at the first statement, so it can depend
+                on the route the request was matched to.
+        """
+        self._timeout = timeout
+        self.cancelled = False
+
+    @cached_property
+    def timeout(self) -> float | None:
+        return self._timeout()
+
+    def cancel(self) -> None:
+        """Interrupt the request's running statement and fail any later ones"""
+        self.cancelled = True
+
+
+# The budget of the request being handled, if any
+current_budget: ContextVar[QueryBudget | None] = ContextVar("current_budget", default=None)
+
+
+def enable_statement_budgets(async_engine: AsyncEngine, server_timeout_ms: int = 0) -> None:
+    """
+    Hold statements on ``async_engine`` to the current request's budget.
+
+    Args:
+        async_engine: A SQLite (aiosqlite) or Postgres engine; other
+            databases only get their errors translated
+        server_timeout_ms: The ``statement_timeout`` Postgres connections
+            already have (0 for none); transactions of requests whose
+            budget matches it skip setting their own
+    """
+    sync_engine = async_engine.sync_engine
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _watch_sqlite_statements)
+        event.listen(sync_engine, "before_cursor_execute", _start_statement)
+        event.listen(sync_engine, "after_cursor_execute", _end_statement)
+        event.listen(sync_engine, "checkin", _forget_budget)
+    elif sync_engine.dialect.name == "postgresql":
+
+        def set_statement_timeout(connection: Connection) -> None:
+            budget = current_budget.get()
+            if budget is None:
+                return
+            timeout_ms = round(budget.timeout * 1000) if budget.timeout else 0
+            if timeout_ms != server_timeout_ms:
+                connection.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+
+        event.listen(sync_engine, "begin", set_statement_timeout)
+    event.listen(sync_engine, "handle_error", _translate_error)
+
+
+class _StatementWatch:
+    """The budget of the statement a SQLite connection is running, checked by its progress handler."""
+
+    __slots__ = ("budget", "deadline")
+
+    def __init__(self):
+        self.budget: QueryBudget | None = None
+        self.deadline: float | None = None
+
+    def __call__(self) -> bool:
+        # Returning true interrupts the statement
+        budget = self.budget
+        if budget is None:
+            return False
+        return budget.cancelled or (self.deadline is not None and time.monotonic() >= self.deadline)
+
+
+_WATCH_KEY = "statement_watch"
+
+
+def _watch_sqlite_statements(dbapi_connection: Any, connection_record: Any) -> None:
+    watch = connection_record.info[_WATCH_KEY] = _StatementWatch()
+    # The handler runs on aiosqlite's thread, inside the statement
+    await_only(dbapi_connection.driver_connection.set_progress_handler(watch, SQLITE_PROGRESS_STEPS))
+
+
+def _streaming(context: Any) -> bool:
+    return context is not None and bool(
+        context.execution_options.get("stream_results") or context.execution_options.get("yield_per")
+    )
+
+
+def _start_statement(
+    conn: Connection, _cursor: Any, _statement: Any, _parameters: Any, context: Any, _executemany: bool
+) -> None:
+    if (watch := conn.connection.info.get(_WATCH_KEY)) is None:
+        return
+    budget = watch.budget = current_budget.get()
+    if budget is None or budget.timeout is None:
+        watch.deadline = None
+    else:
+        watch.deadline = time.monotonic() + budget.timeout
+
+
+def _end_statement(
+    conn: Connection, _cursor: Any, _statement: Any, _parameters: Any, context: Any, _executemany: bool
+) -> None:
+    if (watch := conn.connection.info.get(_WATCH_KEY)) is None:
+        return
+    # Buffered rows have all been fetched by now. A stream keeps fetching
+    # from the cursor for as long as the client reads, so only its first row
+    # is timed, but it stays cancellable until the connection is returned.
+    watch.deadline = None
+    if not _streaming(context):
+        watch.budget = None
+
+
+def _forget_budget(_dbapi_connection: Any, connection_record: Any) -> None:
+    if (watch := connection_record.info.get(_WATCH_KEY)) is not None:
+        watch.budget = watch.deadline = None
+
+
+def _translate_error(context: ExceptionContext) -> Exception | None:
+    budget = current_budget.get()
+    if budget is None:
+        return None
+    error = context.original_exception
+    if context.dialect.name == "sqlite":
+        exceeded = "interrupted" in str(error)
+    else:
+        exceeded = getattr(error, "sqlstate", None) == _QUERY_CANCELED
+    if not exceeded:
+        return None
+    if budget.cancelled:
+        metrics.incr("db.statement_cancellations")
+        return StatementCancelledError("Statement interrupted: the client disconnected")
+    if budget.timeout is None:
+        return None
+    metrics.incr("db.statement_timeouts")
+    return StatementTimeoutError(f"Statement ran past its {budget.timeout:g}s budget")
@@ -0,0 +1,126 @@
+"""
+Read routing across replicas.
+
+GET handlers read through sessions bound to a read replica (or, for the
+SQLite production profile, the pool of read-only connections), keeping the
+primary's pool free for writes. ``ReplicaSet`` spreads those sessions over
+the replicas in turn. A replica that fails to connect, or drops its
+connection, is skipped for a while. With no replica available, reads fall
+back to the primary.
+
+Replicas lag behind the primary, so a client that just wrote could read its
+own write back as missing. ``RecentWrites`` remembers, for a short window,
+which clients committed a write; their reads go to the primary meanwhile.
+Clients are told apart by their session cookie, kept only as a digest. Like
+the token cache, this is per process: with several workers a client's next
+request may reach a worker that has not seen its write.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+
+from sqlalchemy import event
+from sqlalchemy.engine import ExceptionContext
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from api.services.metrics import metrics
+
+DEFAULT_RETRY_AFTER = 30.0
+DEFAULT_STICKY_SECONDS = 5.0
+DEFAULT_MAX_WRITERS = 10_000
+
+
+class ReplicaSet:
+    """Round-robin choice among read replicas, skipping ones that recently failed."""
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: Sequence[AsyncEngine],
+        retry_after: float = DEFAULT_RETRY_AFTER,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            primary: Where reads go when no replica is available
+            replicas: Engines reads are spread over
+            retry_after: Seconds a failed replica is skipped for
+            clock: Monotonic time source, replaceable in tests
+        """
+        self.primary = primary
+        self.replicas = [replica for replica in replicas if replica is not primary]
+        self.retry_after = retry_after
+        self._clock = clock
+        self._next = 0
+        self._down_until: dict[AsyncEngine, float] = {}
+        for replica in self.replicas:
+            event.listen(replica.sync_engine, "handle_error", self._error_handler(replica))
+
+    def choose(self) -> AsyncEngine:
+        """The engine the next read session should use"""
+        now = self._clock()
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[self._next % len(self.replicas)]
+            self._next += 1
+            if self._down_until.get(replica, 0.0) <= now:
+                metrics.incr("replicas.reads")
+                return replica
+        if self.replicas:
+            metrics.incr("replicas.fallbacks")
+        return self.primary
+
+    def mark_down(self, replica: AsyncEngine) -> None:
+        """Skip ``replica`` for ``retry_after`` seconds"""
+        metrics.incr("replicas.failures")
+        self._down_until[replica] = self._clock() + self.retry_after
+
+    def _error_handler(self, replica: AsyncEngine) -> Callable[[ExceptionContext], None]:
+        # Connection failures, not statement errors, take a replica out of rotation;
+        # errors while connecting come without a connection
+        def handle_error(context: ExceptionContext) -> None:
+            if context.is_disconnect or context.connection is None:
+                self.mark_down(replica)
+
+        return handle_error
+
+
+class RecentWrites:
+    """Bounded record of which clients wrote within the last ``window`` seconds."""
+
+    def __init__(
+        self,
+        window: float = DEFAULT_STICKY_SECONDS,
+        max_entries: int = DEFAULT_MAX_WRITERS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            window: Seconds a client's reads stay on the primary after it writes
+            max_entries: Clients remembered at once; the oldest writes are forgotten first
+            clock: Monotonic time source, replaceable in tests
+        """
+        self.window = window
+        self.max_entries = max_entries
+        self._clock = clock
+        self._written_at: OrderedDict[bytes, float] = OrderedDict()
+
+    def mark(self, client: str) -> None:
+        """Record that ``client`` just committed a write"""
+        if self.window <= 0:
+            return
+        key = _digest(client)
+        self._written_at[key] = self._clock()
+        self._written_at.move_to_end(key)
+        while len(self._written_at) > self.max_entries:
+            self._written_at.popitem(last=False)
+
+    def is_recent(self, client: str) -> bool:
+        """Whether ``client`` committed a write within the window"""
+        written_at = self._written_at.get(_digest(client))
+        return written_at is not None and self._clock() - written_at < self.window
+
+
+def _digest(client: str) -> bytes:
+    return hashlib.blake2b(client.encode(), digest_size=16).digest()
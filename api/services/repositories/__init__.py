@@ -1,3 +1,3 @@
-from . import comments_repository, posts_repository
+from . import comments_repository, posts_repository, users_repository
 
-__all__ = ["comments_repository", "posts_repository"]
+__all__ = ["comments_repository", "posts_repository", "users_repository"]
@@ -1,23 +1,309 @@
-from typing import TypeVar
+from collections.abc import Collection, Sequence
+from typing import Any, TypeVar
 
+from sqlalchemy import ColumnElement, Table, case, delete, event, func, insert, inspect, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlmodel import SQLModel
+from sqlalchemy.orm import Session, SessionTransaction, load_only
+from sqlalchemy.sql.base import ExecutableOption
+from sqlmodel import SQLModel, col, select
 
-T = TypeVar("T")
+from api.models.table_version import TableVersion
+from api.services.entity_cache import caches_for
+
+# Column stamped with the table's change counter on versioned models
+VERSION_COLUMN = "version"
+
+# Session.info key of the tables written in the session's transaction, each
+# with the highest version stamped on its rows (see ``BaseRepository.mark_changed``)
+CHANGED_TABLES = "changed_tables"
+
+ModelT = TypeVar("ModelT", bound=SQLModel)
+
+
+class RecordNotFoundError(LookupError):
+    """Raised when a conditional write targets a row that does not exist."""
+
+
+class NotOwnerError(PermissionError):
+    """Raised when a conditional write targets a row owned by another user."""
+
+
+def load_only_options(model: type[SQLModel], fields: Collection[str] | None) -> list[ExecutableOption]:
+    """
+    Loader options that read only ``fields`` (plus the primary key) of ``model``.
+
+    Returns no options when ``fields`` is None, loading every column.
+    Accessing a column that was not loaded raises instead of lazy loading.
+    """
+    if fields is None:
+        return []
+    return [load_only(*(getattr(model, name) for name in sorted(fields)), raiseload=True)]
+
+
+def cascaded_tables(table: Table) -> list[Table]:
+    """``table`` followed by every table whose rows its deletes remove through ``ON DELETE CASCADE``"""
+    tables = [table]
+    for candidate in tables:
+        for other in table.metadata.sorted_tables:
+            if other not in tables and any(
+                foreign_key.column.table is candidate and (foreign_key.ondelete or "").upper() == "CASCADE"
+                for foreign_key in other.foreign_keys
+            ):
+                tables.append(other)
+    return tables
+
+
+def _is_versioned(model: type[SQLModel]) -> bool:
+    return VERSION_COLUMN in inspect(model).local_table.c
+
+
+def _updated_version(model: type[SQLModel]) -> ColumnElement[int]:
+    # One past both the row's version and its table's counter, read by the
+    # UPDATE itself. A writer that updated the row since the counter was read
+    # may have stamped it past the counter, so the row's own version keeps
+    # it increasing.
+    version = getattr(model, VERSION_COLUMN)
+    counter = func.coalesce(
+        select(TableVersion.version)
+        .where(col(TableVersion.table_name) == inspect(model).local_table.name)
+        .scalar_subquery(),
+        0,
+    )
+    return case((version > counter, version), else_=counter) + 1
+
+
+@event.listens_for(Session, "before_commit")
+def _advance_table_versions(session: Session) -> None:
+    # Only now, so a writer holds a counter row's lock while it commits
+    # rather than for its whole transaction. In name order, so concurrent
+    # writers lock the rows in the same order.
+    if session.in_nested_transaction() or not (changed := session.info.pop(CHANGED_TABLES, None)):
+        return
+    for name, highest in sorted(changed.items()):
+        advanced = TableVersion.version + 1
+        result = session.execute(
+            update(TableVersion)
+            .where(col(TableVersion.table_name) == name)
+            .values(version=case((advanced < highest, highest), else_=advanced))
+        )
+        if result.rowcount == 0:
+            # Counters are seeded with their tables; this only covers tables added since
+            session.execute(insert(TableVersion).values(table_name=name, version=max(highest, 1)))
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _forget_changed_tables(session: Session, transaction: SessionTransaction) -> None:
+    if transaction.parent is None:
+        session.info.pop(CHANGED_TABLES, None)
 
 
 class BaseRepository:
     session: AsyncSession
+    autocommit: bool
 
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, autocommit: bool = True):
+        """
+        Args:
+            session: The session every query runs on
+            autocommit: Commit after each write. Request handlers pass False and
+                call ``commit()`` once, so a route is a single transaction.
+        """
         self.session = session
+        self.autocommit = autocommit
+        # Cache entries written in this unit of work, invalidated again once it commits
+        self._stale: list[tuple[str, Sequence[Any] | None]] = []
 
-    async def update_model(self, existing_model: T, update_data_model: SQLModel, exclude: set[str]) -> T:
-        """Update an existing model with data from another model"""
-        update_data = update_data_model.model_dump(exclude_unset=True, exclude=exclude)
-        for field, value in update_data.items():
-            setattr(existing_model, field, value)
-
+    async def commit(self) -> None:
+        """Commit the current unit of work"""
         await self.session.commit()
-        await self.session.refresh(existing_model)
-        return existing_model
+        stale, self._stale = self._stale, []
+        for table_name, keys in stale:
+            self._invalidate_cached(table_name, keys, after_commit=False)
+
+    def _invalidate_cached(self, table_name: str, keys: Sequence[Any] | None, after_commit: bool = True) -> None:
+        # Drops ``keys`` (every entry when None) from the table's entity caches
+        # now, and again after commit in case a concurrent read cached the old row
+        caches = caches_for(table_name)
+        if not caches:
+            return
+        for cache in caches:
+            if keys is None:
+                cache.clear()
+            else:
+                cache.invalidate(*keys)
+        if after_commit and not self.autocommit:
+            self._stale.append((table_name, keys))
+
+    async def table_versions(self, *models: type[SQLModel]) -> tuple[int, ...]:
+        """
+        Read the change counters of the tables behind ``models``, in order.
+
+        Read them before the rows they describe: a write landing in between
+        then makes the version look older than the data, never newer.
+        """
+        names = [inspect(model).local_table.name for model in models]
+        result = await self.session.execute(
+            select(TableVersion.table_name, TableVersion.version).where(col(TableVersion.table_name).in_(names))
+        )
+        versions = dict(result.tuples().all())
+        return tuple(versions.get(name, 0) for name in names)
+
+    async def version_by_id(self, model: type[SQLModel], model_id: Any) -> int | None:
+        """Read one row's version without loading the row, or None if it does not exist"""
+        primary_key = inspect(model).primary_key[0]
+        result = await self.session.execute(select(getattr(model, VERSION_COLUMN)).where(primary_key == model_id))
+        return result.scalar_one_or_none()
+
+    async def next_version(self, model: type[SQLModel]) -> int:
+        """The version to stamp on rows of ``model`` inserted now: one past its table's counter"""
+        (version,) = await self.table_versions(model)
+        return version + 1
+
+    def mark_changed(self, model: type[SQLModel], version: int = 0, cascade: bool = False) -> None:
+        """
+        Record a write to ``model``'s table, stamping its rows with at most ``version``.
+
+        The table's change counter is advanced (past ``version``) just before
+        the transaction commits, so it commits or rolls back together with
+        the write, and writers only queue for the counter row while they
+        commit. With ``cascade`` the counters of tables its deletes cascade
+        to are advanced too.
+        """
+        table = inspect(model).local_table
+        changed: dict[str, int] = self.session.info.setdefault(CHANGED_TABLES, {})
+        changed[table.name] = max(changed.get(table.name, 0), version)
+        if cascade:
+            for cascaded in cascaded_tables(table)[1:]:
+                changed.setdefault(cascaded.name, 0)
+                # Rows removed by a cascade are not known one by one
+                self._invalidate_cached(cascaded.name, None)
+
+    async def save(self, model: ModelT) -> ModelT:
+        """Insert a new model, committing only in autocommit mode"""
+        if _is_versioned(type(model)):
+            version = await self.next_version(type(model))
+            setattr(model, VERSION_COLUMN, version)
+            self.mark_changed(type(model), version)
+        self.session.add(model)
+        if self.autocommit:
+            await self.session.commit()
+            await self.session.refresh(model)
+        else:
+            # Flushing assigns the primary key without ending the transaction
+            await self.session.flush()
+        # The new key may have been cached as missing
+        self._invalidate_cached(inspect(type(model)).local_table.name, [inspect(model).identity[0]])
+        return model
+
+    async def save_many(self, models: Sequence[ModelT]) -> Sequence[ModelT]:
+        """
+        Insert new models of one type together, committing only in autocommit mode.
+
+        They are all stamped with the same version, and the inserts are
+        flushed together, so the models get their primary keys
+        from one round of ``INSERT ... RETURNING``.
+        """
+        if not models:
+            return models
+        model_type = type(models[0])
+        if _is_versioned(model_type):
+            version = await self.next_version(model_type)
+            for model in models:
+                setattr(model, VERSION_COLUMN, version)
+            self.mark_changed(model_type, version)
+        self.session.add_all(models)
+        # Flushing assigns the primary keys; committed models keep their loaded state
+        await self.session.flush()
+        if self.autocommit:
+            await self.session.commit()
+        self._invalidate_cached(inspect(model_type).local_table.name, [inspect(model).identity[0] for model in models])
+        return models
+
+    async def insert_many(self, model: type[SQLModel], rows: Sequence[dict[str, Any]]) -> list[int]:
+        """
+        Insert many rows and return their primary keys in input order.
+
+        Runs as a Core multi-row ``INSERT ... RETURNING`` without building ORM
+        objects or refreshing them afterwards.
+        """
+        if not rows:
+            return []
+
+        if _is_versioned(model):
+            version = await self.next_version(model)
+            rows = [{**row, VERSION_COLUMN: version} for row in rows]
+            self.mark_changed(model, version)
+
+        table = inspect(model).local_table
+        primary_key = table.primary_key.columns[0]
+        # RETURNING order is not guaranteed, and asking SQLAlchemy to sort by
+        # parameter order falls back to one statement per row on SQLite.
+        # Integer keys are assigned in VALUES order, so sorting restores it.
+        result = await self.session.execute(insert(table).returning(primary_key), rows)
+        inserted_ids = sorted(result.scalars().all())
+        if self.autocommit:
+            await self.session.commit()
+        self._invalidate_cached(table.name, inserted_ids)
+        return inserted_ids
+
+    async def update_by_id(
+        self,
+        model: type[ModelT],
+        model_id: Any,
+        update_data_model: SQLModel,
+        exclude: set[str],
+        *criteria: ColumnElement[bool],
+    ) -> ModelT | None:
+        """
+        Update a row with the fields set on another model.
+
+        Issues a single ``UPDATE ... RETURNING`` statement, so a missing row
+        (or one not matching the extra ``criteria``) is reported as ``None``
+        without a separate lookup. Versioned rows are stamped with a new version,
+        and their table's counter advanced, only when a row matched; the
+        version in ``update_data_model`` is ignored.
+        """
+        primary_key = inspect(model).primary_key[0]
+        update_data = update_data_model.model_dump(exclude_unset=True, exclude=exclude | {VERSION_COLUMN})
+        if not update_data:
+            result = await self.session.execute(select(model).where(primary_key == model_id, *criteria))
+            return result.scalars().first()
+        if _is_versioned(model):
+            update_data[VERSION_COLUMN] = _updated_version(model)
+
+        statement = (
+            update(model)
+            .where(primary_key == model_id, *criteria)
+            .values(update_data)
+            .returning(model)
+            .execution_options(populate_existing=True)
+        )
+        result = await self.session.execute(statement)
+        updated_model = result.scalars().first()
+        if updated_model is not None and _is_versioned(model):
+            self.mark_changed(model, getattr(updated_model, VERSION_COLUMN))
+        if self.autocommit:
+            await self.session.commit()
+        if updated_model is not None:
+            self._invalidate_cached(inspect(model).local_table.name, [model_id])
+        return updated_model
+
+    async def delete_by_id(self, model: type[SQLModel], model_id: Any, *criteria: ColumnElement[bool]) -> bool:
+        """
+        Delete a row by primary key with a single ``DELETE ... RETURNING`` statement.
+
+        Related rows are removed by the database's ``ON DELETE CASCADE`` rules
+        rather than being loaded into the session first; the change counters of
+        the tables cascaded to are advanced along with the model's own.
+        """
+        primary_key = inspect(model).primary_key[0]
+        statement = delete(model).where(primary_key == model_id, *criteria).returning(primary_key)
+        result = await self.session.execute(statement)
+        deleted_id = result.scalar_one_or_none()
+        if deleted_id is not None:
+            self.mark_changed(model, cascade=True)
+        if self.autocommit:
+            await self.session.commit()
+        if deleted_id is not None:
+            self._invalidate_cached(inspect(model).local_table.name, [model_id])
+        return deleted_id is not None
@@ -1,50 +1,172 @@
-from collections.abc import Sequence
+import uuid
+from collections.abc import AsyncIterator, Sequence
+from functools import partial
+from typing import NoReturn
 
-from sqlmodel import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import col, select
 
 from api.models.comment import Comment
-from api.services.repositories.base_repository import BaseRepository
+from api.models.post import Post
+from api.schemas.comment import CommentCreate
+from api.services.entity_cache import EntityCache
+from api.services.excerpts import make_excerpt, refresh_excerpt
+from api.services.repositories.base_repository import (
+    BaseRepository,
+    NotOwnerError,
+    RecordNotFoundError,
+    load_only_options,
+)
+from api.services.streaming import STREAM_FETCH_SIZE
+
+# Columns that can be requested through sparse fieldsets
+COMMENT_FIELDS = frozenset(Comment.model_fields)
+
+# Comments by ID, shared by the repositories of every request
+comment_cache: EntityCache[Comment] = EntityCache(Comment)
 
 
 class CommentsRepository(BaseRepository):
+    def __init__(self, session: AsyncSession, autocommit: bool = True, cache: EntityCache[Comment] | None = None):
+        """
+        Args:
+            session: The session every query runs on
+            autocommit: Commit after each write
+            cache: Where ``find_comment`` reads comments through, if anywhere
+        """
+        super().__init__(session, autocommit)
+        self.cache = cache
+
     async def all_comments(self) -> Sequence[Comment]:
         """Retrieve all comments from the database"""
         result = await self.session.execute(select(Comment))
         return result.scalars().all()
 
+    async def page_comments(
+        self,
+        limit: int,
+        after_id: int | None = None,
+        post_id: int | None = None,
+        user_id: uuid.UUID | None = None,
+        fields: frozenset[str] | None = None,
+    ) -> Sequence[Comment]:
+        """
+        Retrieve one page of comments ordered by ID, optionally filtered.
+
+        Fetches ``limit + 1`` rows so the caller can tell whether another page
+        follows. Filtering by post seeks the ``(post_id, id)`` index. Only the
+        columns in ``fields`` are read when it is given.
+        """
+        statement = (
+            select(Comment).options(*load_only_options(Comment, fields)).order_by(col(Comment.id)).limit(limit + 1)
+        )
+        if post_id is not None:
+            statement = statement.where(Comment.post_id == post_id)
+        if user_id is not None:
+            statement = statement.where(Comment.user_id == user_id)
+        if after_id is not None:
+            statement = statement.where(col(Comment.id) > after_id)
+        result = await self.session.execute(statement)
+        return result.scalars().all()
+
+    async def stream_comments(
+        self, post_id: int | None = None, user_id: uuid.UUID | None = None, fields: frozenset[str] | None = None
+    ) -> AsyncIterator[Comment]:
+        """Stream comments ordered by ID, optionally filtered, fetching rows in bounded batches"""
+        statement = select(Comment).options(*load_only_options(Comment, fields)).order_by(col(Comment.id))
+        if post_id is not None:
+            statement = statement.where(Comment.post_id == post_id)
+        if user_id is not None:
+            statement = statement.where(Comment.user_id == user_id)
+        result = await self.session.stream_scalars(statement, execution_options={"yield_per": STREAM_FETCH_SIZE})
+        async for comment in result:
+            yield comment
+
     async def find_comment(self, comment_id: int) -> Comment | None:
-        """Find a specific comment by ID"""
+        """
+        Find a specific comment by ID.
+
+        Served from the repository's cache when it has one, in which case the
+        comment returned is not attached to the session.
+        """
+        if self.cache is not None:
+            return await self.cache.get_or_load(comment_id, partial(self._load_comment, comment_id))
+        return await self._load_comment(comment_id)
+
+    async def _load_comment(self, comment_id: int) -> Comment | None:
         statement = select(Comment).where(Comment.id == comment_id)
         result = await self.session.execute(statement)
         return result.scalars().first()
 
+    async def comment_version(self, comment_id: int) -> int | None:
+        """Read a comment's version without loading it, or None if there is no such comment"""
+        return await self.version_by_id(Comment, comment_id)
+
+    async def post_exists(self, post_id: int) -> bool:
+        """Whether a comment may reference ``post_id``"""
+        return await self.version_by_id(Post, post_id) is not None
+
     async def create_comment(self, comment: Comment) -> Comment:
         """Create a new comment"""
-        self.session.add(comment)
-        await self.session.commit()
-        await self.session.refresh(comment)
-        return comment
+        comment.excerpt = make_excerpt(comment.body)
+        return await self.save(comment)
 
-    async def update_comment(self, comment_id: int, comment_data: Comment) -> Comment | None:
-        """Update an existing comment"""
-        statement = select(Comment).where(Comment.id == comment_id)
-        result = await self.session.execute(statement)
-        existing_comment = result.scalars().first()
+    async def create_comments(self, comments: Sequence[Comment]) -> Sequence[Comment]:
+        """Create many comments in one flush, as one group commit does"""
+        for comment in comments:
+            comment.excerpt = make_excerpt(comment.body)
+        return await self.save_many(comments)
 
-        if not existing_comment:
-            return None
+    async def bulk_create_comments(
+        self, comments: Sequence[CommentCreate], user_id: uuid.UUID | None = None
+    ) -> list[int]:
+        """Create many comments in one statement and return their IDs in input order"""
+        rows = [
+            {**comment.model_dump(), "excerpt": make_excerpt(comment.body), "user_id": user_id} for comment in comments
+        ]
+        return await self.insert_many(Comment, rows)
 
-        return await self.update_model(existing_comment, comment_data, exclude={"id"})
+    async def update_comment(self, comment_id: int, comment_data: Comment) -> Comment | None:
+        """Update an existing comment"""
+        return await self.update_by_id(Comment, comment_id, comment_data, exclude=refresh_excerpt(comment_data, {"id"}))
 
     async def delete_comment(self, comment_id: int) -> bool:
         """Delete a comment by ID"""
-        statement = select(Comment).where(Comment.id == comment_id)
-        result = await self.session.execute(statement)
-        comment = result.scalars().first()
+        return await self.delete_by_id(Comment, comment_id)
+
+    async def update_owned_comment(self, comment_id: int, user_id: uuid.UUID, comment_data: Comment) -> Comment:
+        """
+        Update a comment only if it belongs to ``user_id``.
+
+        The ownership check and the write are one conditional statement.
+
+        Raises:
+            RecordNotFoundError: If the comment does not exist
+            NotOwnerError: If the comment belongs to another user
+        """
+        exclude = refresh_excerpt(comment_data, {"id", "user_id"})
+        updated_comment = await self.update_by_id(
+            Comment, comment_id, comment_data, exclude, Comment.user_id == user_id
+        )
+        if updated_comment is None:
+            await self._raise_for_unowned(comment_id)
+        return updated_comment
+
+    async def delete_owned_comment(self, comment_id: int, user_id: uuid.UUID) -> None:
+        """
+        Delete a comment only if it belongs to ``user_id``.
 
-        if comment:
-            await self.session.delete(comment)
-            await self.session.commit()
-            return True
+        Raises:
+            RecordNotFoundError: If the comment does not exist
+            NotOwnerError: If the comment belongs to another user
+        """
+        if not await self.delete_by_id(Comment, comment_id, Comment.user_id == user_id):
+            await self._raise_for_unowned(comment_id)
 
-        return False
+    async def _raise_for_unowned(self, comment_id: int) -> NoReturn:
+        # Only reached when a conditional write matched nothing, to tell a
+        # missing comment (404) apart from someone else's (403).
+        result = await self.session.execute(select(Comment.id).where(Comment.id == comment_id))
+        if result.scalar_one_or_none() is None:
+            raise RecordNotFoundError(f"Comment {comment_id} not found")
+        raise NotOwnerError(f"Comment {comment_id} belongs to another user")
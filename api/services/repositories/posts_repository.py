@@ -1,50 +1,148 @@
-from collections.abc import Sequence
+import uuid
+from collections.abc import AsyncIterator, Collection, Sequence
+from functools import partial
 
-from sqlmodel import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.sql.base import ExecutableOption
+from sqlmodel import col, select
 
 from api.models.post import Post
-from api.services.repositories.base_repository import BaseRepository
+from api.models.user import User
+from api.schemas.post import PostCreate
+from api.services.entity_cache import EntityCache
+from api.services.excerpts import make_excerpt, refresh_excerpt
+from api.services.repositories.base_repository import BaseRepository, load_only_options
+from api.services.streaming import STREAM_FETCH_SIZE
+
+# Relations that can be eager loaded alongside posts. The author is a
+# many-to-one, so it is joined into the post query; comments are one-to-many,
+# so they are fetched by a second ``IN`` query instead of multiplying the rows.
+POST_EXPANSIONS: dict[str, ExecutableOption] = {
+    # Only the author's id is public
+    "author": joinedload(Post.author).load_only(User.id),  # pyright: ignore[reportArgumentType]
+    "comments": selectinload(Post.comments),  # pyright: ignore[reportArgumentType]
+}
+
+
+# Columns that can be requested through sparse fieldsets
+POST_FIELDS = frozenset(Post.model_fields)
+
+
+# Unexpanded posts by ID, shared by the repositories of every request
+post_cache: EntityCache[Post] = EntityCache(Post)
+
+
+def expand_options(expand: Collection[str]) -> list[ExecutableOption]:
+    """Loader options for the requested relations, each relation costing at most one extra query"""
+    return [POST_EXPANSIONS[relation] for relation in sorted(expand)]
 
 
 class PostsRepository(BaseRepository):
+    def __init__(self, session: AsyncSession, autocommit: bool = True, cache: EntityCache[Post] | None = None):
+        """
+        Args:
+            session: The session every query runs on
+            autocommit: Commit after each write
+            cache: Where ``find_post`` reads unexpanded posts through, if anywhere
+        """
+        super().__init__(session, autocommit)
+        self.cache = cache
+
     async def all_posts(self) -> Sequence[Post]:
         """Retrieve all posts from the database"""
         result = await self.session.execute(select(Post))
         return result.scalars().all()
 
-    async def find_post(self, post_id: int) -> Post | None:
-        """Find a specific post by ID"""
-        statement = select(Post).where(Post.id == post_id)
+    async def page_posts(
+        self,
+        limit: int,
+        after_id: int | None = None,
+        expand: frozenset[str] = frozenset(),
+        fields: frozenset[str] | None = None,
+    ) -> Sequence[Post]:
+        """
+        Retrieve one page of posts ordered by ID.
+
+        Fetches ``limit + 1`` rows so the caller can tell whether another page
+        follows. Seeking past ``after_id`` keeps every page an index range scan.
+        Relations named in ``expand`` are eager loaded, and only the columns in
+        ``fields`` are read when it is given.
+        """
+        statement = (
+            select(Post)
+            .options(*expand_options(expand), *load_only_options(Post, fields))
+            .order_by(col(Post.id))
+            .limit(limit + 1)
+        )
+        if after_id is not None:
+            statement = statement.where(col(Post.id) > after_id)
         result = await self.session.execute(statement)
-        return result.scalars().first()
+        return result.scalars().all()
 
-    async def create_post(self, post: Post) -> Post:
-        """Create a new post"""
-        self.session.add(post)
-        await self.session.commit()
-        await self.session.refresh(post)
-        return post
+    async def stream_posts(
+        self, expand: frozenset[str] = frozenset(), fields: frozenset[str] | None = None
+    ) -> AsyncIterator[Post]:
+        """Stream every post ordered by ID, fetching rows in bounded batches"""
+        result = await self.session.stream_scalars(
+            select(Post).options(*expand_options(expand), *load_only_options(Post, fields)).order_by(col(Post.id)),
+            execution_options={"yield_per": STREAM_FETCH_SIZE},
+        )
+        async for post in result:
+            yield post
 
-    async def update_post(self, post_id: int, post_data: Post) -> Post | None:
-        """Update an existing post"""
-        statement = select(Post).where(Post.id == post_id)
+    async def find_post(self, post_id: int, expand: frozenset[str] = frozenset()) -> Post | None:
+        """
+        Find a specific post by ID.
+
+        Unexpanded lookups are served from the repository's cache when it has
+        one, in which case the post returned is not attached to the session.
+        """
+        if self.cache is not None and not expand:
+            return await self.cache.get_or_load(post_id, partial(self._load_post, post_id))
+        return await self._load_post(post_id, expand)
+
+    async def _load_post(self, post_id: int, expand: frozenset[str] = frozenset()) -> Post | None:
+        statement = select(Post).options(*expand_options(expand)).where(Post.id == post_id)
         result = await self.session.execute(statement)
-        existing_post = result.scalars().first()
+        return result.scalars().first()
 
-        if not existing_post:
-            return None
+    async def post_version(self, post_id: int) -> int | None:
+        """Read a post's version without loading it, or None if there is no such post"""
+        return await self.version_by_id(Post, post_id)
 
-        return await self.update_model(existing_post, post_data, exclude={"id"})
+    async def find_posts(
+        self, post_ids: Sequence[int], expand: frozenset[str] = frozenset(), fields: frozenset[str] | None = None
+    ) -> list[Post]:
+        """Find many posts by ID with one query, in the order requested, skipping missing IDs"""
+        posts_by_id = await self._load_posts(post_ids, expand, fields)
+        return [posts_by_id[post_id] for post_id in dict.fromkeys(post_ids) if post_id in posts_by_id]
 
-    async def delete_post(self, post_id: int) -> bool:
-        """Delete a post by ID"""
-        statement = select(Post).where(Post.id == post_id)
+    async def _load_posts(
+        self, post_ids: Sequence[int], expand: frozenset[str] = frozenset(), fields: frozenset[str] | None = None
+    ) -> dict[int, Post]:
+        statement = (
+            select(Post)
+            .options(*expand_options(expand), *load_only_options(Post, fields))
+            .where(col(Post.id).in_(post_ids))
+        )
         result = await self.session.execute(statement)
-        post = result.scalars().first()
+        return {post.id: post for post in result.scalars().all() if post.id is not None}
 
-        if post:
-            await self.session.delete(post)
-            await self.session.commit()
-            return True
+    async def create_post(self, post: Post) -> Post:
+        """Create a new post"""
+        post.excerpt = make_excerpt(post.body)
+        return await self.save(post)
+
+    async def bulk_create_posts(self, posts: Sequence[PostCreate], user_id: uuid.UUID | None = None) -> list[int]:
+        """Create many posts in one statement and return their IDs in input order"""
+        rows = [{**post.model_dump(), "excerpt": make_excerpt(post.body), "user_id": user_id} for post in posts]
+        return await self.insert_many(Post, rows)
+
+    async def update_post(self, post_id: int, post_data: Post) -> Post | None:
+        """Update an existing post, refreshing its excerpt when the body changes"""
+        return await self.update_by_id(Post, post_id, post_data, exclude=refresh_excerpt(post_data, {"id"}))
 
-        return False
+    async def delete_post(self, post_id: int) -> bool:
+        """Delete a post by ID"""
+        return await self.delete_by_id(Post, post_id)
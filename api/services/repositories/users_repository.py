@@ -0,0 +1,47 @@
+from collections.abc import Collection, Sequence
+from typing import Any
+
+from sqlalchemy import func, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import col, select
+
+from api.models.user import User
+from api.services.repositories.base_repository import BaseRepository
+
+# Dialect-specific INSERTs, for ON CONFLICT DO NOTHING
+_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+class UsersRepository(BaseRepository):
+    """
+    Bulk user writes for administrative tooling.
+
+    Single-user registration, login and updates go through fastapi-users'
+    ``UserManager``; this only covers what it has no batch API for.
+    """
+
+    async def existing_emails(self, emails: Collection[str]) -> set[str]:
+        """Return which of ``emails`` already belong to a user, lowercased, compared case-insensitively"""
+        if not emails:
+            return set()
+        lowered = {email.lower() for email in emails}
+        result = await self.session.execute(
+            select(func.lower(col(User.email))).where(func.lower(col(User.email)).in_(lowered))
+        )
+        return set(result.scalars().all())
+
+    async def insert_new_users(self, rows: Sequence[dict[str, Any]]) -> int:
+        """
+        Insert users in one statement, skipping any whose email is taken, and return how many were inserted.
+
+        Rows need every column, including ``id`` and ``hashed_password``.
+        """
+        if not rows:
+            return 0
+        table = inspect(User).local_table
+        statement = _INSERTS[self.session.bind.dialect.name](table).on_conflict_do_nothing().returning(table.c.id)
+        result = await self.session.execute(statement, rows)
+        inserted = len(result.scalars().all())
+        if self.autocommit:
+            await self.session.commit()
+        return inserted
@@ -0,0 +1,214 @@
+"""
+Versioned response cache for list routes.
+
+List pages are read far more often than the tables behind them change. A
+list route keys its encoded body on its path, normalised query and the
+change counters of the tables it reads (the same digest it uses as the
+ETag, see ``api.services.conditional``). Every repository write advances a
+counter, so entries for older versions simply stop being asked for:
+invalidation is O(1) and needs no bookkeeping, and the stale entries age out
+of the store's byte budget.
+
+Two stores are available: ``MemoryResponseStore`` (per process, LRU) and
+``SQLiteResponseStore`` (a separate SQLite file shared by every worker
+process pointing at it, oldest entries evicted first).
+"""
+
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Protocol
+
+from fastapi import Response
+
+from api.schemas.admin import ResponseCacheStats
+from api.services.metrics import metrics
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# SQLite stores evict this many of their oldest entries per pass when over budget
+_EVICTION_BATCH = 64
+
+
+class ResponseStore(Protocol):
+    backend: str
+    max_bytes: int
+
+    async def get(self, key: str) -> bytes | None: ...
+
+    async def set(self, key: str, body: bytes) -> None: ...
+
+    async def usage(self) -> tuple[int, int]:
+        """Return the number of entries and the bytes they take"""
+        ...
+
+    async def clear(self) -> None: ...
+
+
+class MemoryResponseStore:
+    """Bodies kept in this process, least recently used evicted first, bounded by total size."""
+
+    backend = "memory"
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+
+    async def get(self, key: str) -> bytes | None:
+        body = self._entries.get(key)
+        if body is not None:
+            self._entries.move_to_end(key)
+        return body
+
+    async def set(self, key: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self._entries[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+            metrics.incr("response_cache.evictions")
+
+    async def usage(self) -> tuple[int, int]:
+        return len(self._entries), self.size
+
+    async def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+
+class SQLiteResponseStore:
+    """Bodies kept in a SQLite file, oldest written evicted first, bounded by total size."""
+
+    backend = "sqlite"
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            path: The cache file; worker processes given the same path share entries
+            max_bytes: Total body size kept before the oldest entries are evicted
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        # One connection used from worker threads, one statement at a time
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache"
+            " (key TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL)"
+        )
+
+    async def get(self, key: str) -> bytes | None:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, body: bytes) -> None:
+        if len(body) <= self.max_bytes:
+            evicted = await asyncio.to_thread(self._set, key, body)
+            if evicted:
+                metrics.incr("response_cache.evictions", evicted)
+
+    async def usage(self) -> tuple[int, int]:
+        return await asyncio.to_thread(self._usage)
+
+    async def clear(self) -> None:
+        await asyncio.to_thread(self._execute, "DELETE FROM response_cache")
+
+    def _get(self, key: str) -> bytes | None:
+        with self._lock:
+            row = self._connection.execute("SELECT body FROM response_cache WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def _set(self, key: str, body: bytes) -> int:
+        evicted = 0
+        with self._lock:
+            connection = self._connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                # REPLACE gives the entry a new rowid, so rowid order is write order
+                connection.execute(
+                    "INSERT OR REPLACE INTO response_cache (key, body, size) VALUES (?, ?, ?)", (key, body, len(body))
+                )
+                total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM response_cache").fetchone()[0]
+                while total > self.max_bytes:
+                    oldest = connection.execute(
+                        "SELECT rowid, size FROM response_cache ORDER BY rowid LIMIT ?", (_EVICTION_BATCH,)
+                    ).fetchall()
+                    for rowid, size in oldest:
+                        if total <= self.max_bytes:
+                            break
+                        connection.execute("DELETE FROM response_cache WHERE rowid = ?", (rowid,))
+                        total -= size
+                        evicted += 1
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return evicted
+
+    def _usage(self) -> tuple[int, int]:
+        with self._lock:
+            entries, size = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM response_cache"
+            ).fetchone()
+        return entries, size
+
+    def _execute(self, statement: str) -> None:
+        with self._lock:
+            self._connection.execute(statement)
+
+
+def create_response_store(backend: str, max_bytes: int, path: str) -> ResponseStore:
+    """
+    Build the store named by ``backend``.
+
+    Raises:
+        ValueError: If ``backend`` is neither ``memory`` nor ``sqlite``
+    """
+    if backend == "memory":
+        return MemoryResponseStore(max_bytes)
+    if backend == "sqlite":
+        return SQLiteResponseStore(path, max_bytes)
+    raise ValueError(f"Unknown response cache backend {backend!r}, expected 'memory' or 'sqlite'")
+
+
+class ResponseCache:
+    """Serve encoded JSON list responses from a ``ResponseStore``, counting hits and misses."""
+
+    def __init__(self, store: ResponseStore):
+        self.store = store
+
+    async def fetch(self, key: str, render: Callable[[], Awaitable[Response]]) -> Response:
+        """Return the stored body for ``key``, or call ``render`` and store its body if it succeeds"""
+        body = await self.store.get(key)
+        if body is not None:
+            metrics.incr("response_cache.hits")
+            return Response(body, media_type="application/json")
+
+        metrics.incr("response_cache.misses")
+        response = await render()
+        if response.status_code == 200:
+            await self.store.set(key, bytes(response.body))
+        return response
+
+    async def stats(self) -> ResponseCacheStats:
+        """Report the store's usage and this process's hit ratio"""
+        entries, size = await self.store.usage()
+        hits, misses = metrics.get("response_cache.hits"), metrics.get("response_cache.misses")
+        return ResponseCacheStats(
+            backend=self.store.backend,
+            entries=entries,
+            bytes=size,
+            max_bytes=self.store.max_bytes,
+            hits=hits,
+            misses=misses,
+            hit_ratio=hits / (hits + misses) if hits + misses else 0.0,
+        )
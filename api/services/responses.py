@@ -0,0 +1,23 @@
+"""
+Fast JSON responses.
+
+FastAPI normally turns a returned model into JSON in several passes: it
+dumps the model to a dict, validates that dict against ``response_model``,
+serializes it to JSON-compatible Python and only then encodes it. Routes on
+hot paths instead build read schemas without validation and return a
+``FastJSONResponse``, which pydantic-core encodes straight to bytes in one
+pass. ``response_model`` is still declared on those routes for the OpenAPI
+schema.
+"""
+
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded by pydantic-core, which serializes models natively."""
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
@@ -0,0 +1,115 @@
+"""
+Singleflight de-duplication of identical concurrent GETs.
+
+When many clients ask for the same resource at the same moment (a post
+that just got linked somewhere, the first page of the feed), every request
+would otherwise run the same query and encode the same body. Routers that
+opt in with ``APIRouter(route_class=SingleFlightRoute)`` instead let the
+first request (the leader) do the work while identical requests that arrive
+before it finishes wait for and reuse its response.
+
+Only plain, fully-buffered responses are shared: streaming requests bypass
+coalescing, and a follower falls back to running its own handler if the
+leader was cancelled (e.g. the client disconnected).
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Coroutine, Hashable
+from typing import Any, Generic, TypeVar
+from urllib.parse import parse_qsl
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+from api.services.metrics import metrics
+from api.services.streaming import NDJSON_MEDIA_TYPE
+
+KeyT = TypeVar("KeyT", bound=Hashable)
+ResultT = TypeVar("ResultT")
+
+# Request headers that can change the response and so must be part of the key
+_VARY_HEADERS = ("accept", "accept-encoding", "authorization", "cookie", "if-none-match")
+
+_TRUTHY = {"1", "true", "on", "yes"}
+
+
+class SingleFlight(Generic[KeyT, ResultT]):
+    """Share one in-flight call between concurrent callers using the same key."""
+
+    def __init__(self, name: str):
+        """
+        Args:
+            name: Prefix for the ``<name>.leaders`` / ``<name>.coalesced``
+                metrics counters.
+        """
+        self._name = name
+        self._calls: dict[KeyT, asyncio.Task[ResultT]] = {}
+
+    async def do(self, key: KeyT, fn: Callable[[], Awaitable[ResultT]]) -> ResultT:
+        """
+        Run ``fn`` unless a call for ``key`` is already in flight, in which case
+        wait for that call and return its result (or raise its exception).
+
+        If the leader is cancelled while followers are waiting, each follower
+        runs ``fn`` itself rather than failing.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            metrics.incr(f"{self._name}.leaders")
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+            return await task
+
+        metrics.incr(f"{self._name}.coalesced")
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                raise
+        metrics.incr(f"{self._name}.fallbacks")
+        return await fn()
+
+    def _forget(self, key: KeyT, task: "asyncio.Task[ResultT]") -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+
+_flight: SingleFlight[tuple[str, ...], Response] = SingleFlight("singleflight")
+
+
+def normalized_query(request: Request) -> str:
+    """The request's query string with its parameters sorted, so equivalent URLs compare equal"""
+    return "&".join(f"{name}={value}" for name, value in sorted(parse_qsl(request.url.query, keep_blank_values=True)))
+
+
+def request_key(request: Request) -> tuple[str, ...]:
+    """Build the coalescing key: method, path, normalised query and varying headers"""
+    return (
+        request.method,
+        request.url.path,
+        normalized_query(request),
+        *(request.headers.get(header, "") for header in _VARY_HEADERS),
+    )
+
+
+def _is_stream_request(request: Request) -> bool:
+    return request.query_params.get("stream", "").lower() in _TRUTHY or NDJSON_MEDIA_TYPE in request.headers.get(
+        "accept", ""
+    )
+
+
+class SingleFlightRoute(APIRoute):
+    """API route that coalesces identical concurrent GET requests."""
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def coalescing_handler(request: Request) -> Response:
+            if request.method != "GET" or _is_stream_request(request):
+                return await handler(request)
+
+            # Plain responses carry their encoded body and can be sent more than once
+            return await _flight.do(request_key(request), lambda: handler(request))
+
+        return coalescing_handler
@@ -0,0 +1,35 @@
+"""
+Streaming (NDJSON) response helpers.
+
+List endpoints can stream their full result set as newline-delimited JSON
+instead of a paginated page. Rows are pulled from a server-side cursor in
+bounded batches and encoded one batch at a time, so memory stays flat no
+matter how large the table is and the first bytes go out immediately.
+"""
+
+from collections.abc import AsyncIterable, AsyncIterator
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Rows fetched from the database cursor per round trip while streaming
+STREAM_FETCH_SIZE = 500
+
+
+async def encode_ndjson(rows: AsyncIterable[BaseModel], batch_size: int = STREAM_FETCH_SIZE) -> AsyncIterator[bytes]:
+    """Encode models as NDJSON, yielding one chunk per ``batch_size`` rows"""
+    lines: list[bytes] = []
+    async for row in rows:
+        lines.append(row.model_dump_json().encode())
+        if len(lines) >= batch_size:
+            yield b"\n".join(lines) + b"\n"
+            lines.clear()
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+def ndjson_response(rows: AsyncIterable[BaseModel]) -> StreamingResponse:
+    """Stream models to the client as an NDJSON response"""
+    return StreamingResponse(encode_ndjson(rows), media_type=NDJSON_MEDIA_TYPE)
@@ -0,0 +1,146 @@
+"""
+Cache of authenticated users by session token.
+
+Every authenticated request decodes its JWT and then loads the user it names.
+``CachedJWTStrategy`` remembers, per token, the user the token resolved to,
+so repeat requests with the same cookie skip both the signature check and
+the user query. Entries never outlive the token's own expiry, and are
+dropped when the user manager updates, verifies or deletes the user.
+
+Entries are column snapshots (see ``api.services.entity_cache``); a hit is
+attached to the request's session without a query, so it can still be
+updated through the user manager. Tokens are kept only as digests. Other
+worker processes are not told about user changes; the TTL bounds how long
+they may keep accepting a deactivated user.
+"""
+
+import hashlib
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+import jwt
+from fastapi_users import BaseUserManager, exceptions
+from fastapi_users.authentication import JWTStrategy
+from fastapi_users.jwt import decode_jwt
+from sqlalchemy.orm import make_transient_to_detached
+
+from api.models.user import User
+from api.services.metrics import metrics
+
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_TTL = 30.0
+
+
+class TokenCache:
+    """Bounded LRU of token digest to user snapshot, each entry expiring with its token."""
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: float = DEFAULT_TTL,
+        clock: Callable[[], float] = time.monotonic,
+        wall_clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            max_entries: Entries kept before the least recently used is evicted
+            ttl: Longest a user is served from the cache, in seconds; 0 disables the cache
+            clock: Monotonic time source, replaceable in tests
+            wall_clock: Time source token ``exp`` claims are compared with
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._wall_clock = wall_clock
+        # token digest -> (expires at, user id, column snapshot)
+        self._entries: OrderedDict[bytes, tuple[float, uuid.UUID, dict[str, Any]]] = OrderedDict()
+        self.generation = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> User | None:
+        """A fresh, session-less copy of the user ``token`` resolved to, or None on a miss"""
+        key = _digest(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, _, snapshot = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            metrics.incr("token_cache.expirations")
+            return None
+        self._entries.move_to_end(key)
+        return User.model_validate(snapshot)
+
+    def put(self, token: str, user: User, expires: float | None, generation: int) -> None:
+        """
+        Remember the user ``token`` resolved to.
+
+        Args:
+            token: The encoded token
+            user: The user it names
+            expires: The token's ``exp`` claim (a Unix timestamp), if it has one
+            generation: ``self.generation`` read before the user was loaded;
+                nothing is stored if the cache was invalidated since
+        """
+        lifetime = self.ttl if expires is None else min(self.ttl, expires - self._wall_clock())
+        if lifetime <= 0 or generation != self.generation or user.id is None:
+            return
+        key = _digest(token)
+        self._entries[key] = (self._clock() + lifetime, user.id, user.model_dump())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            metrics.incr("token_cache.evictions")
+
+    def invalidate_user(self, user_id: uuid.UUID | None) -> None:
+        """Forget every token of ``user_id``, and keep loads already in flight from storing what they read"""
+        self.generation += 1
+        stale = [key for key, (_, cached_id, _) in self._entries.items() if cached_id == user_id]
+        for key in stale:
+            del self._entries[key]
+        metrics.incr("token_cache.invalidations", len(stale))
+
+    def clear(self) -> None:
+        """Forget every entry"""
+        self.generation += 1
+        self._entries.clear()
+
+
+class CachedJWTStrategy(JWTStrategy[User, uuid.UUID]):
+    """``JWTStrategy`` that reads tokens through a ``TokenCache``."""
+
+    def __init__(self, secret: str, lifetime_seconds: int | None, cache: TokenCache):
+        super().__init__(secret=secret, lifetime_seconds=lifetime_seconds)
+        self.cache = cache
+
+    async def read_token(self, token: str | None, user_manager: BaseUserManager[User, uuid.UUID]) -> User | None:
+        if token is None:
+            return None
+
+        if (cached := self.cache.get(token)) is not None:
+            # Each hit is one decode and one user query saved
+            metrics.incr("token_cache.hits")
+            make_transient_to_detached(cached)
+            session = user_manager.user_db.session  # pyright: ignore[reportAttributeAccessIssue]
+            return await session.merge(cached, load=False)
+
+        metrics.incr("token_cache.misses")
+        generation = self.cache.generation
+        try:
+            data = decode_jwt(token, self.decode_key, self.token_audience, algorithms=[self.algorithm])
+            user = await user_manager.get(user_manager.parse_id(data["sub"]))
+        except (jwt.PyJWTError, KeyError, exceptions.UserNotExists, exceptions.InvalidID):
+            return None
+
+        self.cache.put(token, user, data.get("exp"), generation)
+        return user
+
+
+# Tokens are credentials, so only their digests are kept in memory
+def _digest(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
@@ -0,0 +1,157 @@
+"""
+Bulk user import.
+
+Reads users from a CSV file (with a header row) or an NDJSON file, one user
+per row, with an ``email`` and ``password`` and optionally ``is_active``,
+``is_superuser`` and ``is_verified``. Rows are validated like a
+registration, and then handled in batches:
+
+* emails already seen in the file or already registered are skipped before
+  any hashing;
+* passwords are hashed in chunks spread across an executor (a process pool
+  in the CLI, so every core is used);
+* each batch is inserted in one transaction with ``ON CONFLICT DO
+  NOTHING``, so an email registered concurrently is skipped rather than
+  aborting the batch.
+
+Hashing the next batch overlaps with inserting the previous one.
+"""
+
+import asyncio
+import csv
+import math
+import time
+import uuid
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from itertools import batched
+from pathlib import Path
+from typing import Any
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from api.schemas.user import UserCreate
+from api.services.password_pool import hash_passwords
+from api.services.repositories.users_repository import UsersRepository
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Suffixes read as NDJSON; anything else is read as CSV
+NDJSON_SUFFIXES = frozenset({".ndjson", ".jsonl"})
+
+# A CSV row's columns, or an NDJSON line
+Row = dict[str, Any] | str
+
+
+@dataclass
+class ImportReport:
+    """What an import did, and how fast."""
+
+    created: int = 0
+    duplicates: int = 0
+    # (line number, reason) for each row that could not be imported
+    invalid: list[tuple[int, str]] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def rows(self) -> int:
+        return self.created + self.duplicates + len(self.invalid)
+
+    @property
+    def users_per_second(self) -> float:
+        return self.created / self.seconds if self.seconds else 0.0
+
+
+def read_rows(path: Path) -> Iterator[tuple[int, Row]]:
+    """Yield ``(line number, row)`` for each user in a CSV or NDJSON file"""
+    with path.open(newline="", encoding="utf-8") as file:
+        if path.suffix.lower() in NDJSON_SUFFIXES:
+            for number, line in enumerate(file, start=1):
+                if line.strip():
+                    # Parsed while validating, so a malformed line is reported like an invalid row
+                    yield number, line
+        else:
+            reader = csv.DictReader(file)
+            for row in reader:
+                # Empty optional columns fall back to their defaults
+                yield reader.line_num, {key: value for key, value in row.items() if value not in ("", None)}
+
+
+async def import_users(
+    rows: Iterable[tuple[int, Row]],
+    session_maker: async_sessionmaker[AsyncSession],
+    executor: Executor,
+    workers: int,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> ImportReport:
+    """
+    Create a user for every valid row whose email is not taken yet.
+
+    Args:
+        rows: ``(line number, row)`` pairs, e.g. from ``read_rows``
+        session_maker: Sessions for the batch transactions
+        executor: Where passwords are hashed
+        workers: How many chunks to split each batch's hashing into
+        batch_size: Rows per transaction
+    """
+    report = ImportReport()
+    started = time.perf_counter()
+    seen: set[str] = set()
+    loop = asyncio.get_running_loop()
+
+    async with session_maker() as session:
+        repository = UsersRepository(session)
+        hashing: asyncio.Future[list[list[str]]] | None = None
+        pending: list[UserCreate] = []
+
+        for batch in batched(rows, batch_size):
+            users: list[UserCreate] = []
+            for number, row in batch:
+                try:
+                    user = (
+                        UserCreate.model_validate_json(row) if isinstance(row, str) else UserCreate.model_validate(row)
+                    )
+                except ValidationError as e:
+                    report.invalid.append((number, "; ".join(error["msg"] for error in e.errors())))
+                    continue
+                if user.email.lower() in seen:
+                    report.duplicates += 1
+                    continue
+                seen.add(user.email.lower())
+                users.append(user)
+
+            existing = await repository.existing_emails([user.email for user in users])
+            new_users = [user for user in users if user.email.lower() not in existing]
+            report.duplicates += len(users) - len(new_users)
+
+            next_hashing = asyncio.gather(
+                *(
+                    loop.run_in_executor(executor, hash_passwords, [user.password for user in chunk])
+                    for chunk in batched(new_users, max(1, math.ceil(len(new_users) / workers)))
+                )
+            )
+            if hashing is not None:
+                await _insert(repository, pending, await hashing, report)
+            hashing, pending = next_hashing, new_users
+
+        if hashing is not None:
+            await _insert(repository, pending, await hashing, report)
+
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+# Inserts one batch, counting emails taken since they were checked as duplicates
+async def _insert(
+    repository: UsersRepository, users: list[UserCreate], hashed_chunks: list[list[str]], report: ImportReport
+) -> None:
+    hashed_passwords = [hashed for chunk in hashed_chunks for hashed in chunk]
+    rows = [
+        {"id": uuid.uuid4(), "hashed_password": hashed, **user.model_dump(exclude={"password"})}
+        for user, hashed in zip(users, hashed_passwords, strict=True)
+    ]
+    created = await repository.insert_new_users(rows)
+    report.created += created
+    report.duplicates += len(rows) - created
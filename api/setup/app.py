@@ -2,9 +2,20 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 
-from api.routers import auth, comments, posts
+from api.middleware.compression import CompressionMiddleware
+from api.middleware.query_budget import (
+    QueryBudgetMiddleware,
+    pool_timeout_handler,
+    statement_cancelled_handler,
+    statement_timeout_handler,
+)
+from api.routers import admin, auth, comments, posts
+from api.services.query_budget import StatementCancelledError, StatementTimeoutError
+from api.services.responses import FastJSONResponse
 from api.setup.database import create_db_and_tables
+from api.setup.env import REQUEST_STATEMENT_TIMEOUT_MS, ROUTE_STATEMENT_TIMEOUTS_MS
 
 
 @asynccontextmanager
@@ -21,6 +32,7 @@ app = FastAPI(
     description="A FastAPI application with proper structure and absolute imports",
     version="0.1.0",
     lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 # Configure CORS middleware
@@ -32,10 +44,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON/NDJSON responses (zstd or brotli when installed, else gzip)
+app.add_middleware(CompressionMiddleware)
+
+# Limit how long each request's statements run, and cancel them when the
+# client disconnects; statements past their budget answer 504, and requests
+# that found no free pooled connection in time 503
+app.add_middleware(
+    QueryBudgetMiddleware,
+    statement_timeout_ms=REQUEST_STATEMENT_TIMEOUT_MS,
+    route_timeouts_ms=ROUTE_STATEMENT_TIMEOUTS_MS,
+)
+app.add_exception_handler(StatementTimeoutError, statement_timeout_handler)
+app.add_exception_handler(StatementCancelledError, statement_cancelled_handler)
+app.add_exception_handler(PoolTimeoutError, pool_timeout_handler)
+
 # Include routers
 app.include_router(posts.router, prefix="/api/v1/posts", tags=["posts"])
 app.include_router(comments.router, prefix="/api/v1/comments", tags=["comments"])
 app.include_router(auth.router, prefix="/auth", tags=["authentication"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["admin"])
 
 
 # Health check endpoint
@@ -1,26 +1,39 @@
 import os
 import uuid
 from collections.abc import AsyncGenerator
-from typing import Annotated, override
+from typing import Annotated, Any, override
 
+import jwt
 from fastapi import Depends, Request
-from fastapi_users import BaseUserManager, FastAPIUsers, UUIDIDMixin
+from fastapi.security import OAuth2PasswordRequestForm
+from fastapi_users import BaseUserManager, FastAPIUsers, UUIDIDMixin, exceptions, schemas
 from fastapi_users.authentication import (
     AuthenticationBackend,
     CookieTransport,
     JWTStrategy,
 )
+from fastapi_users.jwt import decode_jwt, generate_jwt
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.models.user import User
+from api.services.password_pool import PasswordPool
+from api.services.repositories.base_repository import BaseRepository
+from api.services.token_cache import CachedJWTStrategy, TokenCache
 from api.setup.database import get_async_session
+from api.setup.env import PASSWORD_HASH_WORKERS, TOKEN_CACHE_MAX_ENTRIES, TOKEN_CACHE_TTL
 
 # TODO: Will need better config/secret management
 SECRET: str = os.getenv("JWT_SECRET", "")
 if SECRET == "":
     raise ValueError("JWT_SECRET environment variable is not set")
 
+# Users resolved from session tokens, shared by every request in this process
+token_cache = TokenCache(max_entries=TOKEN_CACHE_MAX_ENTRIES, ttl=TOKEN_CACHE_TTL)
+
+# Threads that hash and verify passwords, so logins do not block the event loop
+password_pool = PasswordPool(max_workers=PASSWORD_HASH_WORKERS)
+
 
 async def get_user_db(
     session: Annotated[AsyncSession, Depends(get_async_session)],
@@ -38,22 +51,134 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
 
     reset_password_token_secret = SECRET
     verification_token_secret = SECRET
+    password_pool: PasswordPool = password_pool
+
+    # fastapi-users calls the (synchronous) password helper inline; these
+    # overrides keep its behaviour but send every helper call to the pool.
+
+    @override
+    async def create(
+        self, user_create: schemas.BaseUserCreate, safe: bool = False, request: Request | None = None
+    ) -> User:
+        await self.validate_password(user_create.password, user_create)
+        if await self.user_db.get_by_email(user_create.email) is not None:
+            raise exceptions.UserAlreadyExists()
+
+        user_dict = user_create.create_update_dict() if safe else user_create.create_update_dict_superuser()
+        password = user_dict.pop("password")
+        user_dict["hashed_password"] = await self.password_pool.run(self.password_helper.hash, password)
+        created_user = await self.user_db.create(user_dict)
+        await self.on_after_register(created_user, request)
+        return created_user
+
+    @override
+    async def authenticate(self, credentials: OAuth2PasswordRequestForm) -> User | None:
+        try:
+            user = await self.get_by_email(credentials.username)
+        except exceptions.UserNotExists:
+            # Hash anyway, so unknown emails take as long as wrong passwords
+            await self.password_pool.run(self.password_helper.hash, credentials.password)
+            return None
+
+        verified, updated_password_hash = await self.password_pool.run(
+            self.password_helper.verify_and_update, credentials.password, user.hashed_password
+        )
+        if not verified:
+            return None
+        # Upgrade the stored hash if the helper's preferred scheme changed
+        if updated_password_hash is not None:
+            await self.user_db.update(user, {"hashed_password": updated_password_hash})
+        return user
+
+    @override
+    async def forgot_password(self, user: User, request: Request | None = None) -> None:
+        if not user.is_active:
+            raise exceptions.UserInactive()
+
+        token_data = {
+            "sub": str(user.id),
+            "password_fgpt": await self.password_pool.run(self.password_helper.hash, user.hashed_password),
+            "aud": self.reset_password_token_audience,
+        }
+        token = generate_jwt(token_data, self.reset_password_token_secret, self.reset_password_token_lifetime_seconds)
+        await self.on_after_forgot_password(user, token, request)
+
+    @override
+    async def reset_password(self, token: str, password: str, request: Request | None = None) -> User:
+        try:
+            data = decode_jwt(token, self.reset_password_token_secret, [self.reset_password_token_audience])
+            user = await self.get(self.parse_id(data["sub"]))
+            password_fingerprint = data["password_fgpt"]
+        except (jwt.PyJWTError, KeyError, exceptions.InvalidID):
+            raise exceptions.InvalidResetPasswordToken() from None
+
+        valid_password_fingerprint, _ = await self.password_pool.run(
+            self.password_helper.verify_and_update, user.hashed_password, password_fingerprint
+        )
+        if not valid_password_fingerprint:
+            raise exceptions.InvalidResetPasswordToken()
+        if not user.is_active:
+            raise exceptions.UserInactive()
+
+        updated_user = await self._update(user, {"password": password})
+        await self.on_after_reset_password(user, request)
+        return updated_user
+
+    @override
+    async def _update(self, user: User, update_dict: dict[str, Any]) -> User:
+        # Hash a new password here, and hand the rest to fastapi-users
+        password = update_dict.get("password")
+        if password is not None:
+            await self.validate_password(password, user)
+            hashed_password = await self.password_pool.run(self.password_helper.hash, password)
+            update_dict = {key: value for key, value in update_dict.items() if key != "password"}
+            update_dict["hashed_password"] = hashed_password
+        return await super()._update(user, update_dict)
 
     @override
     async def on_after_register(self, user: User, request: Request | None = None):
         """Called after a user registers."""
         print(f"User {user.id} has registered.")
 
+    @override
+    async def on_after_update(self, user: User, update_dict: dict[str, Any], request: Request | None = None):
+        """Called after a user is updated, including (de)activation and password changes."""
+        token_cache.invalidate_user(user.id)
+
+    @override
+    async def on_before_delete(self, user: User, request: Request | None = None):
+        """Called before a user is deleted, in the transaction that deletes them."""
+        # Their posts and comments go with them through ON DELETE CASCADE
+        session = self.user_db.session  # pyright: ignore[reportAttributeAccessIssue]
+        BaseRepository(session, autocommit=False).mark_changed(User, cascade=True)
+        token_cache.invalidate_user(user.id)
+
+    @override
+    async def on_after_delete(self, user: User, request: Request | None = None):
+        """Called after a user is deleted."""
+        # Again, so a request that loaded the user during the delete cannot keep it
+        token_cache.invalidate_user(user.id)
+
     @override
     async def on_after_forgot_password(self, user: User, token: str, request: Request | None = None):
         """Called after a user requests password reset."""
         print(f"User {user.id} has forgot their password. Reset token: {token}")
 
+    @override
+    async def on_after_reset_password(self, user: User, request: Request | None = None):
+        """Called after a user resets their password."""
+        token_cache.invalidate_user(user.id)
+
     @override
     async def on_after_request_verify(self, user: User, token: str, request: Request | None = None):
         """Called after a user requests verification."""
         print(f"Verification requested for user {user.id}. Verification token: {token}")
 
+    @override
+    async def on_after_verify(self, user: User, request: Request | None = None):
+        """Called after a user verifies their email."""
+        token_cache.invalidate_user(user.id)
+
 
 async def get_user_manager(
     user_db: Annotated[SQLAlchemyUserDatabase[User, uuid.UUID], Depends(get_user_db)],
@@ -71,7 +196,7 @@ async def get_user_manager(
 
 
 def get_jwt_strategy() -> JWTStrategy[User, uuid.UUID]:
-    return JWTStrategy(secret=SECRET, lifetime_seconds=3600)
+    return CachedJWTStrategy(secret=SECRET, lifetime_seconds=3600, cache=token_cache)
 
 
 # Authentication backend setup
@@ -1,16 +1,239 @@
 from collections.abc import AsyncGenerator
+from typing import Any
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import URL, Engine, Select, event, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, SessionTransaction
 from sqlmodel import SQLModel
 
-sqlite_file_name = "database.sqlite"
-sqlite_url = f"sqlite+aiosqlite:///{sqlite_file_name}"
-engine = create_async_engine(sqlite_url)
-async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
+from api.services.query_budget import enable_statement_budgets
+from api.services.replicas import ReplicaSet
+from api.setup.env import (
+    DATABASE_MAX_OVERFLOW,
+    DATABASE_POOL_PRE_PING,
+    DATABASE_POOL_RECYCLE,
+    DATABASE_POOL_SIZE,
+    DATABASE_POOL_TIMEOUT,
+    DATABASE_REPLICA_RETRY_AFTER,
+    DATABASE_REPLICA_URLS,
+    DATABASE_STATEMENT_CACHE_SIZE,
+    DATABASE_STATEMENT_TIMEOUT_MS,
+    DATABASE_URL,
+    SQLITE_PROFILE,
+)
+from api.setup.sqlite import create_sqlite_engines
+
+
+def _enable_sqlite_foreign_keys(dbapi_connection: Any, _connection_record: Any) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def enable_sqlite_foreign_keys(async_engine: AsyncEngine) -> None:
+    """
+    Enforce foreign keys on every SQLite connection.
+
+    SQLite ignores FOREIGN KEY clauses (including ON DELETE CASCADE) unless
+    this pragma is set per connection. Repositories delete rows with plain
+    DELETE statements and rely on the database to cascade.
+    """
+    event.listen(async_engine.sync_engine, "connect", _enable_sqlite_foreign_keys)
+
+
+# Arguments only queue pools accept
+_QUEUE_POOL_OPTIONS = frozenset({"pool_size", "max_overflow", "pool_timeout"})
+
+
+def engine_options(url: str | URL) -> dict[str, Any]:
+    """
+    ``create_async_engine`` arguments for ``url`` from the ``DATABASE_*`` settings.
+
+    SQLite keeps SQLAlchemy's default pool. Other databases get a sized queue
+    pool; Postgres over asyncpg also gets its prepared statement cache size
+    and a server-side statement timeout on every connection.
+    """
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        return {}
+
+    options: dict[str, Any] = {
+        "pool_size": DATABASE_POOL_SIZE,
+        "max_overflow": DATABASE_MAX_OVERFLOW,
+        "pool_timeout": DATABASE_POOL_TIMEOUT,
+        "pool_recycle": DATABASE_POOL_RECYCLE,
+        "pool_pre_ping": DATABASE_POOL_PRE_PING,
+    }
+    if url.get_driver_name() == "asyncpg":
+        server_settings = {"application_name": "fastapi-app"}
+        if DATABASE_STATEMENT_TIMEOUT_MS:
+            server_settings["statement_timeout"] = str(DATABASE_STATEMENT_TIMEOUT_MS)
+        options["connect_args"] = {
+            # SQLAlchemy's cache of asyncpg prepared statements, and asyncpg's own
+            "prepared_statement_cache_size": DATABASE_STATEMENT_CACHE_SIZE,
+            "statement_cache_size": DATABASE_STATEMENT_CACHE_SIZE,
+            "server_settings": server_settings,
+        }
+    return options
+
+
+def create_database_engine(url: str | URL = DATABASE_URL, **overrides: Any) -> AsyncEngine:
+    """
+    Create an engine for ``url`` configured from the ``DATABASE_*`` settings.
+
+    Args:
+        url: Async SQLAlchemy database URL
+        overrides: ``create_async_engine`` arguments that replace the configured
+            ones, e.g. ``poolclass=NullPool`` for one-off scripts
+    """
+    options = engine_options(url)
+    if "poolclass" in overrides:
+        # Sizing only applies to the default queue pool
+        options = {key: value for key, value in options.items() if key not in _QUEUE_POOL_OPTIONS}
+    async_engine = create_async_engine(url, **{**options, **overrides})
+    if async_engine.dialect.name == "sqlite":
+        enable_sqlite_foreign_keys(async_engine)
+    server_timeout_ms = DATABASE_STATEMENT_TIMEOUT_MS if async_engine.dialect.driver == "asyncpg" else 0
+    enable_statement_budgets(async_engine, server_timeout_ms)
+    return async_engine
+
+
+class WriteTrackingSession(Session):
+    """
+    Session that records whether its current transaction has written.
+
+    Once a transaction flushes or runs anything but a SELECT, ``writing`` is
+    set until it ends. Every statement goes to the session's bind: sessions
+    that may write are on the writer from their first statement, so what
+    they read before writing is read inside their write transaction.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.writing = False
+
+    def get_bind(self, mapper: Any = None, clause: Any = None, **kwargs: Any) -> Engine:
+        if self._flushing or not isinstance(clause, Select):
+            self.writing = True
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+
+@event.listens_for(WriteTrackingSession, "after_transaction_end")
+def _end_writing(session: WriteTrackingSession, transaction: SessionTransaction) -> None:
+    if transaction.parent is None:
+        session.writing = False
+
+
+class ReleasingSession(AsyncSession):
+    """
+    Session that hands its connection back to the pool as soon as a query returns.
+
+    A session checks a connection out at its first query and normally keeps
+    it until the session closes, which for a request is after the response
+    has been serialized and sent. Every other query-issuing method (``execute``,
+    ``scalar``, ``scalars``, ``get``, ``get_one``, ``refresh`` and ``merge``)
+    buffers its rows, so this session ends the transaction right after each
+    of them instead, whichever of them ``AsyncSession`` implements on another.
+    It commits, so the objects it loaded stay usable (sessions here do not
+    expire on commit), and the next query checks a connection out again.
+    Writes and open streams keep the connection until they are done with: a
+    transaction that wrote (see ``WriteTrackingSession.writing``) or has unflushed
+    changes is left open, and a session that streamed keeps its connection.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._streamed = False
+
+    async def execute(self, *args: Any, **kwargs: Any) -> Any:
+        result = await super().execute(*args, **kwargs)
+        await self.release()
+        return result
+
+    async def scalar(self, *args: Any, **kwargs: Any) -> Any:
+        result = await super().scalar(*args, **kwargs)
+        await self.release()
+        return result
+
+    async def scalars(self, *args: Any, **kwargs: Any) -> Any:
+        result = await super().scalars(*args, **kwargs)
+        await self.release()
+        return result
+
+    async def get(self, *args: Any, **kwargs: Any) -> Any:
+        result = await super().get(*args, **kwargs)
+        await self.release()
+        return result
+
+    async def get_one(self, *args: Any, **kwargs: Any) -> Any:
+        result = await super().get_one(*args, **kwargs)
+        await self.release()
+        return result
+
+    async def refresh(self, *args: Any, **kwargs: Any) -> None:
+        await super().refresh(*args, **kwargs)
+        await self.release()
+
+    async def merge(self, *args: Any, **kwargs: Any) -> Any:
+        result = await super().merge(*args, **kwargs)
+        await self.release()
+        return result
+
+    async def stream(self, *args: Any, **kwargs: Any) -> Any:
+        self._streamed = True
+        return await super().stream(*args, **kwargs)
+
+    async def stream_scalars(self, *args: Any, **kwargs: Any) -> Any:
+        self._streamed = True
+        return await super().stream_scalars(*args, **kwargs)
+
+    async def release(self) -> None:
+        """End the current transaction, returning its connection, unless changes are pending or a stream is open"""
+        if (
+            self._streamed
+            or not self.in_transaction()
+            or getattr(self.sync_session, "writing", False)
+            or self.new
+            or self.dirty
+            or self.deleted
+        ):
+            return
+        await self.commit()
+
+
+def create_session_maker(
+    bind: AsyncEngine | None = None, session_class: type[AsyncSession] = AsyncSession
+) -> async_sessionmaker[AsyncSession]:
+    """Sessions of ``session_class`` on ``bind`` (or a bind given per session)"""
+    return async_sessionmaker(
+        bind, class_=session_class, expire_on_commit=False, sync_session_class=WriteTrackingSession
+    )
+
+
+# ``engine`` takes writes (and DDL); ``read_engine`` is the same engine unless
+# the SQLite production profile splits reads off
+if SQLITE_PROFILE == "production" and make_url(DATABASE_URL).get_backend_name() == "sqlite":
+    engine, read_engine = create_sqlite_engines(DATABASE_URL)
+else:
+    engine = read_engine = create_database_engine()
+# Sessions that may write are on ``engine`` for every statement
+async_session_maker = create_session_maker(engine)
+# For the user database, which commits after every write: its connections go
+# back to the pool after each query
+releasing_session_maker = create_session_maker(engine, ReleasingSession)
+
+# Read-only handlers get sessions on a replica: a configured replica URL, or
+# the SQLite production profile's read-only pool. Bound per session.
+replicas = ReplicaSet(
+    engine,
+    [create_database_engine(url) for url in DATABASE_REPLICA_URLS] or [read_engine],
+    retry_after=DATABASE_REPLICA_RETRY_AFTER,
+)
+read_session_maker = create_session_maker(session_class=ReleasingSession)
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
-    async with async_session_maker() as session:
+    async with releasing_session_maker() as session:
         yield session
 
 
@@ -1,20 +1,85 @@
 import uuid
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, Collection, Sequence
 from typing import Annotated
 
-from fastapi import Depends
+from fastapi import Depends, HTTPException, Query, Request
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
+from api.models.comment import Comment
 from api.models.user import User
-from api.services.repositories.comments_repository import CommentsRepository
-from api.services.repositories.posts_repository import PostsRepository
-from api.setup.auth import UserManager, current_superuser, current_user
-from api.setup.database import get_async_session
+from api.services.group_commit import GroupCommitter
+from api.services.metrics import metrics
+from api.services.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    InvalidCursorError,
+    PageRequest,
+    decode_cursor,
+)
+from api.services.replicas import RecentWrites
+from api.services.repositories.comments_repository import COMMENT_FIELDS, CommentsRepository, comment_cache
+from api.services.repositories.posts_repository import POST_EXPANSIONS, POST_FIELDS, PostsRepository, post_cache
+from api.services.response_cache import ResponseCache, create_response_store
+from api.services.streaming import NDJSON_MEDIA_TYPE
+from api.setup.auth import UserManager, cookie_transport, current_superuser, current_user
+from api.setup.database import (
+    async_session_maker,
+    get_async_session,
+    read_engine,
+    read_session_maker,
+    replicas,
+)
+from api.setup.env import (
+    COMMENT_GROUP_COMMIT_MAX_ROWS,
+    COMMENT_GROUP_COMMIT_WINDOW_MS,
+    DATABASE_REPLICA_URLS,
+    READ_YOUR_WRITES_SECONDS,
+    RESPONSE_CACHE_BACKEND,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_PATH,
+)
 
 # Database Dependencies
 AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_session)]
 
+# Clients that just wrote, whose reads stay on the primary for a while
+recent_writes = RecentWrites(window=READ_YOUR_WRITES_SECONDS)
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_recent_write(session: Session) -> None:
+    if client := session.info.get("client"):
+        recent_writes.mark(client)
+
+
+# Write sessions are on the primary and remember the client (by its session
+# cookie) so that committing makes its reads sticky.
+async def get_write_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    async with async_session_maker(info={"client": request.cookies.get(cookie_transport.cookie_name)}) as session:
+        yield session
+
+
+# Read sessions are on a replica, unless the client wrote within the last
+# READ_YOUR_WRITES_SECONDS, when they read from the primary's read engine.
+# Only for handlers that never write: they hand their connection back after
+# every query, before the response is serialized.
+async def get_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    client = request.cookies.get(cookie_transport.cookie_name)
+    if client and recent_writes.is_recent(client):
+        metrics.incr("replicas.sticky_reads")
+        bind = read_engine
+    else:
+        bind = replicas.choose()
+    async with read_session_maker(bind=bind) as session:
+        yield session
+
+
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_session)]
+WriteSessionDep = Annotated[AsyncSession, Depends(get_write_session)]
+
 
 # User Database Dependencies
 async def get_user_db(session: AsyncSessionDep) -> AsyncGenerator[SQLAlchemyUserDatabase[User, uuid.UUID], None]:
@@ -32,20 +97,182 @@ async def get_user_manager(user_db: UserDBDep) -> AsyncGenerator[UserManager, No
 UserManagerDep = Annotated[UserManager, Depends(get_user_manager)]
 
 
+# Dependencies that do no blocking work are ``async def`` so FastAPI calls them
+# inline; plain ``def`` dependencies are each sent to the threadpool.
+
+
 # Repository Dependencies
-def get_posts_repository(session: AsyncSessionDep):
-    return PostsRepository(session)
+# Request-scoped repositories share the request's session and never commit on
+# their own: each route is one unit of work and commits once when it is done.
+# Single-entity lookups read through the process-wide entity caches.
+# The readers are the same repositories on a read session, for GET handlers.
+# Writers invalidate the entity caches when they commit; a lagging replica
+# could fill them again with older rows, so readers on replicas bypass them.
+reader_caches = not DATABASE_REPLICA_URLS
+
+
+async def get_posts_repository(session: WriteSessionDep):
+    return PostsRepository(session, autocommit=False, cache=post_cache)
 
 
 PostsRepositoryDep = Annotated[PostsRepository, Depends(get_posts_repository)]
 
 
-def get_comments_repository(session: AsyncSessionDep):
-    return CommentsRepository(session)
+async def get_posts_reader(session: ReadSessionDep):
+    return PostsRepository(session, autocommit=False, cache=post_cache if reader_caches else None)
+
+
+PostsReaderDep = Annotated[PostsRepository, Depends(get_posts_reader)]
+
+
+async def get_comments_repository(session: WriteSessionDep):
+    return CommentsRepository(session, autocommit=False, cache=comment_cache)
 
 
 CommentsRepositoryDep = Annotated[CommentsRepository, Depends(get_comments_repository)]
 
+
+async def get_comments_reader(session: ReadSessionDep):
+    return CommentsRepository(session, autocommit=False, cache=comment_cache if reader_caches else None)
+
+
+CommentsReaderDep = Annotated[CommentsRepository, Depends(get_comments_reader)]
+
+
+# Group Commit Dependencies
+# Grouped comments are written on sessions of their own, not the request's,
+# as one transaction serves many requests.
+async def commit_comments(comments: Sequence[Comment]) -> Sequence[Comment]:
+    async with async_session_maker() as session:
+        comments_repository = CommentsRepository(session, autocommit=False, cache=comment_cache)
+        created_comments = await comments_repository.create_comments(comments)
+        await comments_repository.commit()
+        return created_comments
+
+
+comment_writer: GroupCommitter[Comment, Comment] | None = (
+    GroupCommitter(
+        commit_comments,
+        COMMENT_GROUP_COMMIT_WINDOW_MS / 1000,
+        COMMENT_GROUP_COMMIT_MAX_ROWS,
+        name="group_commit.comments",
+    )
+    if COMMENT_GROUP_COMMIT_WINDOW_MS > 0
+    else None
+)
+
+
+async def get_comment_writer() -> GroupCommitter[Comment, Comment] | None:
+    return comment_writer
+
+
+CommentWriterDep = Annotated[GroupCommitter[Comment, Comment] | None, Depends(get_comment_writer)]
+
+
+# Response Cache Dependencies
+response_cache = ResponseCache(
+    create_response_store(RESPONSE_CACHE_BACKEND, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_PATH)
+)
+
+
+async def get_response_cache() -> ResponseCache:
+    return response_cache
+
+
+ResponseCacheDep = Annotated[ResponseCache, Depends(get_response_cache)]
+
+
+# Pagination Dependencies
+async def get_page_request(
+    limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE, description="Maximum number of items to return")] = (
+        DEFAULT_PAGE_SIZE
+    ),
+    cursor: Annotated[str | None, Query(description="Opaque cursor from a previous page's next_cursor")] = None,
+) -> PageRequest:
+    try:
+        after_id = decode_cursor(cursor) if cursor is not None else None
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    return PageRequest(limit=limit, after_id=after_id)
+
+
+PageRequestDep = Annotated[PageRequest, Depends(get_page_request)]
+
+
+async def get_requested_ids(
+    ids: Annotated[
+        str | None,
+        Query(pattern=r"^\d+(,\d+)*$", description="Comma-separated IDs to fetch in one request, e.g. 1,2,3"),
+    ] = None,
+) -> list[int] | None:
+    if ids is None:
+        return None
+    requested_ids = [int(item_id) for item_id in ids.split(",")]
+    if len(requested_ids) > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PAGE_SIZE} ids can be requested at once")
+    return requested_ids
+
+
+RequestedIdsDep = Annotated[list[int] | None, Depends(get_requested_ids)]
+
+
+async def get_stream_requested(
+    request: Request,
+    stream: Annotated[bool, Query(description="Stream every matching item as NDJSON instead of one page")] = False,
+) -> bool:
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+StreamRequestedDep = Annotated[bool, Depends(get_stream_requested)]
+
+
+def _parse_name_list(value: str | None, allowed: Collection[str], error: str) -> frozenset[str] | None:
+    if not value:
+        return None
+    names = frozenset(name.strip() for name in value.split(","))
+    unknown = names.difference(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"{error}: {', '.join(sorted(unknown))}")
+    return names
+
+
+async def get_post_expand(
+    expand: Annotated[
+        str | None,
+        Query(description=f"Comma-separated relations to include, any of: {', '.join(POST_EXPANSIONS)}"),
+    ] = None,
+) -> frozenset[str]:
+    return _parse_name_list(expand, POST_EXPANSIONS.keys(), "Cannot expand") or frozenset()
+
+
+PostExpandDep = Annotated[frozenset[str], Depends(get_post_expand)]
+
+
+async def get_post_fields(
+    fields: Annotated[
+        str | None,
+        Query(description=f"Comma-separated fields to return, any of: {', '.join(sorted(POST_FIELDS))}"),
+    ] = None,
+) -> frozenset[str] | None:
+    names = _parse_name_list(fields, POST_FIELDS, "Unknown fields")
+    return names | {"id"} if names is not None else None
+
+
+PostFieldsDep = Annotated[frozenset[str] | None, Depends(get_post_fields)]
+
+
+async def get_comment_fields(
+    fields: Annotated[
+        str | None,
+        Query(description=f"Comma-separated fields to return, any of: {', '.join(sorted(COMMENT_FIELDS))}"),
+    ] = None,
+) -> frozenset[str] | None:
+    names = _parse_name_list(fields, COMMENT_FIELDS, "Unknown fields")
+    return names | {"id"} if names is not None else None
+
+
+CommentFieldsDep = Annotated[frozenset[str] | None, Depends(get_comment_fields)]
+
 # Authentication Dependencies
 CurrentUserDep = Annotated[User, Depends(current_user)]
 CurrentSuperuserDep = Annotated[User, Depends(current_superuser)]
@@ -0,0 +1,128 @@
+"""
+SQLite production profile.
+
+In its default rollback-journal mode SQLite makes readers and the writer
+wait for each other, and a deferred transaction that starts reading and then
+writes can fail at once with "database is locked" when another process is
+writing. The production profile instead:
+
+* runs every connection in WAL mode with ``synchronous=NORMAL``, a busy
+  timeout, memory-mapped I/O and a larger page cache, and enforces foreign
+  keys, so readers never wait for the writer;
+* gives each process a pool of read-only connections for reads, and a single
+  writer connection, so writes within a process queue in the pool instead of
+  contending for the database lock;
+* starts write transactions with ``BEGIN IMMEDIATE``, taking the write lock
+  before anything is read. Waiting for another process then happens at the
+  start of the transaction, where it is safe to retry, which the writer does
+  a bounded number of times with doubling backoff;
+* interrupts statements that run past their request's budget (see
+  ``api.services.query_budget``), so a runaway query cannot hold the writer.
+
+Sessions that may write run every statement on the writer, so what they
+read before writing is read inside their ``BEGIN IMMEDIATE`` transaction;
+only read-only handlers' sessions use the reader pool (see
+``api.setup.dependencies``).
+"""
+
+import asyncio
+from typing import Any
+
+from sqlalchemy import Connection, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.util import await_only
+
+from api.services.metrics import metrics
+from api.services.query_budget import enable_statement_budgets
+from api.setup.env import (
+    DATABASE_POOL_TIMEOUT,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_CACHE_SIZE,
+    SQLITE_MMAP_SIZE,
+    SQLITE_READERS,
+    SQLITE_WRITE_BACKOFF_MS,
+    SQLITE_WRITE_RETRIES,
+)
+
+
+def production_pragmas(busy_timeout_ms: int, mmap_size: int, cache_size: int) -> list[str]:
+    """The pragmas applied to every connection of the production profile"""
+    return [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={busy_timeout_ms}",
+        f"PRAGMA mmap_size={mmap_size}",
+        # Negative sizes are in KiB rather than pages
+        f"PRAGMA cache_size=-{cache_size // 1024}",
+        "PRAGMA foreign_keys=ON",
+    ]
+
+
+def create_sqlite_engines(
+    url: str,
+    readers: int = SQLITE_READERS,
+    busy_timeout_ms: int = SQLITE_BUSY_TIMEOUT_MS,
+    retries: int = SQLITE_WRITE_RETRIES,
+    backoff_ms: int = SQLITE_WRITE_BACKOFF_MS,
+    mmap_size: int = SQLITE_MMAP_SIZE,
+    cache_size: int = SQLITE_CACHE_SIZE,
+) -> tuple[AsyncEngine, AsyncEngine]:
+    """
+    Create the writer and reader engines of the production profile for ``url``.
+
+    Args:
+        url: An aiosqlite database file URL
+        readers: Read-only connections kept by the reader engine
+        busy_timeout_ms: How long a connection waits on a lock before failing
+        retries: Further attempts at taking the write lock once the busy timeout expired
+        backoff_ms: Wait before the first retry, doubled for each one after
+        mmap_size: Bytes of the database file memory-mapped per connection
+        cache_size: Bytes of page cache per connection
+
+    Returns:
+        ``(writer, reader)``
+    """
+    pragmas = production_pragmas(busy_timeout_ms, mmap_size, cache_size)
+
+    writer = create_async_engine(url, pool_size=1, max_overflow=0, pool_timeout=DATABASE_POOL_TIMEOUT)
+
+    def connect_writer(dbapi_connection: Any, _connection_record: Any) -> None:
+        _execute(dbapi_connection, pragmas)
+        # Transactions are begun explicitly, below, rather than by the driver
+        dbapi_connection.isolation_level = None
+
+    def begin_immediate(connection: Connection) -> None:
+        for attempt in range(retries + 1):
+            try:
+                connection.exec_driver_sql("BEGIN IMMEDIATE")
+                return
+            except OperationalError as e:
+                if "locked" not in str(e.orig) and "busy" not in str(e.orig):
+                    raise
+                if attempt == retries:
+                    metrics.incr("sqlite.write_lock_timeouts")
+                    raise
+            metrics.incr("sqlite.write_retries")
+            # Runs inside SQLAlchemy's greenlet, so the event loop keeps serving
+            await_only(asyncio.sleep(backoff_ms * 2**attempt / 1000))
+
+    event.listen(writer.sync_engine, "connect", connect_writer)
+    event.listen(writer.sync_engine, "begin", begin_immediate)
+
+    reader = create_async_engine(url, pool_size=readers, max_overflow=0, pool_timeout=DATABASE_POOL_TIMEOUT)
+
+    def connect_reader(dbapi_connection: Any, _connection_record: Any) -> None:
+        _execute(dbapi_connection, [*pragmas, "PRAGMA query_only=ON"])
+
+    event.listen(reader.sync_engine, "connect", connect_reader)
+    for engine in (writer, reader):
+        enable_statement_budgets(engine)
+    return writer, reader
+
+
+def _execute(dbapi_connection: Any, statements: list[str]) -> None:
+    cursor = dbapi_connection.cursor()
+    for statement in statements:
+        cursor.execute(statement)
+    cursor.close()
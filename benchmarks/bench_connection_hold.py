@@ -0,0 +1,113 @@
+"""
+Benchmark: how long list requests hold a pooled connection.
+
+Runs ``--clients`` concurrent clients against a small pool (``--pool-size``
+connections) on a SQLite file. Each request does what ``GET /api/v1/posts``
+does: reads a page of ``--rows`` posts through a repository, then encodes
+the page to JSON and spends ``--send-ms`` handing it to a slow client,
+before its session closes. Two session classes are compared:
+
+* held: a plain ``AsyncSession`` keeps its connection until it closes;
+* released: a ``ReleasingSession`` hands it back as soon as the query returns.
+
+Reports requests per second, how long each checkout held its connection,
+and how long requests waited for one.
+
+Run with:
+    JWT_SECRET=bench python -m benchmarks.bench_connection_hold [--clients 32] [--rows 500]
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import SQLModel
+
+from api.models.post import Post
+from api.schemas.pagination import Page
+from api.schemas.post import PostRead
+from api.services.repositories.posts_repository import PostsRepository
+from api.services.responses import FastJSONResponse
+from api.setup.database import ReleasingSession, create_database_engine, create_session_maker
+
+MODES: dict[str, type[AsyncSession]] = {"held": AsyncSession, "released": ReleasingSession}
+
+
+async def run_mode(
+    directory: Path, mode: str, clients: int, requests: int, rows: int, pool_size: int, send_ms: float
+) -> None:
+    url = f"sqlite+aiosqlite:///{directory / 'bench.sqlite'}"
+    engine = create_database_engine(url, pool_size=pool_size, max_overflow=0)
+    session_maker = create_session_maker(engine, session_class=MODES[mode])
+
+    held: list[float] = []
+    checked_out: dict[int, float] = {}
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def on_checkout(dbapi_connection, _record, _proxy):
+        checked_out[id(dbapi_connection)] = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def on_checkin(dbapi_connection, _record):
+        if (started := checked_out.pop(id(dbapi_connection), None)) is not None:
+            held.append((time.perf_counter() - started) * 1000)
+
+    waits: list[float] = []
+
+    async def client() -> None:
+        for _ in range(requests):
+            async with session_maker() as session:
+                started = time.perf_counter()
+                posts = await PostsRepository(session, autocommit=False).page_posts(rows)
+                waits.append((time.perf_counter() - started) * 1000)
+                response = FastJSONResponse(Page(items=PostRead.from_posts(posts)))
+                # The response is sent before the request's session closes
+                await asyncio.sleep(send_ms / 1000 * len(response.body) / 1_000_000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+
+    print(
+        f"  {mode:<9}: {clients * requests / elapsed:7.1f} requests/s  connection held {statistics.mean(held):7.1f} ms"
+        f"  query incl. pool wait p50 {statistics.median(waits):7.1f} ms"
+    )
+
+
+async def seed(directory: Path, rows: int) -> None:
+    engine = create_database_engine(f"sqlite+aiosqlite:///{directory / 'bench.sqlite'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with create_session_maker(engine)() as session:
+        posts_repository = PostsRepository(session, autocommit=False)
+        for i in range(rows):
+            await posts_repository.create_post(
+                Post(title=f"Post {i}", body="Lorem ipsum dolor sit amet. " * 40, is_published=True)
+            )
+        await posts_repository.commit()
+    await engine.dispose()
+
+
+async def main(clients: int, requests: int, rows: int, pool_size: int, send_ms: float) -> None:
+    print(f"{clients} clients x {requests} requests of {rows} posts, pool of {pool_size}, {send_ms} ms to send 1 MB")
+    with tempfile.TemporaryDirectory() as directory:
+        await seed(Path(directory), rows)
+        for mode in MODES:
+            await run_mode(Path(directory), mode, clients, requests, rows, pool_size, send_ms)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--send-ms", type=float, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.requests, args.rows, args.pool_size, args.send_ms))
@@ -0,0 +1,109 @@
+"""
+Benchmark: comments per second with and without group commit.
+
+Runs ``--clients`` concurrent clients that each create ``--comments``
+comments on a fresh SQLite file, the way ``POST /api/v1/comments`` does:
+
+* per-comment: every comment is its own transaction and disk sync;
+* grouped: comments go through a ``GroupCommitter``, which writes those
+  arriving within ``--window-ms`` of each other in one transaction.
+
+Reports throughput, latency percentiles and the average group size.
+
+Run with:
+    JWT_SECRET=bench python -m benchmarks.bench_group_commit [--clients 50] [--comments 20]
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from collections.abc import Awaitable, Callable, Sequence
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlmodel import SQLModel
+
+from api.models.comment import Comment
+from api.services.group_commit import GroupCommitter
+from api.services.metrics import metrics
+from api.services.repositories.comments_repository import CommentsRepository
+from api.setup.database import create_database_engine, create_session_maker
+
+
+async def run_clients(create: Callable[[Comment], Awaitable[Comment]], clients: int, comments: int) -> list[float]:
+    """Create ``comments`` comments from each of ``clients`` clients, returning every latency in ms"""
+    latencies: list[float] = []
+
+    async def client(number: int) -> None:
+        for i in range(comments):
+            started = time.perf_counter()
+            await create(Comment(body=f"Comment {i} from client {number}", is_published=True))
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(client(number) for number in range(clients)))
+    return latencies
+
+
+def per_comment(session_maker: async_sessionmaker[AsyncSession]) -> Callable[[Comment], Awaitable[Comment]]:
+    async def create(comment: Comment) -> Comment:
+        async with session_maker() as session:
+            comments_repository = CommentsRepository(session, autocommit=False)
+            created_comment = await comments_repository.create_comment(comment)
+            await comments_repository.commit()
+            return created_comment
+
+    return create
+
+
+def grouped(
+    session_maker: async_sessionmaker[AsyncSession], window_ms: float, max_rows: int
+) -> Callable[[Comment], Awaitable[Comment]]:
+    async def commit_comments(comments: Sequence[Comment]) -> Sequence[Comment]:
+        async with session_maker() as session:
+            comments_repository = CommentsRepository(session, autocommit=False)
+            created_comments = await comments_repository.create_comments(comments)
+            await comments_repository.commit()
+            return created_comments
+
+    return GroupCommitter(commit_comments, window_ms / 1000, max_rows).submit
+
+
+async def run_mode(directory: Path, mode: str, clients: int, comments: int, window_ms: float, max_rows: int) -> None:
+    engine = create_database_engine(f"sqlite+aiosqlite:///{directory / f'{mode}.sqlite'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    session_maker = create_session_maker(engine)
+    create = per_comment(session_maker) if mode == "per-comment" else grouped(session_maker, window_ms, max_rows)
+
+    metrics.reset()
+    started = time.perf_counter()
+    latencies = sorted(await run_clients(create, clients, comments))
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+
+    groups = metrics.get("group_commit.groups")
+    group_size = f"{metrics.get('group_commit.items') / groups:5.1f}" if groups else "  1.0"
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"  {mode:<12}: {len(latencies) / elapsed:7.1f} comments/s  p50 {statistics.median(latencies):7.1f} ms  "
+        f"p99 {p99:7.1f} ms  {group_size} comments per transaction"
+    )
+
+
+async def main(clients: int, comments: int, window_ms: float, max_rows: int) -> None:
+    print(f"{clients} clients x {comments} comments, window {window_ms} ms, at most {max_rows} per group")
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in ("per-comment", "grouped"):
+            await run_mode(Path(directory), mode, clients, comments, window_ms, max_rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--comments", type=int, default=20)
+    parser.add_argument("--window-ms", type=float, default=2)
+    parser.add_argument("--max-rows", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.comments, args.window_ms, args.max_rows))
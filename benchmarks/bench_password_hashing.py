@@ -0,0 +1,122 @@
+"""
+Benchmark: read latency while a burst of logins is hashed.
+
+Sends ``GET /api/v1/posts`` one request after another for as long as a
+burst of concurrent ``POST /auth/login`` requests runs on the same event
+loop, and reports the read latency percentiles with password hashing:
+
+* before: inline on the event loop (``PasswordPool(max_workers=0)``), so
+  every argon2 verification stalls the reads queued behind it;
+* after: on a bounded thread pool (``PASSWORD_HASH_WORKERS`` threads unless
+  ``--workers`` says otherwise).
+
+The app runs against a temporary SQLite file over an in-process ASGI
+transport.
+
+Run with:
+    JWT_SECRET=bench python -m benchmarks.bench_password_hashing [--logins 20] [--workers N]
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from collections.abc import AsyncGenerator
+from pathlib import Path
+
+import httpx
+from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel
+
+from api.models.post import Post
+from api.models.user import User
+from api.schemas.user import UserCreate
+from api.services.password_pool import PasswordPool
+from api.setup.app import app
+from api.setup.auth import UserManager
+from api.setup.database import get_async_session
+from api.setup.env import PASSWORD_HASH_WORKERS
+
+EMAIL = "bench@example.com"
+PASSWORD = "benchmark-password"  # noqa: S105
+
+
+async def seed(session_maker: async_sessionmaker[AsyncSession]) -> None:
+    async with session_maker() as session:
+        user = await UserManager(SQLAlchemyUserDatabase(session, User)).create(
+            UserCreate(email=EMAIL, password=PASSWORD)
+        )
+        session.add_all(
+            Post(title=f"Post {i}", body="Lorem ipsum dolor sit amet. " * 20, is_published=True, user_id=user.id)
+            for i in range(50)
+        )
+        await session.commit()
+
+
+async def read_latencies(app_client: httpx.AsyncClient, logins: int) -> list[float]:
+    latencies: list[float] = []
+    burst_done = asyncio.Event()
+
+    async def reader() -> None:
+        while not burst_done.is_set():
+            started = time.perf_counter()
+            (await app_client.get("/api/v1/posts")).raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    async def login() -> None:
+        # A separate client, so reads are not sent with the session cookie
+        async with httpx.AsyncClient(transport=app_client._transport, base_url="http://bench") as client:  # pyright: ignore[reportPrivateUsage]
+            response = await client.post("/auth/login", data={"username": EMAIL, "password": PASSWORD})
+            assert response.status_code == 204, response.text
+
+    async def burst() -> None:
+        await asyncio.gather(*(login() for _ in range(logins)))
+        burst_done.set()
+
+    await asyncio.gather(reader(), burst())
+    return latencies
+
+
+def describe(latencies: list[float]) -> str:
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return f"p50 {statistics.median(ordered):7.2f} ms   p99 {p99:7.2f} ms   max {ordered[-1]:7.2f} ms"
+
+
+async def main(logins: int, workers: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(directory) / 'bench.sqlite'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+        async def bench_session() -> AsyncGenerator[AsyncSession, None]:
+            async with session_maker() as session:
+                yield session
+
+        app.dependency_overrides[get_async_session] = bench_session
+        await seed(session_maker)
+
+        results: dict[str, list[float]] = {}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            for label, pool in (("before (inline)", PasswordPool(max_workers=0)), ("after  (pooled)", None)):
+                UserManager.password_pool = pool or PasswordPool(max_workers=workers)
+                # Warm up route, schema and response caches
+                await read_latencies(client, logins=1)
+                results[label] = await read_latencies(client, logins)
+
+        await engine.dispose()
+
+    print(f"GET /api/v1/posts during {logins} concurrent logins ({workers} hashing threads)")
+    for label, latencies in results.items():
+        print(f"  {label}: {len(latencies):5d} reads   {describe(latencies)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=PASSWORD_HASH_WORKERS)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.workers))
@@ -0,0 +1,88 @@
+"""
+Benchmark: response serialization of a page of posts.
+
+Compares two otherwise identical routes:
+
+* before: returns ``Post`` table models through ``response_model``, so FastAPI
+  dumps each one to a dict, validates it again and re-encodes the result;
+* after: returns the rows in a ``FastJSONResponse``, which pydantic-core
+  encodes straight to bytes (``response_model`` is only used for OpenAPI).
+
+Rows come from an in-memory list so only serialization differs between the
+two. Requests are sent one at a time over an in-process ASGI transport.
+
+Run with:
+    JWT_SECRET=bench python -m benchmarks.bench_serialization [--rows 200] [--requests 2000]
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+from fastapi import FastAPI, Response
+
+from api.models.post import Post
+from api.schemas.pagination import Page
+from api.schemas.post import PostRead
+from api.services.responses import FastJSONResponse
+
+
+def make_posts(count: int) -> list[Post]:
+    return [
+        Post(
+            id=i,
+            title=f"Post number {i}",
+            body="Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 40,
+            excerpt="Lorem ipsum dolor sit amet, consectetur adipiscing elit.",
+            is_published=True,
+            user_id=uuid.uuid4(),
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def make_app(posts: list[Post]) -> FastAPI:
+    bench = FastAPI()
+
+    @bench.get("/before", response_model=Page[Post])
+    async def validated() -> Page[Post]:
+        return Page(items=posts)
+
+    @bench.get("/after", response_model=Page[PostRead])
+    async def fast() -> Response:
+        return FastJSONResponse(Page(items=PostRead.from_posts(posts)))
+
+    return bench
+
+
+async def requests_per_second(client: httpx.AsyncClient, url: str, total: int) -> float:
+    # Warm up route and schema caches
+    for _ in range(20):
+        (await client.get(url)).raise_for_status()
+
+    started = time.perf_counter()
+    for _ in range(total):
+        (await client.get(url)).raise_for_status()
+    return total / (time.perf_counter() - started)
+
+
+async def main(rows: int, total: int) -> None:
+    transport = httpx.ASGITransport(app=make_app(make_posts(rows)))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        assert (await client.get("/before")).json() == (await client.get("/after")).json()
+        before = await requests_per_second(client, "/before", total)
+        after = await requests_per_second(client, "/after", total)
+
+    print(f"{rows} posts per response, {total} requests")
+    print(f"  before (response_model validation): {before:8.1f} req/s")
+    print(f"  after  (FastJSONResponse)         : {after:8.1f} req/s  ({after / before:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.requests))
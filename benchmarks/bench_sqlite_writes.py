@@ -0,0 +1,139 @@
+"""
+Benchmark: SQLite write throughput and read latency under contention.
+
+Starts ``--processes`` writer processes (like uvicorn workers) that each run
+``--writes`` units of work against one database file: count the posts, then
+create one, then commit. A reader process meanwhile counts posts in a loop.
+Each profile gets a fresh database file:
+
+* default: one pool per process, rollback journal, transactions begun
+  lazily by the driver;
+* production: WAL with a read-only reader pool and one ``BEGIN IMMEDIATE``
+  writer per process (``api.setup.sqlite``).
+
+Reports committed and failed ("database is locked") writes, write
+throughput, write lock retries, and the reader's latency percentiles.
+
+Run with:
+    JWT_SECRET=bench python -m benchmarks.bench_sqlite_writes [--processes 4] [--writes 200]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+from sqlmodel import SQLModel, select
+
+from api.models.post import Post
+from api.services.metrics import metrics
+from api.services.repositories.posts_repository import PostsRepository
+from api.setup.database import create_database_engine, create_session_maker
+from api.setup.sqlite import create_sqlite_engines
+
+PROFILES = ("default", "production")
+
+
+def session_maker_for(url: str, profile: str):
+    if profile == "production":
+        return create_session_maker(*create_sqlite_engines(url))
+    return create_session_maker(create_database_engine(url))
+
+
+async def count_posts(session) -> int:
+    return (await session.execute(select(func.count()).select_from(Post))).scalar_one()
+
+
+def write(url: str, profile: str, writes: int, start_at: float) -> tuple[int, int, int]:
+    """Run ``writes`` units of work, returning (committed, failed, retries)"""
+
+    async def run() -> tuple[int, int]:
+        session_maker = session_maker_for(url, profile)
+        committed = failed = 0
+        await asyncio.sleep(max(0.0, start_at - time.time()))
+        for i in range(writes):
+            try:
+                async with session_maker() as session:
+                    await count_posts(session)
+                    repository = PostsRepository(session, autocommit=False)
+                    await repository.create_post(Post(title=f"Post {i}", body="Body", is_published=True))
+                    await repository.commit()
+                committed += 1
+            except OperationalError:
+                failed += 1
+        return committed, failed
+
+    committed, failed = asyncio.run(run())
+    return committed, failed, metrics.get("sqlite.write_retries")
+
+
+def read(url: str, profile: str, start_at: float, duration: float) -> list[float]:
+    """Count posts in a loop for ``duration`` seconds, returning each read's latency in ms"""
+
+    async def run() -> list[float]:
+        session_maker = session_maker_for(url, profile)
+        latencies: list[float] = []
+        await asyncio.sleep(max(0.0, start_at - time.time()))
+        while time.time() < start_at + duration:
+            started = time.perf_counter()
+            try:
+                async with session_maker() as session:
+                    await count_posts(session)
+            except OperationalError:
+                pass
+            latencies.append((time.perf_counter() - started) * 1000)
+        return latencies
+
+    return asyncio.run(run())
+
+
+async def create_tables(url: str) -> None:
+    engine = create_database_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    await engine.dispose()
+
+
+def run_profile(directory: Path, profile: str, processes: int, writes: int, read_seconds: float) -> None:
+    url = f"sqlite+aiosqlite:///{directory / f'{profile}.sqlite'}"
+    asyncio.run(create_tables(url))
+
+    with ProcessPoolExecutor(processes + 1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        # Leave the processes time to start, so they contend from the first write
+        start_at = time.time() + 3
+        reader = pool.submit(read, url, profile, start_at, read_seconds)
+        writers = [pool.submit(write, url, profile, writes, start_at) for _ in range(processes)]
+        results = [writer.result() for writer in writers]
+        elapsed = time.time() - start_at
+        latencies = sorted(reader.result())
+
+    committed = sum(result[0] for result in results)
+    failed = sum(result[1] for result in results)
+    retries = sum(result[2] for result in results)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"  {profile:<10}: {committed:5d} committed  {failed:4d} locked  {committed / elapsed:7.1f} writes/s  "
+        f"{retries:3d} retries  |  reads p50 {statistics.median(latencies):6.2f} ms  p99 {p99:7.2f} ms"
+    )
+
+
+def main(processes: int, writes: int, read_seconds: float) -> None:
+    print(f"{processes} processes x {writes} writes, plus one reader for {read_seconds:.0f}s")
+    with tempfile.TemporaryDirectory() as directory:
+        for profile in PROFILES:
+            run_profile(Path(directory), profile, processes, writes, read_seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--writes", type=int, default=200)
+    parser.add_argument("--read-seconds", type=float, default=5)
+    args = parser.parse_args()
+    main(args.processes, args.writes, args.read_seconds)
@@ -10,6 +10,7 @@ Usage:
     python cli.py serve --prod       # Start production server
     python cli.py version            # Show version information
     python cli.py shell              # Start interactive shell with models/repos loaded
+    python cli.py users import FILE  # Import users from a CSV or NDJSON file
     python cli.py --help             # Show available commands
 """
 
@@ -28,7 +29,7 @@ app = typer.Typer(
 load_dotenv()
 
 # Import commands from the commands package
-from api.commands import check_db, init_db, reset_db, serve, shell, version  # noqa: E402
+from api.commands import check_db, import_users_command, init_db, reset_db, serve, shell, version  # noqa: E402
 
 # Create database command group
 db_app = typer.Typer(help="Database management commands")
@@ -36,11 +37,16 @@ _ = db_app.command("init", help="Initialize database and create tables")(init_db
 _ = db_app.command("check", help="Check database connection and status")(check_db)
 _ = db_app.command("reset", help="Reset database (WARNING: deletes all data)")(reset_db)
 
+# Create users command group
+users_app = typer.Typer(help="User management commands")
+_ = users_app.command("import", help="Import users from a CSV or NDJSON file")(import_users_command)
+
 # Register commands
 _ = app.command("serve")(serve)
 _ = app.command("version")(version)
 _ = app.command("shell", help="Start interactive shell with models and repositories loaded")(shell)
 app.add_typer(db_app, name="db")
+app.add_typer(users_app, name="users")
 
 if __name__ == "__main__":
     app()
@@ -8,6 +8,6 @@ export const load: PageLoad = async ({ fetch, parent }) => {
   const data = await res.json();
 
   return {
-    posts: data,
+    posts: data.items,
   };
 };
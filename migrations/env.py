@@ -3,18 +3,23 @@ import os
 import sys
 from logging.config import fileConfig
 
-from sqlalchemy import pool
+from sqlalchemy import make_url, pool
 from sqlalchemy.engine import Connection
-from sqlalchemy.ext.asyncio import create_async_engine
 
 from alembic import context
+from dotenv import load_dotenv
 
 # Add the parent directory to the path so we can import our modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from api.setup.database import sqlite_url
+# Read the same .env as the CLI, so migrations target the app's database
+load_dotenv()
+
+from api.setup.database import create_database_engine
+from api.setup.env import DATABASE_URL
 from api.models.comment import Comment
 from api.models.post import Post
+from api.models.table_version import TableVersion
 from api.models.user import User
 from sqlmodel import SQLModel
 
@@ -27,8 +32,12 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
-# Set the sqlalchemy.url in the alembic config from our database config
-config.set_main_option("sqlalchemy.url", sqlite_url.replace("+aiosqlite", ""))
+# Set the sqlalchemy.url in the alembic config from our database config (with
+# the dialect's default driver, as offline mode only renders SQL). "%" is
+# alembic's interpolation character, so it is escaped.
+database_url = make_url(DATABASE_URL)
+offline_url = database_url.set(drivername=database_url.get_backend_name())
+config.set_main_option("sqlalchemy.url", offline_url.render_as_string(hide_password=False).replace("%", "%%"))
 
 # Combine metadata from both SQLModel and Base
 target_metadata = [SQLModel.metadata]
@@ -75,10 +84,8 @@ async def run_async_migrations() -> None:
     and associate a connection with the context.
 
     """
-    connectable = create_async_engine(
-        sqlite_url,
-        poolclass=pool.NullPool,
-    )
+    # The application's engine settings (timeouts, statement cache), without a pool
+    connectable = create_database_engine(database_url, poolclass=pool.NullPool)
 
     async with connectable.connect() as connection:
         await connection.run_sync(do_run_migrations)
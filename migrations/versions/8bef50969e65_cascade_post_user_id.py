@@ -0,0 +1,34 @@
+"""Add ON DELETE CASCADE foreign key and index on post.user_id
+
+Revision ID: 8bef50969e65
+Revises: bf9c51832320
+Create Date: 2026-10-17 10:41:05.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8bef50969e65'
+down_revision: Union[str, Sequence[str], None] = 'bf9c51832320'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # SQLite cannot add constraints in place, so batch mode rebuilds the table.
+    # Posts whose author no longer exists would violate the new constraint.
+    op.execute('UPDATE post SET user_id = NULL WHERE user_id NOT IN (SELECT id FROM "user")')
+    with op.batch_alter_table('post') as batch_op:
+        batch_op.create_foreign_key('fk_post_user_id_user', 'user', ['user_id'], ['id'], ondelete='CASCADE')
+        batch_op.create_index(batch_op.f('ix_post_user_id'), ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('post') as batch_op:
+        batch_op.drop_index(batch_op.f('ix_post_user_id'))
+        batch_op.drop_constraint('fk_post_user_id_user', type_='foreignkey')
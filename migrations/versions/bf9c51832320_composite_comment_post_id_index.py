@@ -0,0 +1,31 @@
+"""Replace comment post_id index with composite (post_id, id) index
+
+Revision ID: bf9c51832320
+Revises: 9c6eb32d6cc2
+Create Date: 2026-10-17 09:12:41.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bf9c51832320'
+down_revision: Union[str, Sequence[str], None] = '9c6eb32d6cc2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The composite index still serves plain post_id lookups (and the cascade
+    # from post), and also keyset pages ordered by id within a post.
+    op.create_index('ix_comment_post_id_id', 'comment', ['post_id', 'id'], unique=False)
+    op.drop_index(op.f('ix_comment_post_id'), table_name='comment')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_comment_post_id'), 'comment', ['post_id'], unique=False)
+    op.drop_index('ix_comment_post_id_id', table_name='comment')
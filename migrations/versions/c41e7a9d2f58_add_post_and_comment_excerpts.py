@@ -0,0 +1,61 @@
+"""Add excerpt columns to post and comment and backfill them
+
+Revision ID: c41e7a9d2f58
+Revises: 8bef50969e65
+Create Date: 2026-10-17 12:02:44.610397
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+from api.services.excerpts import EXCERPT_LENGTH, make_excerpt
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41e7a9d2f58'
+down_revision: Union[str, Sequence[str], None] = '8bef50969e65'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def _backfill_excerpts(table_name: str) -> None:
+    """Compute the excerpt of every existing row, one keyset batch at a time."""
+    table = sa.table(table_name, sa.column('id', sa.Integer), sa.column('body', sa.String), sa.column('excerpt', sa.String))
+    if context.is_offline_mode():
+        # A generated SQL script cannot read rows; a plain prefix is the closest SQL equivalent
+        op.execute(table.update().values(excerpt=sa.func.substr(table.c.body, 1, EXCERPT_LENGTH)))
+        return
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(table.c.id, table.c.body).where(table.c.id > last_id).order_by(table.c.id).limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        connection.execute(
+            table.update().where(table.c.id == sa.bindparam('row_id')).values(excerpt=sa.bindparam('new_excerpt')),
+            [{'row_id': row.id, 'new_excerpt': make_excerpt(row.body)} for row in rows],
+        )
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table_name in ('post', 'comment'):
+        op.add_column(
+            table_name,
+            sa.Column('excerpt', sa.String(length=EXCERPT_LENGTH), server_default='', nullable=False),
+        )
+        _backfill_excerpts(table_name)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table_name in ('comment', 'post'):
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.drop_column('excerpt')
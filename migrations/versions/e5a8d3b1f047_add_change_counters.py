@@ -0,0 +1,41 @@
+"""Add table change counters and post/comment row versions
+
+Revision ID: e5a8d3b1f047
+Revises: c41e7a9d2f58
+Create Date: 2026-10-17 14:21:09.348112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a8d3b1f047'
+down_revision: Union[str, Sequence[str], None] = 'c41e7a9d2f58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    table_version = op.create_table('table_version',
+        sa.Column('table_name', sa.String(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('table_name')
+    )
+    op.bulk_insert(table_version, [{'table_name': name, 'version': 0} for name in ('comment', 'post', 'user')])
+
+    # Existing rows start at version 0; every write from now on stamps them
+    # with their table's counter, which is at least 1 after the first write
+    for table_name in ('post', 'comment'):
+        op.add_column(table_name, sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table_name in ('comment', 'post'):
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.drop_column('version')
+    op.drop_table('table_version')
@@ -101,6 +101,15 @@ class TestCLICommandStructure:
             assert len(result.stdout) > 50, f"Command {command} should have substantial help text"
 
 
+def test_users_import_help():
+    """Test that the users import command is registered with its options."""
+    result = runner.invoke(app, ["users", "import", "--help"])
+    assert result.exit_code == 0
+    assert "Import users from a CSV or NDJSON file" in result.stdout
+    assert "--batch-size" in result.stdout
+    assert "--workers" in result.stdout
+
+
 @pytest.mark.parametrize("command", ["version"])
 def test_info_commands(command):
     """Parametrized test for info commands that should run quickly."""
@@ -0,0 +1,11 @@
+import pytest
+
+from api.services.metrics import metrics
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    """Start and leave every test with zeroed performance counters"""
+    metrics.reset()
+    yield
+    metrics.reset()
@@ -0,0 +1,189 @@
+# pyright: reportUnknownVariableType=false
+# pyright: reportMissingParameterType=false
+# pyright: reportUnknownParameterType=false
+# pyright: reportUnknownArgumentType=false
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+
+import gzip
+import json
+import zlib
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+
+from api.middleware.compression import CompressionMiddleware, GzipCodec, PrecompressedCache, negotiate
+from api.services.metrics import metrics
+
+LARGE = [{"id": i, "title": f"Post {i}"} for i in range(100)]
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, codecs=[GzipCodec()])
+
+    @app.get("/large")
+    async def large():
+        return LARGE
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/binary")
+    async def binary():
+        return Response(b"\0" * 2000, media_type="application/octet-stream")
+
+    @app.get("/text")
+    async def text():
+        return PlainTextResponse("hello " * 200)
+
+    @app.get("/tagged")
+    async def tagged():
+        return Response(json.dumps(LARGE), media_type="application/json", headers={"etag": '"v1"'})
+
+    @app.get("/public")
+    async def public():
+        return Response(json.dumps(LARGE), media_type="application/json", headers={"cache-control": "public"})
+
+    @app.get("/not-modified")
+    async def not_modified():
+        return Response(status_code=304, headers={"etag": '"v1"'})
+
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            for item in LARGE:
+                yield json.dumps(item) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    transport = httpx.ASGITransport(app=app)
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_large_json_is_gzipped(client):
+    """Test that JSON bodies above the threshold are gzipped and vary on Accept-Encoding"""
+    async with client:
+        response = await client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(json.dumps(LARGE))
+    assert response.json() == LARGE
+
+
+@pytest.mark.asyncio
+async def test_uncompressed_when_not_accepted_or_small(client):
+    """Test that small bodies and clients without a shared encoding get the plain body"""
+    async with client:
+        small = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+        identity = await client.get("/large", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in small.headers
+    assert small.json() == {"ok": True}
+    assert "content-encoding" not in identity.headers
+    assert identity.headers["vary"] == "Accept-Encoding"
+    assert identity.json() == LARGE
+
+
+@pytest.mark.asyncio
+async def test_only_allowed_types_are_compressed(client):
+    """Test that types off the allowlist pass through and text/* is matched as a family"""
+    async with client:
+        binary = await client.get("/binary", headers={"Accept-Encoding": "gzip"})
+        text = await client.get("/text", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in binary.headers
+    assert "vary" not in binary.headers
+    assert len(binary.content) == 2000
+    assert text.headers["content-encoding"] == "gzip"
+
+
+@pytest.mark.asyncio
+async def test_streamed_ndjson_is_compressed_per_chunk(client):
+    """Test that streaming responses are compressed without a content-length and decode line by line"""
+    async with client:
+        async with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    lines = gzip.decompress(raw).decode().splitlines()
+    assert [json.loads(line) for line in lines] == LARGE
+
+    # Each flushed chunk can be decoded on arrival
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    first_line = json.dumps(LARGE[0]) + "\n"
+    assert decoder.decompress(GzipCodec().stream().compress(first_line.encode())) == first_line.encode()
+
+
+@pytest.mark.asyncio
+async def test_strong_etags_are_weakened_when_encodings_are_negotiated(client):
+    """Test that compressible responses and 304s carry a weak ETag once a codec applies"""
+    async with client:
+        compressed = await client.get("/tagged", headers={"Accept-Encoding": "gzip"})
+        not_modified = await client.get("/not-modified", headers={"Accept-Encoding": "gzip"})
+        identity = await client.get("/tagged", headers={"Accept-Encoding": "identity"})
+
+    assert compressed.headers["etag"] == 'W/"v1"'
+    assert not_modified.headers["etag"] == 'W/"v1"'
+    assert identity.headers["etag"] == '"v1"'
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", ["/tagged", "/public"])
+async def test_repeated_body_is_compressed_once(client, path):
+    """Test that an unchanged body of a response with a validator or public caching is served from the cache"""
+    async with client:
+        first = await client.get(path, headers={"Accept-Encoding": "gzip"})
+        second = await client.get(path, headers={"Accept-Encoding": "gzip"})
+
+    assert first.content == second.content
+    assert metrics.get("compression.cache_misses") == 1
+    assert metrics.get("compression.cache_hits") == 1
+
+
+@pytest.mark.asyncio
+async def test_one_off_bodies_bypass_the_cache(client):
+    """Test that responses without a validator or public caching are compressed without being cached"""
+    async with client:
+        first = await client.get("/large", headers={"Accept-Encoding": "gzip"})
+        second = await client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert first.headers["content-encoding"] == second.headers["content-encoding"] == "gzip"
+    assert first.content == second.content
+    assert metrics.get("compression.cache_misses") == 0
+    assert metrics.get("compression.cache_hits") == 0
+
+
+def test_negotiate_honours_quality_values():
+    """Test that the highest q-value wins, ties go to server preference and q=0 refuses"""
+    gzip_codec = GzipCodec()
+    other = GzipCodec()
+    other.name = "br"
+
+    assert negotiate("gzip, br", [other, gzip_codec]) is other
+    assert negotiate("gzip;q=1.0, br;q=0.5", [other, gzip_codec]) is gzip_codec
+    assert negotiate("gzip;q=0", [gzip_codec]) is None
+    assert negotiate("*", [gzip_codec]) is gzip_codec
+    assert negotiate("", [gzip_codec]) is None
+
+
+def test_precompressed_cache_evicts_least_recently_used():
+    """Test that the cache stays within its byte budget by dropping the oldest entry"""
+    cache = PrecompressedCache(max_bytes=10)
+    first, second, third = (cache.key("gzip", body) for body in (b"a", b"b", b"c"))
+
+    cache.put(first, b"x" * 4)
+    cache.put(second, b"y" * 4)
+    assert cache.get(first) == b"x" * 4
+    cache.put(third, b"z" * 4)
+
+    assert cache.get(second) is None
+    assert cache.get(first) == b"x" * 4
+    assert cache.size == 8
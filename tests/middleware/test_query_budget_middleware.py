@@ -0,0 +1,180 @@
+# pyright: reportUnknownVariableType=false
+# pyright: reportMissingParameterType=false
+# pyright: reportUnknownParameterType=false
+# pyright: reportUnknownArgumentType=false
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+
+import asyncio
+import time
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import BackgroundTasks, FastAPI
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from api.middleware.query_budget import (
+    QueryBudgetMiddleware,
+    pool_timeout_handler,
+    statement_cancelled_handler,
+    statement_timeout_handler,
+)
+from api.services.metrics import metrics
+from api.services.query_budget import StatementCancelledError, StatementTimeoutError
+from api.setup.database import create_database_engine
+
+# Counts to ten million, seconds of virtual machine steps: long enough to be
+# interrupted, yet finishing (and failing the test) should nothing interrupt it
+LONG = text("WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n LIMIT 10000000) SELECT count(*) FROM n")
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_database_engine(f"sqlite+aiosqlite:///{tmp_path / 'app.sqlite'}")
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def app(engine):
+    app = FastAPI()
+    app.add_middleware(QueryBudgetMiddleware, statement_timeout_ms=0, route_timeouts_ms={"GET /limited/{name}": 50})
+    app.add_exception_handler(StatementTimeoutError, statement_timeout_handler)
+    app.add_exception_handler(StatementCancelledError, statement_cancelled_handler)
+    app.add_exception_handler(PoolTimeoutError, pool_timeout_handler)
+
+    @app.get("/limited/{name}")
+    async def limited(name: str):
+        async with engine.connect() as connection:
+            await connection.execute(LONG)
+
+    @app.get("/unlimited")
+    async def unlimited():
+        async with engine.connect() as connection:
+            await connection.execute(LONG)
+
+    @app.get("/busy")
+    async def busy():
+        raise PoolTimeoutError("QueuePool limit reached")
+
+    @app.get("/background")
+    async def background(background_tasks: BackgroundTasks):
+        async def after_response():
+            await asyncio.sleep(0.02)
+            app.state.background_ran = True
+
+        background_tasks.add_task(after_response)
+        return {"ok": True}
+
+    return app
+
+
+@pytest_asyncio.fixture
+async def client(app):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+def http_scope(path: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [],
+        "client": ("127.0.0.1", 1234),
+        "server": ("test", 80),
+    }
+
+
+@pytest.mark.asyncio
+async def test_statement_past_its_routes_budget_answers_504(client):
+    """Test that the route's override applies, and the request fails fast instead of running on"""
+    started = time.perf_counter()
+    response = await client.get("/limited/long")
+
+    assert time.perf_counter() - started < 1
+    assert response.status_code == 504
+    assert response.json() == {"detail": "Statement ran past its 0.05s budget"}
+    assert metrics.get("db.statement_timeouts") == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_exhaustion_answers_503_with_retry_after(client):
+    """Test that a request that found no free connection is told to retry"""
+    response = await client.get("/busy")
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert metrics.get("db.pool_timeouts") == 1
+
+
+@pytest.mark.asyncio
+async def test_client_disconnect_cancels_the_running_statement(app, engine):
+    """Test that a query with no time limit stops once the client goes away, freeing its connection"""
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.sleep(0.05)
+        return {"type": "http.disconnect"}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    started = time.perf_counter()
+    await app(http_scope("/unlimited"), receive, send)
+
+    assert time.perf_counter() - started < 1
+    assert sent == []
+    assert metrics.get("requests.disconnected") == 1
+    assert engine.sync_engine.pool.checkedout() == 0
+
+
+@pytest.mark.asyncio
+async def test_disconnect_after_the_response_leaves_background_tasks_running(app):
+    """Test that the disconnect servers report once a response is complete is not taken for an abort"""
+    app.state.background_ran = False
+    requested = False
+    responded = asyncio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # As uvicorn does: the disconnect only arrives after the response
+        await responded.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and not message.get("more_body", False):
+            responded.set()
+
+    await app(http_scope("/background"), receive, send)
+
+    assert app.state.background_ran is True
+    assert metrics.get("requests.disconnected") == 0
+
+
+def test_timeout_falls_back_to_the_default_for_other_routes():
+    """Test route matching by method and declared path"""
+    middleware = QueryBudgetMiddleware(FastAPI(), statement_timeout_ms=5000, route_timeouts_ms={"GET /posts": 200})
+    posts = type("Route", (), {"path_format": "/posts"})()
+
+    assert middleware.timeout({"method": "GET", "route": posts}) == 0.2
+    assert middleware.timeout({"method": "POST", "route": posts}) == 5
+    assert middleware.timeout({"method": "GET"}) == 5
+    assert QueryBudgetMiddleware(FastAPI()).timeout({"method": "GET", "route": posts}) is None
@@ -9,10 +9,12 @@ import uuid
 
 import pytest
 import pytest_asyncio
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlmodel import select
 
 from api.models.comment import Comment
+from api.setup.database import enable_sqlite_foreign_keys
 
 
 @pytest_asyncio.fixture
@@ -36,6 +38,39 @@ async def test_session():
         yield session
 
 
+@pytest_asyncio.fixture
+async def cascade_session():
+    """Create a test database session that enforces foreign keys like the app engine"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    enable_sqlite_foreign_keys(engine)
+    async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with engine.begin() as conn:
+        from sqlmodel import SQLModel
+
+        from api.models.post import Post  # noqa: F401
+        from api.models.user import User  # noqa: F401
+
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    async with async_session_maker() as session:
+        yield session
+
+
+@pytest.fixture
+def statements(cascade_session):
+    """Record every SQL statement executed through the cascade session"""
+    executed: list[str] = []
+
+    def record(_conn, _cursor, statement, _parameters, _context, _executemany):
+        executed.append(statement)
+
+    sync_engine = cascade_session.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(sync_engine, "before_cursor_execute", record)
+
+
 @pytest.mark.asyncio
 async def test_create_comment_with_user_and_post(test_session):
     """Test creating a comment with both user_id and post_id"""
@@ -159,10 +194,10 @@ async def test_comment_indexes(test_session):
     connection = await test_session.connection()
     indexes = await connection.run_sync(get_indexes)
 
-    # Check that indexes exist on user_id and post_id
+    # Check that indexes exist on user_id and (post_id, id)
     index_columns = [idx["column_names"] for idx in indexes]
     assert ["user_id"] in index_columns
-    assert ["post_id"] in index_columns
+    assert ["post_id", "id"] in index_columns
 
 
 @pytest.mark.asyncio
@@ -192,59 +227,59 @@ async def test_comment_author_relationship(test_session):
 
 
 @pytest.mark.asyncio
-async def test_comment_cascade_delete_from_user(test_session):
+async def test_comment_cascade_delete_from_user(cascade_session):
     """Test that deleting a user cascades to delete their comments"""
     from api.models.user import User
 
     # Create user and comment
     user = User(email="test@example.com", hashed_password="hashed")
-    test_session.add(user)
-    await test_session.commit()
+    cascade_session.add(user)
+    await cascade_session.commit()
 
     comment = Comment(body="Test comment", user_id=user.id)
-    test_session.add(comment)
-    await test_session.commit()
+    cascade_session.add(comment)
+    await cascade_session.commit()
 
     comment_id = comment.id
 
     # Delete the user
-    await test_session.delete(user)
-    await test_session.commit()
+    await cascade_session.delete(user)
+    await cascade_session.commit()
 
     # Verify comment was deleted
-    result = await test_session.execute(select(Comment).where(Comment.id == comment_id))
+    result = await cascade_session.execute(select(Comment).where(Comment.id == comment_id))
     deleted_comment = result.scalar_one_or_none()
     assert deleted_comment is None
 
 
 @pytest.mark.asyncio
-async def test_comment_cascade_delete_from_post(test_session):
+async def test_comment_cascade_delete_from_post(cascade_session):
     """Test that deleting a post cascades to delete its comments"""
     from api.models.post import Post
     from api.models.user import User
 
     # Create user and post
     user = User(email="test@example.com", hashed_password="hashed")
-    test_session.add(user)
-    await test_session.commit()
+    cascade_session.add(user)
+    await cascade_session.commit()
 
     post = Post(title="Test Post", body="Post Body", is_published=True, user_id=user.id)
-    test_session.add(post)
-    await test_session.commit()
+    cascade_session.add(post)
+    await cascade_session.commit()
 
     # Create comment on the post
     comment = Comment(body="Test comment", post_id=post.id)
-    test_session.add(comment)
-    await test_session.commit()
+    cascade_session.add(comment)
+    await cascade_session.commit()
 
     comment_id = comment.id
 
     # Delete the post
-    await test_session.delete(post)
-    await test_session.commit()
+    await cascade_session.delete(post)
+    await cascade_session.commit()
 
     # Verify comment was deleted
-    result = await test_session.execute(select(Comment).where(Comment.id == comment_id))
+    result = await cascade_session.execute(select(Comment).where(Comment.id == comment_id))
     deleted_comment = result.scalar_one_or_none()
     assert deleted_comment is None
 
@@ -298,3 +333,54 @@ async def test_post_comments_relationship(test_session):
     await test_session.refresh(post, ["comments"])
     assert len(post.comments) == 2
     assert {c.body for c in post.comments} == {"Comment 1", "Comment 2"}
+
+
+@pytest.mark.asyncio
+async def test_delete_heavily_commented_post_is_one_statement(cascade_session, statements):
+    """Test that deleting a post leaves its comments to the database cascade"""
+    from api.models.post import Post
+
+    post = Post(title="Popular Post", body="Post Body", is_published=True)
+    cascade_session.add(post)
+    await cascade_session.commit()
+    cascade_session.add_all([Comment(body=f"Comment {i}", post_id=post.id) for i in range(50)])
+    await cascade_session.commit()
+    cascade_session.expunge_all()
+
+    post = await cascade_session.get(Post, post.id)
+    statements.clear()
+    await cascade_session.delete(post)
+    await cascade_session.commit()
+
+    # No SELECT of the comments and no per-comment DELETE
+    assert len(statements) == 1
+    assert statements[0].startswith("DELETE FROM post")
+    result = await cascade_session.execute(select(Comment))
+    assert result.scalars().all() == []
+
+
+@pytest.mark.asyncio
+async def test_delete_user_cascades_in_one_statement(cascade_session, statements):
+    """Test that deleting a user removes their posts and comments through the database cascade"""
+    from api.models.post import Post
+    from api.models.user import User
+
+    user = User(email="test@example.com", hashed_password="hashed")
+    cascade_session.add(user)
+    await cascade_session.commit()
+    post = Post(title="Test Post", body="Post Body", is_published=True, user_id=user.id)
+    cascade_session.add(post)
+    await cascade_session.commit()
+    cascade_session.add_all([Comment(body=f"Comment {i}", post_id=post.id, user_id=user.id) for i in range(20)])
+    await cascade_session.commit()
+    cascade_session.expunge_all()
+
+    user = await cascade_session.get(User, user.id)
+    statements.clear()
+    await cascade_session.delete(user)
+    await cascade_session.commit()
+
+    assert len(statements) == 1
+    assert statements[0].startswith("DELETE FROM user")
+    assert (await cascade_session.execute(select(Post))).scalars().all() == []
+    assert (await cascade_session.execute(select(Comment))).scalars().all() == []
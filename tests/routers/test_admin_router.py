@@ -0,0 +1,72 @@
+# pyright: reportUnknownVariableType=false
+# pyright: reportMissingParameterType=false
+# pyright: reportUnknownParameterType=false
+# pyright: reportUnknownArgumentType=false
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.models.user import User
+from api.services.metrics import metrics
+from api.services.response_cache import MemoryResponseStore, ResponseCache
+from api.setup.app import app
+from api.setup.auth import current_superuser
+from api.setup.dependencies import get_response_cache
+
+
+@pytest.fixture
+def client_as_superuser():
+    """Create a test client authenticated as a superuser"""
+    superuser = User(id=uuid.uuid4(), email="admin@example.com", is_active=True, is_superuser=True)
+    app.dependency_overrides[current_superuser] = lambda: superuser
+    metrics.reset()
+    yield TestClient(app)
+    metrics.reset()
+    app.dependency_overrides.clear()
+
+
+def test_read_metrics(client_as_superuser):
+    """Test that the metrics endpoint returns the current counters"""
+    metrics.incr("singleflight.coalesced", 3)
+    metrics.incr("singleflight.leaders")
+
+    response = client_as_superuser.get("/api/v1/admin/metrics")
+
+    assert response.status_code == 200
+    assert response.json() == {"singleflight.coalesced": 3, "singleflight.leaders": 1}
+
+
+def test_read_metrics_requires_authentication():
+    """Test that anonymous clients cannot read metrics"""
+    response = TestClient(app).get("/api/v1/admin/metrics")
+
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_read_and_clear_response_cache(client_as_superuser):
+    """Test that superusers can see the list cache's hit ratio and memory use, and empty it"""
+    response_cache = ResponseCache(MemoryResponseStore(max_bytes=1000))
+    await response_cache.store.set('"v1"', b"0123456789")
+    metrics.incr("response_cache.hits", 3)
+    metrics.incr("response_cache.misses")
+    app.dependency_overrides[get_response_cache] = lambda: response_cache
+
+    stats = client_as_superuser.get("/api/v1/admin/response-cache")
+    cleared = client_as_superuser.delete("/api/v1/admin/response-cache")
+
+    assert stats.json() == {
+        "backend": "memory",
+        "entries": 1,
+        "bytes": 10,
+        "max_bytes": 1000,
+        "hits": 3,
+        "misses": 1,
+        "hit_ratio": 0.75,
+    }
+    assert cleared.status_code == 204
+    assert await response_cache.store.usage() == (0, 0)
@@ -5,19 +5,31 @@
 # pyright: reportAny=false
 # pyright: reportUnknownMemberType=false
 
+import json
 import uuid
 from unittest.mock import create_autospec
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, SQLModel, create_engine
 
 from api.models.comment import Comment
 from api.models.user import User
+from api.services.group_commit import GroupCommitter
+from api.services.pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor
+from api.services.repositories.base_repository import NotOwnerError, RecordNotFoundError
 from api.services.repositories.comments_repository import CommentsRepository
+from api.services.response_cache import MemoryResponseStore, ResponseCache
+from api.services.streaming import NDJSON_MEDIA_TYPE
 from api.setup.app import app
 from api.setup.auth import current_user
-from api.setup.dependencies import get_comments_repository
+from api.setup.dependencies import (
+    get_comment_writer,
+    get_comments_reader,
+    get_comments_repository,
+    get_response_cache,
+)
 
 
 @pytest.fixture
@@ -63,7 +75,11 @@ def client_with_mocks(mock_comments_repository, mock_current_user):
         return mock_current_user
 
     app.dependency_overrides[get_comments_repository] = override_get_comments_repository
+    app.dependency_overrides[get_comments_reader] = override_get_comments_repository
     app.dependency_overrides[current_user] = override_current_user
+    # A fresh cache per test, as the mocked table versions do not change between tests
+    response_cache = ResponseCache(MemoryResponseStore())
+    app.dependency_overrides[get_response_cache] = lambda: response_cache
 
     with TestClient(app) as client:
         yield client, mock_comments_repository, mock_current_user
@@ -94,30 +110,102 @@ class TestListComments:
     async def test_list_comments_success(self, client_with_mocks, sample_comments):
         """Test successful retrieval of all comments"""
         client, mock_repo, _ = client_with_mocks
-        mock_repo.all_comments.return_value = sample_comments
+        mock_repo.page_comments.return_value = sample_comments
 
         response = client.get("/api/v1/comments")
 
         assert response.status_code == 200
         data = response.json()
-        assert len(data) == 3
-        assert data[0]["body"] == "First comment"
-        assert data[1]["body"] == "Second comment"
-        assert data[2]["body"] == "Third comment"
-        mock_repo.all_comments.assert_called_once()
+        assert len(data["items"]) == 3
+        assert data["items"][0]["body"] == "First comment"
+        assert data["items"][1]["body"] == "Second comment"
+        assert data["items"][2]["body"] == "Third comment"
+        assert data["next_cursor"] is None
+        mock_repo.page_comments.assert_called_once_with(
+            DEFAULT_PAGE_SIZE, None, post_id=None, user_id=None, fields=None
+        )
 
     @pytest.mark.asyncio
     async def test_list_comments_empty(self, client_with_mocks):
         """Test retrieval when no comments exist"""
         client, mock_repo, _ = client_with_mocks
-        mock_repo.all_comments.return_value = []
+        mock_repo.page_comments.return_value = []
 
         response = client.get("/api/v1/comments")
 
         assert response.status_code == 200
         data = response.json()
-        assert len(data) == 0
-        mock_repo.all_comments.assert_called_once()
+        assert len(data["items"]) == 0
+        mock_repo.page_comments.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_list_comments_with_filters(self, client_with_mocks, sample_comments, mock_current_user):
+        """Test that post_id and user_id filters are passed to the repository"""
+        client, mock_repo, _ = client_with_mocks
+        mock_repo.page_comments.return_value = sample_comments[:2]
+
+        response = client.get(
+            "/api/v1/comments",
+            params={"post_id": 1, "user_id": str(mock_current_user.id), "limit": 1},
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [comment["id"] for comment in data["items"]] == [1]
+        assert decode_cursor(data["next_cursor"]) == 1
+        mock_repo.page_comments.assert_called_once_with(1, None, post_id=1, user_id=mock_current_user.id, fields=None)
+
+    @pytest.mark.asyncio
+    async def test_list_post_comments(self, client_with_mocks, sample_comments):
+        """Test listing the comments of a single post"""
+        client, mock_repo, _ = client_with_mocks
+        mock_repo.page_comments.return_value = sample_comments[2:]
+
+        response = client.get("/api/v1/posts/2/comments", params={"cursor": encode_cursor(2)})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [comment["id"] for comment in data["items"]] == [3]
+        assert data["next_cursor"] is None
+        mock_repo.page_comments.assert_called_once_with(DEFAULT_PAGE_SIZE, 2, post_id=2, fields=None)
+
+    @pytest.mark.asyncio
+    async def test_list_comments_fields(self, client_with_mocks):
+        """Test that only the requested fields (plus id) are returned"""
+        client, mock_repo, _ = client_with_mocks
+        mock_repo.page_comments.return_value = [Comment(id=1, excerpt="Short")]
+
+        response = client.get("/api/v1/comments?fields=excerpt")
+
+        assert response.status_code == 200
+        assert response.json()["items"] == [{"id": 1, "excerpt": "Short"}]
+        mock_repo.page_comments.assert_called_once_with(
+            DEFAULT_PAGE_SIZE, None, post_id=None, user_id=None, fields=frozenset({"id", "excerpt"})
+        )
+
+
+class TestStreamComments:
+    """Test cases for streaming GET /api/v1/comments as NDJSON"""
+
+    @staticmethod
+    async def _iterate(items):
+        for item in items:
+            yield item
+
+    @pytest.mark.asyncio
+    async def test_stream_comments_with_filter(self, client_with_mocks, sample_comments):
+        """Test streaming the comments of one post"""
+        client, mock_repo, _ = client_with_mocks
+        mock_repo.stream_comments.return_value = self._iterate(sample_comments[:2])
+
+        response = client.get("/api/v1/comments", params={"post_id": 1}, headers={"Accept": NDJSON_MEDIA_TYPE})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == NDJSON_MEDIA_TYPE
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["id"] for line in lines] == [1, 2]
+        mock_repo.stream_comments.assert_called_once_with(post_id=1, user_id=None, fields=None)
+        mock_repo.page_comments.assert_not_called()
 
 
 class TestFindComment:
@@ -160,6 +248,39 @@ class TestFindComment:
         assert response.status_code == 422  # Validation error
 
 
+class TestConditionalComments:
+    """Test cases for ETags and If-None-Match on comment reads"""
+
+    @pytest.mark.asyncio
+    async def test_find_comment_revalidation_skips_loading(self, client_with_mocks, sample_comment):
+        """Test that a matching If-None-Match is answered from the version alone"""
+        client, mock_repo, _ = client_with_mocks
+        sample_comment.version = 4
+        mock_repo.find_comment.return_value = sample_comment
+        mock_repo.comment_version.return_value = 4
+
+        etag = client.get("/api/v1/comments/1").headers["etag"]
+        mock_repo.find_comment.reset_mock()
+        response = client.get("/api/v1/comments/1", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        mock_repo.find_comment.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_list_comments_changes_tag_with_table_version(self, client_with_mocks, sample_comments):
+        """Test that a write to the comment table invalidates list ETags"""
+        client, mock_repo, _ = client_with_mocks
+        mock_repo.page_comments.return_value = sample_comments
+        mock_repo.table_versions.return_value = (1,)
+        etag = client.get("/api/v1/comments").headers["etag"]
+        mock_repo.table_versions.return_value = (2,)
+
+        response = client.get("/api/v1/comments", headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+
+
 class TestCreateComment:
     """Test cases for POST /api/v1/comments endpoint"""
 
@@ -229,6 +350,63 @@ class TestCreateComment:
         call_args = mock_repo.create_comment.call_args[0][0]
         assert call_args.user_id == mock_current_user.id
 
+    @pytest.mark.asyncio
+    async def test_create_comment_with_group_commit(self, client_with_mocks, mock_current_user):
+        """Test that comments go through the group committer when one is configured"""
+        client, mock_repo, _ = client_with_mocks
+        committed: list[list[Comment]] = []
+
+        async def commit_comments(comments):
+            committed.append(list(comments))
+            for comment_id, comment in enumerate(comments, start=1):
+                comment.id = comment_id
+            return comments
+
+        comment_writer = GroupCommitter(commit_comments, window=0.001, max_items=100)
+        app.dependency_overrides[get_comment_writer] = lambda: comment_writer
+
+        response = client.post("/api/v1/comments", json={"body": "Grouped", "post_id": 1})
+
+        assert response.status_code == 201
+        assert response.json()["id"] == 1
+        assert committed[0][0].user_id == mock_current_user.id
+        mock_repo.create_comment.assert_not_called()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("grouped", [False, True])
+    async def test_create_comment_on_missing_post(self, client_with_mocks, grouped):
+        """Test that a comment on a missing post answers 404, without being written or joining a group"""
+        client, mock_repo, _ = client_with_mocks
+        mock_repo.post_exists.return_value = False
+        comment_writer = create_autospec(GroupCommitter, instance=True)
+        app.dependency_overrides[get_comment_writer] = lambda: comment_writer if grouped else None
+
+        response = client.post("/api/v1/comments", json={"body": "Orphan", "post_id": 999})
+
+        assert response.status_code == 404
+        mock_repo.post_exists.assert_called_once_with(999)
+        mock_repo.create_comment.assert_not_called()
+        comment_writer.submit.assert_not_called()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("grouped", [False, True])
+    async def test_create_comment_on_post_deleted_meanwhile(self, client_with_mocks, grouped):
+        """Test that a foreign key failure after the check answers 409 rather than 500"""
+        client, mock_repo, _ = client_with_mocks
+        error = IntegrityError("INSERT", {}, Exception("FOREIGN KEY constraint failed"))
+        mock_repo.create_comment.side_effect = error
+
+        async def commit_comments(comments):
+            raise error
+
+        comment_writer = GroupCommitter(commit_comments, window=0.001, max_items=100)
+        app.dependency_overrides[get_comment_writer] = lambda: comment_writer if grouped else None
+
+        response = client.post("/api/v1/comments", json={"body": "Late", "post_id": 1})
+
+        assert response.status_code == 409
+        assert response.json() == {"detail": "Comment references a post that does not exist"}
+
     @pytest.mark.asyncio
     async def test_create_comment_without_auth(self):
         """Test comment creation without authentication"""
@@ -239,6 +417,37 @@ class TestCreateComment:
             assert response.status_code == 401
 
 
+class TestBulkCreateComments:
+    """Test cases for POST /api/v1/comments/bulk endpoint"""
+
+    @pytest.mark.asyncio
+    async def test_bulk_create_comments(self, client_with_mocks):
+        """Test bulk creation of comments from a JSON array"""
+        client, mock_repo, mock_current_user = client_with_mocks
+        mock_repo.bulk_create_comments.return_value = [7, 8]
+
+        comments = [{"body": "First", "post_id": 1}, {"body": "Second", "post_id": 2, "is_published": True}]
+        response = client.post("/api/v1/comments/bulk", json=comments)
+
+        assert response.status_code == 201
+        assert response.json() == {"ids": [7, 8]}
+        batch, user_id = mock_repo.bulk_create_comments.call_args[0]
+        assert [comment.post_id for comment in batch] == [1, 2]
+        assert user_id == mock_current_user.id
+        mock_repo.commit.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_bulk_create_comments_unknown_post(self, client_with_mocks):
+        """Test that a foreign key violation is reported as a conflict"""
+        client, mock_repo, _ = client_with_mocks
+        mock_repo.bulk_create_comments.side_effect = IntegrityError("INSERT", {}, Exception("FOREIGN KEY"))
+
+        response = client.post("/api/v1/comments/bulk", json=[{"body": "Orphan", "post_id": 999}])
+
+        assert response.status_code == 409
+        mock_repo.commit.assert_not_called()
+
+
 class TestUpdateComment:
     """Test cases for PUT /api/v1/comments/{comment_id} endpoint"""
 
@@ -246,12 +455,10 @@ class TestUpdateComment:
     async def test_update_comment_success(self, client_with_mocks):
         """Test successful comment update"""
         client, mock_repo, mock_current_user = client_with_mocks
-        existing_comment = Comment(
-            id=1, body="Old comment", is_published=True, post_id=1, user_id=mock_current_user.id
+        updated_comment = Comment(
+            id=1, body="Updated comment", is_published=True, post_id=1, user_id=mock_current_user.id
         )
-        updated_comment = Comment(id=1, body="Updated comment", is_published=True, post_id=1)
-        mock_repo.find_comment.return_value = existing_comment
-        mock_repo.update_comment.return_value = updated_comment
+        mock_repo.update_owned_comment.return_value = updated_comment
 
         comment_data = {"body": "Updated comment", "is_published": True, "post_id": 1}
         response = client.put("/api/v1/comments/1", json=comment_data)
@@ -260,17 +467,20 @@ class TestUpdateComment:
         data = response.json()
         assert data["id"] == 1
         assert data["body"] == "Updated comment"
-        # Verify the call was made correctly
-        mock_repo.update_comment.assert_called_once()
-        call_args = mock_repo.update_comment.call_args
+        # Verify the ownership check and the write were a single call
+        mock_repo.update_owned_comment.assert_called_once()
+        call_args = mock_repo.update_owned_comment.call_args
         assert call_args[0][0] == 1  # comment_id
-        assert call_args[0][1].body == "Updated comment"  # updated comment data
+        assert call_args[0][1] == mock_current_user.id  # owner
+        assert call_args[0][2].body == "Updated comment"  # updated comment data
+        mock_repo.find_comment.assert_not_called()
+        mock_repo.commit.assert_awaited_once()
 
     @pytest.mark.asyncio
     async def test_update_comment_not_found(self, client_with_mocks):
         """Test update of non-existent comment"""
-        client, mock_repo, _ = client_with_mocks
-        mock_repo.find_comment.return_value = None
+        client, mock_repo, mock_current_user = client_with_mocks
+        mock_repo.update_owned_comment.side_effect = RecordNotFoundError("Comment 999 not found")
 
         comment_data = {"body": "Updated comment", "is_published": True, "post_id": 1}
         response = client.put("/api/v1/comments/999", json=comment_data)
@@ -278,18 +488,29 @@ class TestUpdateComment:
         assert response.status_code == 404
         data = response.json()
         assert data["detail"] == "Comment not found"
-        mock_repo.find_comment.assert_called_once_with(999)
+        assert mock_repo.update_owned_comment.call_args[0][:2] == (999, mock_current_user.id)
+        mock_repo.commit.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_update_comment_not_owner(self, client_with_mocks):
+        """Test update of a comment owned by another user"""
+        client, mock_repo, _ = client_with_mocks
+        mock_repo.update_owned_comment.side_effect = NotOwnerError("Comment 1 belongs to another user")
+
+        comment_data = {"body": "Updated comment", "is_published": True, "post_id": 1}
+        response = client.put("/api/v1/comments/1", json=comment_data)
+
+        assert response.status_code == 403
+        data = response.json()
+        assert data["detail"] == "Not authorized to update this comment"
+        mock_repo.commit.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_update_comment_with_same_body(self, client_with_mocks):
         """Test update with same body"""
         client, mock_repo, mock_current_user = client_with_mocks
-        existing_comment = Comment(
-            id=1, body="Same body", is_published=True, post_id=1, user_id=mock_current_user.id
-        )
-        updated_comment = Comment(id=1, body="Same body", is_published=True, post_id=1)
-        mock_repo.find_comment.return_value = existing_comment
-        mock_repo.update_comment.return_value = updated_comment
+        updated_comment = Comment(id=1, body="Same body", is_published=True, post_id=1, user_id=mock_current_user.id)
+        mock_repo.update_owned_comment.return_value = updated_comment
 
         comment_data = {"body": "Same body", "is_published": True, "post_id": 1}
         response = client.put("/api/v1/comments/1", json=comment_data)
@@ -298,7 +519,7 @@ class TestUpdateComment:
         data = response.json()
         assert data["id"] == 1
         assert data["body"] == "Same body"
-        mock_repo.update_comment.assert_called_once()
+        mock_repo.update_owned_comment.assert_called_once()
 
     @pytest.mark.asyncio
     async def test_update_comment_without_auth(self):
@@ -317,30 +538,42 @@ class TestDeleteComment:
     async def test_delete_comment_success(self, client_with_mocks):
         """Test successful comment deletion"""
         client, mock_repo, mock_current_user = client_with_mocks
-        existing_comment = Comment(
-            id=1, body="Test comment", is_published=True, post_id=1, user_id=mock_current_user.id
-        )
-        mock_repo.find_comment.return_value = existing_comment
-        mock_repo.delete_comment.return_value = True
+        mock_repo.delete_owned_comment.return_value = None
 
         response = client.delete("/api/v1/comments/1")
 
         assert response.status_code == 204
         assert response.text == ""
-        mock_repo.delete_comment.assert_called_once_with(1)
+        mock_repo.delete_owned_comment.assert_called_once_with(1, mock_current_user.id)
+        mock_repo.find_comment.assert_not_called()
+        mock_repo.commit.assert_awaited_once()
 
     @pytest.mark.asyncio
     async def test_delete_comment_not_found(self, client_with_mocks):
         """Test deletion of non-existent comment"""
-        client, mock_repo, _ = client_with_mocks
-        mock_repo.find_comment.return_value = None
+        client, mock_repo, mock_current_user = client_with_mocks
+        mock_repo.delete_owned_comment.side_effect = RecordNotFoundError("Comment 999 not found")
 
         response = client.delete("/api/v1/comments/999")
 
         assert response.status_code == 404
         data = response.json()
         assert data["detail"] == "Comment not found"
-        mock_repo.find_comment.assert_called_once_with(999)
+        mock_repo.delete_owned_comment.assert_called_once_with(999, mock_current_user.id)
+        mock_repo.commit.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_delete_comment_not_owner(self, client_with_mocks):
+        """Test deletion of a comment owned by another user"""
+        client, mock_repo, _ = client_with_mocks
+        mock_repo.delete_owned_comment.side_effect = NotOwnerError("Comment 1 belongs to another user")
+
+        response = client.delete("/api/v1/comments/1")
+
+        assert response.status_code == 403
+        data = response.json()
+        assert data["detail"] == "Not authorized to delete this comment"
+        mock_repo.commit.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_delete_comment_invalid_id(self, client_with_mocks):
@@ -388,7 +621,7 @@ class TestCommentsControllerIntegration:
 
         # Update
         updated_comment = Comment(id=1, body="Updated comment", is_published=True, post_id=1)
-        mock_repo.update_comment.return_value = updated_comment
+        mock_repo.update_owned_comment.return_value = updated_comment
 
         update_response = client.put(
             "/api/v1/comments/1", json={"body": "Updated comment", "is_published": True, "post_id": 1}
@@ -398,7 +631,7 @@ class TestCommentsControllerIntegration:
         assert update_data["body"] == "Updated comment"
 
         # Delete
-        mock_repo.delete_comment.return_value = True
+        mock_repo.delete_owned_comment.return_value = None
         delete_response = client.delete("/api/v1/comments/1")
         assert delete_response.status_code == 204
 
@@ -408,11 +641,11 @@ class TestCommentsControllerIntegration:
         client, mock_repo, _ = client_with_mocks
 
         # Test listing multiple comments
-        mock_repo.all_comments.return_value = sample_comments
+        mock_repo.page_comments.return_value = sample_comments
         response = client.get("/api/v1/comments")
         assert response.status_code == 200
         data = response.json()
-        assert len(data) == 3
+        assert len(data["items"]) == 3
 
         # Test finding specific comments
         mock_repo.find_comment.return_value = sample_comments[0]
@@ -5,6 +5,7 @@
 # pyright: reportAny=false
 # pyright: reportUnknownMemberType=false
 
+import json
 import uuid
 from unittest.mock import create_autospec
 
@@ -12,12 +13,17 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlmodel import Session, SQLModel, create_engine
 
+from api.models.comment import Comment
 from api.models.post import Post
 from api.models.user import User
+from api.services.bulk import BULK_BATCH_SIZE, BULK_JSON_MAX_BYTES
+from api.services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor
 from api.services.repositories.posts_repository import PostsRepository
+from api.services.response_cache import MemoryResponseStore, ResponseCache
+from api.services.streaming import NDJSON_MEDIA_TYPE
 from api.setup.app import app
 from api.setup.auth import current_user
-from api.setup.dependencies import get_posts_repository
+from api.setup.dependencies import get_posts_reader, get_posts_repository, get_response_cache
 
 
 @pytest.fixture
@@ -58,7 +64,11 @@ def client_with_mocks(mock_posts_repository, mock_current_user):
         return mock_current_user
 
     app.dependency_overrides[get_posts_repository] = override_get_posts_repository
+    app.dependency_overrides[get_posts_reader] = override_get_posts_repository
     app.dependency_overrides[current_user] = override_current_user
+    # A fresh cache per test, as the mocked table versions do not change between tests
+    response_cache = ResponseCache(MemoryResponseStore())
+    app.dependency_overrides[get_response_cache] = lambda: response_cache
 
     with TestClient(app) as client:
         yield client, mock_posts_repository, mock_current_user
@@ -89,30 +99,248 @@ class TestListPosts:
     async def test_list_posts_success(self, client_with_mocks, sample_posts):
         """Test successful retrieval of all posts"""
         client, mock_repo, _ = client_with_mocks
-        mock_repo.all_posts.return_value = sample_posts
+        mock_repo.page_posts.return_value = sample_posts
 
         response = client.get("/api/v1/posts")
 
         assert response.status_code == 200
         data = response.json()
-        assert len(data) == 3
-        assert data[0]["title"] == "First Post"
-        assert data[1]["title"] == "Second Post"
-        assert data[2]["title"] == "Third Post"
-        mock_repo.all_posts.assert_called_once()
+        assert len(data["items"]) == 3
+        assert data["items"][0]["title"] == "First Post"
+        assert data["items"][1]["title"] == "Second Post"
+        assert data["items"][2]["title"] == "Third Post"
+        assert data["next_cursor"] is None
+        mock_repo.page_posts.assert_called_once_with(DEFAULT_PAGE_SIZE, None, expand=frozenset(), fields=None)
 
     @pytest.mark.asyncio
     async def test_list_posts_empty(self, client_with_mocks):
         """Test retrieval when no posts exist"""
         client, mock_repo, _ = client_with_mocks
-        mock_repo.all_posts.return_value = []
+        mock_repo.page_posts.return_value = []
 
         response = client.get("/api/v1/posts")
 
         assert response.status_code == 200
         data = response.json()
-        assert len(data) == 0
-        mock_repo.all_posts.assert_called_once()
+        assert len(data["items"]) == 0
+        assert data["next_cursor"] is None
+        mock_repo.page_posts.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_list_posts_returns_next_cursor(self, client_with_mocks, sample_posts):
+        """Test that a full page returns a cursor pointing at its last item"""
+        client, mock_repo, _ = client_with_mocks
+        mock_repo.page_posts.return_value = sample_posts
+
+        response = client.get("/api/v1/posts?limit=2")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [post["id"] for post in data["items"]] == [1, 2]
+        assert decode_cursor(data["next_cursor"]) == 2
+        mock_repo.page_posts.assert_called_once_with(2, None, expand=frozenset(), fields=None)
+
+    @pytest.mark.asyncio
+    async def test_list_posts_with_cursor(self, client_with_mocks, sample_posts):
+        """Test that the cursor is decoded and passed to the repository"""
+        client, mock_repo, _ = client_with_mocks
+        mock_repo.page_posts.return_value = sample_posts[2:]
+
+        response = client.get("/api/v1/posts", params={"limit": 2, "cursor": encode_cursor(2)})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [post["id"] for post in data["items"]] == [3]
+        assert data["next_cursor"] is None
+        mock_repo.page_posts.assert_called_once_with(2, 2, expand=frozenset(), fields=None)
+
+    @pytest.mark.asyncio
+    async def test_list_posts_invalid_cursor(self, client_with_mocks):
+        """Test that a malformed cursor is rejected"""
+        client, mock_repo, _ = client_with_mocks
+
+        response = client.get("/api/v1/posts?cursor=not-a-cursor")
+
+        assert response.status_code == 400
+        mock_repo.page_posts.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_list_posts_limit_out_of_range(self, client_with_mocks):
+        """Test that limits outside the allowed range are rejected"""
+        client, _, _ = client_with_mocks
+
+        assert client.get("/api/v1/posts?limit=0").status_code == 422
+        assert client.get(f"/api/v1/posts?limit={MAX_PAGE_SIZE + 1}").status_code == 422
+
+
+class TestMultiGetPosts:
+    """Test cases for GET /api/v1/posts?ids=... endpoint"""
+
+    @pytest.mark.asyncio
+    async def test_multi_get_posts(self, client_with_mocks, sample_posts):
+        """Test fetching several posts by id in one request"""
+        client, mock_repo, _ = client_with_mocks
+        mock_repo.find_posts.return_value = [sample_posts[2], sample_posts[0]]
+
+        response = client.get("/api/v1/posts?ids=3,1,42")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [post["id"] for post in data["items"]] == [3, 1]
+        assert data["next_cursor"] is None
+        mock_repo.find_posts.assert_called_once_with([3, 1, 42], expand=frozenset(), fields=None)
+        mock_repo.page_posts.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_multi_get_posts_invalid_ids(self, client_with_mocks):
+        """Test that malformed id lists are rejected"""
+        client, mock_repo, _ = client_with_mocks
+
+        assert client.get("/api/v1/posts?ids=1,abc").status_code == 422
+        assert client.get("/api/v1/posts?ids=").status_code == 422
+        mock_repo.find_posts.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_multi_get_posts_too_many_ids(self, client_with_mocks):
+        """Test that id lists longer than a page are rejected"""
+        client, mock_repo, _ = client_with_mocks
+
+        ids = ",".join(str(i) for i in range(MAX_PAGE_SIZE + 1))
+        response = client.get(f"/api/v1/posts?ids={ids}")
+
+        assert response.status_code == 400
+        mock_repo.find_posts.assert_not_called()
+
+
+class TestExpandPosts:
+    """Test cases for the expand= parameter on post routes"""
+
+    @pytest.fixture
+    def expanded_post(self, mock_current_user):
+        post = Post(id=1, title="Test Post", body="Test body", is_published=True, user_id=mock_current_user.id)
+        post.author = mock_current_user
+        post.comments = [Comment(id=5, body="Nice", post_id=1, user_id=mock_current_user.id)]
+        return post
+
+    @pytest.mark.asyncio
+    async def test_list_posts_expand(self, client_with_mocks, expanded_post, mock_current_user):
+        """Test that expanded relations are nested in each listed post"""
+        client, mock_repo, _ = client_with_mocks
+        mock_repo.page_posts.return_value = [expanded_post]
+
+        response = client.get("/api/v1/posts?expand=comments,author")
+
+        assert response.status_code == 200
+        item = response.json()["items"][0]
+        assert item["author"] == {"id": str(mock_current_user.id)}
+        assert [comment["id"] for comment in item["comments"]] == [5]
+        mock_repo.page_posts.assert_called_once_with(
+            DEFAULT_PAGE_SIZE, None, expand=frozenset({"author", "comments"}), fields=None
+        )
+
+    @pytest.mark.asyncio
+    async def test_find_post_expand(self, client_with_mocks, expanded_post):
+        """Test expanding only the author of a single post"""
+        client, mock_repo, _ = client_with_mocks
+        mock_repo.find_post.return_value = expanded_post
+
+        response = client.get("/api/v1/posts/1?expand=author")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["author"] == {"id": "123e4567-e89b-12d3-a456-426614174000"}
+        assert "comments" not in data
+        mock_repo.find_post.assert_called_once_with(1, expand=frozenset({"author"}))
+
+    @pytest.mark.asyncio
+    async def test_unexpanded_post_has_no_relation_keys(self, client_with_mocks, sample_post):
+        """Test that relations are omitted unless requested"""
+        client, mock_repo, _ = client_with_mocks
+        mock_repo.find_post.return_value = sample_post
+
+        response = client.get("/api/v1/posts/1")
+
+        assert set(response.json()) == {"id", "title", "body", "excerpt", "is_published", "version", "user_id"}
+
+    @pytest.mark.asyncio
+    async def test_expand_unknown_relation(self, client_with_mocks):
+        """Test that unknown relations are rejected"""
+        client, mock_repo, _ = client_with_mocks
+
+        response = client.get("/api/v1/posts?expand=author,likes")
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Cannot expand: likes"
+        mock_repo.page_posts.assert_not_called()
+
+
+class TestSparseFieldsets:
+    """Test cases for the fields= parameter on post list routes"""
+
+    @pytest.mark.asyncio
+    async def test_list_posts_fields(self, client_with_mocks):
+        """Test that only the requested fields (plus id) are returned"""
+        client, mock_repo, _ = client_with_mocks
+        post = Post(id=1, title="Test Post", excerpt="Short")
+        mock_repo.page_posts.return_value = [post]
+
+        response = client.get("/api/v1/posts?fields=title,excerpt")
+
+        assert response.status_code == 200
+        assert response.json()["items"] == [{"id": 1, "title": "Test Post", "excerpt": "Short"}]
+        mock_repo.page_posts.assert_called_once_with(
+            DEFAULT_PAGE_SIZE, None, expand=frozenset(), fields=frozenset({"id", "title", "excerpt"})
+        )
+
+    @pytest.mark.asyncio
+    async def test_list_posts_unknown_field(self, client_with_mocks):
+        """Test that unknown fields are rejected"""
+        client, mock_repo, _ = client_with_mocks
+
+        response = client.get("/api/v1/posts?fields=title,secret")
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Unknown fields: secret"
+        mock_repo.page_posts.assert_not_called()
+
+
+class TestStreamPosts:
+    """Test cases for streaming GET /api/v1/posts as NDJSON"""
+
+    @staticmethod
+    async def _iterate(items):
+        for item in items:
+            yield item
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        ("params", "headers"),
+        [({"stream": 1}, {}), ({}, {"Accept": NDJSON_MEDIA_TYPE})],
+    )
+    async def test_stream_posts(self, client_with_mocks, sample_posts, params, headers):
+        """Test streaming every post via the query flag or the Accept header"""
+        client, mock_repo, _ = client_with_mocks
+        mock_repo.stream_posts.return_value = self._iterate(sample_posts)
+
+        response = client.get("/api/v1/posts", params=params, headers=headers)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == NDJSON_MEDIA_TYPE
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["title"] for line in lines] == ["First Post", "Second Post", "Third Post"]
+        mock_repo.stream_posts.assert_called_once_with(expand=frozenset(), fields=None)
+        mock_repo.page_posts.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_stream_posts_empty(self, client_with_mocks):
+        """Test streaming when no posts exist"""
+        client, mock_repo, _ = client_with_mocks
+        mock_repo.stream_posts.return_value = self._iterate([])
+
+        response = client.get("/api/v1/posts?stream=1")
+
+        assert response.status_code == 200
+        assert response.text == ""
 
 
 class TestFindPost:
@@ -130,7 +358,7 @@ class TestFindPost:
         data = response.json()
         assert data["id"] == 1
         assert data["title"] == "Test Post"
-        mock_repo.find_post.assert_called_once_with(1)
+        mock_repo.find_post.assert_called_once_with(1, expand=frozenset())
 
     @pytest.mark.asyncio
     async def test_find_post_not_found(self, client_with_mocks):
@@ -143,7 +371,7 @@ class TestFindPost:
         assert response.status_code == 404
         data = response.json()
         assert data["detail"] == "Post not found"
-        mock_repo.find_post.assert_called_once_with(999)
+        mock_repo.find_post.assert_called_once_with(999, expand=frozenset())
 
     @pytest.mark.asyncio
     async def test_find_post_invalid_id(self, client_with_mocks):
@@ -155,6 +383,119 @@ class TestFindPost:
         assert response.status_code == 422  # Validation error
 
 
+class TestConditionalPosts:
+    """Test cases for ETags and If-None-Match on post reads"""
+
+    @pytest.mark.asyncio
+    async def test_find_post_revalidation_skips_loading(self, client_with_mocks, sample_post):
+        """Test that a matching If-None-Match is answered from the version alone"""
+        client, mock_repo, _ = client_with_mocks
+        sample_post.version = 7
+        mock_repo.find_post.return_value = sample_post
+        mock_repo.post_version.return_value = 7
+
+        first = client.get("/api/v1/posts/1")
+        mock_repo.find_post.reset_mock()
+        revalidated = client.get("/api/v1/posts/1", headers={"If-None-Match": first.headers["etag"]})
+
+        assert first.status_code == 200
+        assert first.headers["cache-control"] == "public, no-cache"
+        assert revalidated.status_code == 304
+        assert revalidated.content == b""
+        assert revalidated.headers["etag"] == first.headers["etag"]
+        mock_repo.find_post.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_find_post_changed_version_is_reloaded(self, client_with_mocks, sample_post):
+        """Test that a stale ETag gets the full, newly tagged post"""
+        client, mock_repo, _ = client_with_mocks
+        sample_post.version = 7
+        mock_repo.find_post.return_value = sample_post
+        mock_repo.post_version.return_value = 7
+        etag = client.get("/api/v1/posts/1").headers["etag"]
+        sample_post.version = mock_repo.post_version.return_value = 8
+
+        response = client.get("/api/v1/posts/1", headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert response.json()["version"] == 8
+
+    @pytest.mark.asyncio
+    async def test_find_post_revalidation_not_found(self, client_with_mocks):
+        """Test that revalidating a deleted post is a 404"""
+        client, mock_repo, _ = client_with_mocks
+        mock_repo.post_version.return_value = None
+
+        response = client.get("/api/v1/posts/999", headers={"If-None-Match": '"abc"'})
+
+        assert response.status_code == 404
+        mock_repo.find_post.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_list_posts_revalidation_skips_query(self, client_with_mocks, sample_posts):
+        """Test that a list is tagged by the table's change counter and its query"""
+        client, mock_repo, _ = client_with_mocks
+        mock_repo.page_posts.return_value = sample_posts
+        mock_repo.table_versions.return_value = (3,)
+
+        etag = client.get("/api/v1/posts?limit=10").headers["etag"]
+        other_query = client.get("/api/v1/posts?limit=20").headers["etag"]
+        mock_repo.page_posts.reset_mock()
+        revalidated = client.get("/api/v1/posts?limit=10", headers={"If-None-Match": etag})
+
+        assert etag != other_query
+        assert revalidated.status_code == 304
+        mock_repo.page_posts.assert_not_called()
+        mock_repo.table_versions.assert_called_with(Post)
+
+    @pytest.mark.asyncio
+    async def test_list_posts_served_from_response_cache(self, client_with_mocks, sample_posts):
+        """Test that a list is rendered once per table version and query"""
+        client, mock_repo, _ = client_with_mocks
+        mock_repo.page_posts.return_value = sample_posts
+        mock_repo.table_versions.return_value = (3,)
+
+        first = client.get("/api/v1/posts")
+        second = client.get("/api/v1/posts")
+        mock_repo.table_versions.return_value = (4,)
+        after_write = client.get("/api/v1/posts")
+
+        assert first.json() == second.json() == after_write.json()
+        assert second.headers["etag"] == first.headers["etag"]
+        assert after_write.headers["etag"] != first.headers["etag"]
+        assert mock_repo.page_posts.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_expanded_author_revalidates_from_the_version(
+        self, client_with_mocks, sample_post, mock_current_user
+    ):
+        """Test that expanding the author keeps the versioned ETag, so a 304 skips loading the post"""
+        client, mock_repo, _ = client_with_mocks
+        sample_post.version = 7
+        sample_post.author = mock_current_user
+        mock_repo.find_post.return_value = sample_post
+        mock_repo.post_version.return_value = 7
+
+        first = client.get("/api/v1/posts/1?expand=author")
+        mock_repo.find_post.reset_mock()
+        revalidated = client.get("/api/v1/posts/1?expand=author", headers={"If-None-Match": first.headers["etag"]})
+
+        assert revalidated.status_code == 304
+        mock_repo.find_post.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_credentialed_requests_are_private(self, client_with_mocks, sample_post):
+        """Test that responses to requests with a cookie are private and vary on it"""
+        client, mock_repo, _ = client_with_mocks
+        mock_repo.find_post.return_value = sample_post
+
+        response = client.get("/api/v1/posts/1", headers={"Cookie": "auth=token"})
+
+        assert response.headers["cache-control"] == "private, no-cache"
+        assert "Cookie" in response.headers["vary"]
+
+
 class TestCreatePost:
     """Test cases for POST /api/v1/posts endpoint"""
 
@@ -175,6 +516,7 @@ class TestCreatePost:
         mock_repo.create_post.assert_called_once()
         call_args = mock_repo.create_post.call_args[0][0]
         assert call_args.title == "Test Post"
+        mock_repo.commit.assert_awaited_once()
 
     @pytest.mark.asyncio
     async def test_create_post_with_id_specified(self, client_with_mocks):
@@ -219,6 +561,88 @@ class TestCreatePost:
             assert response.status_code == 401
 
 
+class TestBulkCreatePosts:
+    """Test cases for POST /api/v1/posts/bulk endpoint"""
+
+    @pytest.mark.asyncio
+    async def test_bulk_create_posts_json_array(self, client_with_mocks):
+        """Test bulk creation from a JSON array"""
+        client, mock_repo, mock_current_user = client_with_mocks
+        mock_repo.bulk_create_posts.return_value = [1, 2]
+
+        posts = [
+            {"title": "First Post", "body": "First body", "is_published": True},
+            {"title": "Second Post", "body": "Second body", "is_published": False},
+        ]
+        response = client.post("/api/v1/posts/bulk", json=posts)
+
+        assert response.status_code == 201
+        assert response.json() == {"ids": [1, 2]}
+        batch, user_id = mock_repo.bulk_create_posts.call_args[0]
+        assert [post.title for post in batch] == ["First Post", "Second Post"]
+        assert user_id == mock_current_user.id
+        mock_repo.commit.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_bulk_create_posts_ndjson_in_batches(self, client_with_mocks):
+        """Test bulk creation from an NDJSON stream split into batches"""
+        client, mock_repo, _ = client_with_mocks
+        total = BULK_BATCH_SIZE + 1
+        mock_repo.bulk_create_posts.side_effect = [list(range(1, BULK_BATCH_SIZE + 1)), [total]]
+
+        lines = [json.dumps({"title": f"Post {i}", "body": "Body", "is_published": True}) for i in range(total)]
+        response = client.post(
+            "/api/v1/posts/bulk",
+            content="\n".join(lines) + "\n",
+            headers={"Content-Type": NDJSON_MEDIA_TYPE},
+        )
+
+        assert response.status_code == 201
+        assert response.json() == {"ids": list(range(1, total + 1))}
+        assert mock_repo.bulk_create_posts.call_count == 2
+        assert len(mock_repo.bulk_create_posts.call_args_list[0][0][0]) == BULK_BATCH_SIZE
+        mock_repo.commit.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_bulk_create_posts_invalid_item(self, client_with_mocks):
+        """Test that an invalid item rejects the request and reports its position"""
+        client, mock_repo, _ = client_with_mocks
+
+        lines = [json.dumps({"title": "Valid", "body": "Body", "is_published": True}), json.dumps({"title": "No body"})]
+        response = client.post(
+            "/api/v1/posts/bulk", content="\n".join(lines), headers={"Content-Type": NDJSON_MEDIA_TYPE}
+        )
+
+        assert response.status_code == 422
+        locations = [error["loc"] for error in response.json()["detail"]]
+        assert ["body", 1, "body"] in locations
+        mock_repo.bulk_create_posts.assert_not_called()
+        mock_repo.commit.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_bulk_create_posts_json_array_too_large(self, client_with_mocks):
+        """Test that an oversized JSON array is refused, pointing at NDJSON"""
+        client, mock_repo, _ = client_with_mocks
+
+        response = client.post(
+            "/api/v1/posts/bulk",
+            content=b"[" + b" " * BULK_JSON_MAX_BYTES + b"]",
+            headers={"Content-Type": "application/json"},
+        )
+
+        assert response.status_code == 413
+        assert "NDJSON" in response.json()["detail"]
+        mock_repo.bulk_create_posts.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_bulk_create_posts_without_auth(self):
+        """Test bulk creation without authentication"""
+        with TestClient(app) as client:
+            response = client.post("/api/v1/posts/bulk", json=[])
+
+            assert response.status_code == 401
+
+
 class TestUpdatePost:
     """Test cases for PUT /api/v1/posts/{post_id} endpoint"""
 
@@ -255,6 +679,7 @@ class TestUpdatePost:
         data = response.json()
         assert data["detail"] == "Post not found"
         mock_repo.update_post.assert_called_once()
+        mock_repo.commit.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_update_post_with_same_name(self, client_with_mocks):
@@ -375,11 +800,11 @@ class TestPostsControllerIntegration:
         client, mock_repo, _ = client_with_mocks
 
         # Test listing multiple posts
-        mock_repo.all_posts.return_value = sample_posts
+        mock_repo.page_posts.return_value = sample_posts
         response = client.get("/api/v1/posts")
         assert response.status_code == 200
         data = response.json()
-        assert len(data) == 3
+        assert len(data["items"]) == 3
 
         # Test finding specific posts
         mock_repo.find_post.return_value = sample_posts[0]
@@ -5,21 +5,28 @@
 # pyright: reportAny=false
 # pyright: reportUnknownMemberType=false
 
+import uuid
+
 import pytest
 import pytest_asyncio
+from sqlalchemy import event, text
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlmodel import SQLModel
 
 from api.models.comment import Comment
 from api.models.post import Post
+from api.models.user import User
+from api.services.repositories.base_repository import NotOwnerError, RecordNotFoundError
 from api.services.repositories.comments_repository import CommentsRepository
 from api.services.repositories.posts_repository import PostsRepository
+from api.setup.database import enable_sqlite_foreign_keys
 
 
 @pytest_asyncio.fixture
 async def test_session():
     """Create a test database session"""
     engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    enable_sqlite_foreign_keys(engine)
     async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
     async with engine.begin() as conn:
@@ -77,6 +84,61 @@ async def test_all_comments(comments_repository):
     assert any(comment.body == "Second comment" for comment in all_comments)
 
 
+@pytest.mark.asyncio
+async def test_page_comments_filters(test_session, comments_repository, posts_repository):
+    """Test keyset pagination over comments filtered by post and user"""
+    first_post = await posts_repository.create_post(Post(title="First", body="Content", is_published=True))
+    second_post = await posts_repository.create_post(Post(title="Second", body="Content", is_published=True))
+    author = User(email="author@example.com", hashed_password="hashed")  # noqa: S106
+    test_session.add(author)
+    await test_session.commit()
+    author_id = author.id
+
+    for i in range(3):
+        _ = await comments_repository.create_comment(
+            Comment(body=f"First {i}", is_published=True, post_id=first_post.id, user_id=author_id)
+        )
+        _ = await comments_repository.create_comment(Comment(body=f"Second {i}", post_id=second_post.id))
+
+    page = await comments_repository.page_comments(2, post_id=first_post.id)
+    assert [comment.body for comment in page] == ["First 0", "First 1", "First 2"]
+
+    next_page = await comments_repository.page_comments(2, after_id=page[1].id, post_id=first_post.id)
+    assert [comment.body for comment in next_page] == ["First 2"]
+
+    by_user = await comments_repository.page_comments(10, user_id=author_id)
+    assert len(by_user) == 3
+    assert all(comment.user_id == author_id for comment in by_user)
+
+    unfiltered = await comments_repository.page_comments(10)
+    assert len(unfiltered) == 6
+
+
+@pytest.mark.asyncio
+async def test_stream_comments_by_post(comments_repository, posts_repository):
+    """Test streaming the comments of one post in id order"""
+    post = await posts_repository.create_post(Post(title="Post", body="Content", is_published=True))
+    for i in range(3):
+        _ = await comments_repository.create_comment(Comment(body=f"Comment {i}", post_id=post.id))
+    _ = await comments_repository.create_comment(Comment(body="Elsewhere"))
+
+    streamed = [comment.body async for comment in comments_repository.stream_comments(post_id=post.id)]
+
+    assert streamed == ["Comment 0", "Comment 1", "Comment 2"]
+
+
+@pytest.mark.asyncio
+async def test_page_comments_by_post_uses_composite_index(test_session):
+    """Test that post-scoped pages are served by the (post_id, id) index"""
+    result = await test_session.execute(
+        text("EXPLAIN QUERY PLAN SELECT * FROM comment WHERE post_id = 1 AND id > 10 ORDER BY id LIMIT 51")
+    )
+    plan = " ".join(str(row[-1]) for row in result.all())
+
+    assert "ix_comment_post_id_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+
 @pytest.mark.asyncio
 async def test_update_comment(comments_repository):
     """Test updating a comment"""
@@ -94,10 +156,24 @@ async def test_update_comment(comments_repository):
 
     assert updated_comment is not None
     assert updated_comment.body == "Updated comment"
+    assert updated_comment.excerpt == "Updated comment"
     assert updated_comment.is_published
     assert updated_comment.id == created_comment.id
 
 
+@pytest.mark.asyncio
+async def test_page_comments_loads_only_requested_fields(comments_repository, statements):
+    """Test that sparse fieldsets leave unrequested columns out of the query"""
+    _ = await comments_repository.create_comment(Comment(body="A long comment body", is_published=True))
+    comments_repository.session.expunge_all()
+    statements.clear()
+
+    comments = await comments_repository.page_comments(10, fields=frozenset({"id", "excerpt"}))
+
+    assert comments[0].excerpt == "A long comment body"
+    assert "comment.body" not in statements[0]
+
+
 @pytest.mark.asyncio
 async def test_delete_comment(comments_repository):
     """Test deleting a comment"""
@@ -144,3 +220,126 @@ async def test_create_comment_with_relationships(comments_repository, posts_repo
     created_comment = await comments_repository.create_comment(comment)
 
     assert created_comment.post_id == created_post.id
+
+
+@pytest.mark.asyncio
+async def test_create_comments_shares_one_version(comments_repository):
+    """Test that comments created together get keys, excerpts and one table version"""
+    comments = await comments_repository.create_comments([Comment(body="First"), Comment(body="Second")])
+
+    assert [comment.excerpt for comment in comments] == ["First", "Second"]
+    assert comments[0].id is not None
+    assert comments[1].id == comments[0].id + 1
+    assert comments[0].version == comments[1].version == 1
+    assert (await comments_repository.find_comment(comments[1].id)).body == "Second"
+
+
+@pytest.mark.asyncio
+async def test_delete_post_cascades_to_comments(comments_repository, posts_repository):
+    """Test that deleting a post removes its comments through the database cascade"""
+    post = await posts_repository.create_post(Post(title="Test", body="Content", is_published=True))
+    comment = await comments_repository.create_comment(Comment(body="Test comment", post_id=post.id))
+
+    assert await posts_repository.delete_post(post.id) is True
+
+    comments_repository.session.expunge_all()
+    assert await comments_repository.find_comment(comment.id) is None
+
+
+@pytest_asyncio.fixture
+async def comment_owner(test_session) -> User:
+    """Create a user who owns comments"""
+    owner = User(email="owner@example.com", hashed_password="hashed")  # noqa: S106
+    test_session.add(owner)
+    await test_session.commit()
+    return owner
+
+
+@pytest.fixture
+def statements(test_session):
+    """Record every SQL statement executed through the test session"""
+    executed: list[str] = []
+
+    def record(_conn, _cursor, statement, _parameters, _context, _executemany):
+        executed.append(statement)
+
+    sync_engine = test_session.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(sync_engine, "before_cursor_execute", record)
+
+
+@pytest.mark.asyncio
+async def test_update_owned_comment(test_session, comment_owner, statements):
+    """Test that the owner's update is one statement, advancing the change counter only as it commits"""
+    comments_repository = CommentsRepository(test_session, autocommit=False)
+    comment = await comments_repository.create_comment(Comment(body="Original", user_id=comment_owner.id))
+    await comments_repository.commit()
+    created_version = comment.version
+    statements.clear()
+
+    updated = await comments_repository.update_owned_comment(
+        comment.id, comment_owner.id, Comment(body="Updated", user_id=uuid.uuid4())
+    )
+
+    assert updated.body == "Updated"
+    assert updated.user_id == comment_owner.id  # Ownership cannot be reassigned
+    assert updated.version > created_version
+    assert len(statements) == 1
+    assert statements[0].startswith("UPDATE comment")
+    assert test_session.in_transaction()  # Nothing committed until the route commits
+    await comments_repository.commit()
+    assert statements[1].startswith("UPDATE table_version")
+    assert await comments_repository.table_versions(Comment) == (updated.version,)
+
+
+@pytest.mark.asyncio
+async def test_update_owned_comment_not_owner(test_session, comment_owner):
+    """Test that another user's update is rejected without changing the row or its table's counter"""
+    comments_repository = CommentsRepository(test_session, autocommit=False)
+    comment = await comments_repository.create_comment(Comment(body="Original", user_id=comment_owner.id))
+    await comments_repository.commit()
+
+    with pytest.raises(NotOwnerError):
+        _ = await comments_repository.update_owned_comment(comment.id, uuid.uuid4(), Comment(body="Hijacked"))
+    await comments_repository.commit()
+
+    found = await comments_repository.find_comment(comment.id)
+    assert found is not None
+    assert found.body == "Original"
+    assert found.version == comment.version
+    assert await comments_repository.table_versions(Comment) == (comment.version,)
+
+
+@pytest.mark.asyncio
+async def test_update_owned_comment_not_found(test_session, comment_owner):
+    """Test that updating a missing comment is told apart from a foreign one"""
+    comments_repository = CommentsRepository(test_session, autocommit=False)
+
+    with pytest.raises(RecordNotFoundError):
+        _ = await comments_repository.update_owned_comment(999, comment_owner.id, Comment(body="Updated"))
+
+
+@pytest.mark.asyncio
+async def test_delete_owned_comment(test_session, comment_owner):
+    """Test conditional deletes for the owner, another user and a missing comment"""
+    comments_repository = CommentsRepository(test_session, autocommit=False)
+    comment = await comments_repository.create_comment(Comment(body="To delete", user_id=comment_owner.id))
+
+    with pytest.raises(NotOwnerError):
+        await comments_repository.delete_owned_comment(comment.id, uuid.uuid4())
+
+    await comments_repository.delete_owned_comment(comment.id, comment_owner.id)
+    await comments_repository.commit()
+
+    with pytest.raises(RecordNotFoundError):
+        await comments_repository.delete_owned_comment(comment.id, comment_owner.id)
+
+
+@pytest.mark.asyncio
+async def test_post_exists(comments_repository, posts_repository):
+    """Test checking the post a new comment references"""
+    post = await posts_repository.create_post(Post(title="Post", body="Body", is_published=True))
+
+    assert await comments_repository.post_exists(post.id)
+    assert not await comments_repository.post_exists(post.id + 1)
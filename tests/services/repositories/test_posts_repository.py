@@ -7,10 +7,14 @@
 
 import pytest
 import pytest_asyncio
+from sqlalchemy import event, inspect
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlmodel import SQLModel
 
+from api.models.comment import Comment
 from api.models.post import Post
+from api.models.user import User
+from api.schemas.post import PostCreate
 from api.services.repositories.posts_repository import PostsRepository
 
 
@@ -28,6 +32,20 @@ async def test_session():
         yield session
 
 
+@pytest.fixture
+def statements(test_session):
+    """Record every SQL statement executed through the test session"""
+    executed: list[str] = []
+
+    def record(_conn, _cursor, statement, _parameters, _context, _executemany):
+        executed.append(statement)
+
+    sync_engine = test_session.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(sync_engine, "before_cursor_execute", record)
+
+
 @pytest_asyncio.fixture
 async def posts_repository(test_session) -> PostsRepository:
     """Create a PostsRepository instance with test session"""
@@ -50,6 +68,20 @@ async def test_create_and_find_post(posts_repository):
     assert found_post.title == "Test Post"
 
 
+@pytest.mark.asyncio
+async def test_find_posts(posts_repository, statements):
+    """Test fetching many posts in the requested order with one query"""
+    ids = await posts_repository.bulk_create_posts(
+        [PostCreate(title=f"Post {i}", body="Body", is_published=True) for i in range(3)]
+    )
+    statements.clear()
+
+    posts = await posts_repository.find_posts([ids[2], 999, ids[0], ids[2]])
+
+    assert [post.title for post in posts] == ["Post 2", "Post 0"]
+    assert len(statements) == 1
+
+
 @pytest.mark.asyncio
 async def test_all_posts(posts_repository):
     """Test retrieving all posts"""
@@ -69,6 +101,124 @@ async def test_all_posts(posts_repository):
     assert any(post.title == "Second Post" for post in all_posts)
 
 
+@pytest.mark.asyncio
+async def test_page_posts(posts_repository):
+    """Test keyset pagination over posts"""
+    for i in range(5):
+        _ = await posts_repository.create_post(Post(title=f"Post {i}", body="Body", is_published=True))
+
+    first_page = await posts_repository.page_posts(2)
+    # One extra row signals that another page follows
+    assert [post.title for post in first_page] == ["Post 0", "Post 1", "Post 2"]
+
+    second_page = await posts_repository.page_posts(2, after_id=first_page[1].id)
+    assert [post.title for post in second_page] == ["Post 2", "Post 3", "Post 4"]
+
+    last_page = await posts_repository.page_posts(2, after_id=second_page[1].id)
+    assert [post.title for post in last_page] == ["Post 4"]
+
+
+@pytest.mark.asyncio
+async def test_page_posts_expand_uses_constant_queries(posts_repository, test_session, statements):
+    """Test that expanding authors and comments costs the same number of queries for any page size"""
+    authors: list[User] = []
+    for i in range(50):
+        author = User(email=f"author{i}@example.com", hashed_password="hashed")
+        authors.append(author)
+        post = Post(title=f"Post {i}", body="Body", is_published=True, author=author)
+        post.comments = [Comment(body=f"Comment {i}.{j}", post=post) for j in range(2)]
+        test_session.add(post)
+    await test_session.commit()
+    test_session.expunge_all()
+    statements.clear()
+
+    posts = await posts_repository.page_posts(50, expand=frozenset({"author", "comments"}))
+
+    assert len(posts) == 50
+    assert posts[7].author.id == authors[7].id
+    assert [comment.body for comment in posts[7].comments] == ["Comment 7.0", "Comment 7.1"]
+    # One joined query for posts and authors, one IN query for all comments
+    assert len(statements) == 2
+
+
+@pytest.mark.asyncio
+async def test_find_post_expand(posts_repository, test_session):
+    """Test eager loading relations on a single post"""
+    author = User(email="author@example.com", hashed_password="hashed")
+    post = Post(title="Post", body="Body", is_published=True, author=author)
+    test_session.add(post)
+    await test_session.commit()
+    test_session.expunge_all()
+
+    found = await posts_repository.find_post(post.id, expand=frozenset({"author"}))
+    found_again = await posts_repository.find_posts([post.id], expand=frozenset({"comments"}))
+
+    assert found.author.id == author.id
+    # Only the public id of the author is read
+    assert "email" in inspect(found.author).unloaded
+    assert found_again[0].comments == []
+
+
+@pytest.mark.asyncio
+async def test_page_posts_loads_only_requested_fields(posts_repository, test_session, statements):
+    """Test that sparse fieldsets leave unrequested columns out of the query"""
+    _ = await posts_repository.create_post(Post(title="Post", body="Body " * 1000, is_published=True))
+    test_session.expunge_all()
+    statements.clear()
+
+    posts = await posts_repository.page_posts(10, fields=frozenset({"title", "excerpt"}))
+
+    assert posts[0].title == "Post"
+    assert posts[0].excerpt.endswith("…")
+    assert "post.body" not in statements[0]
+
+
+@pytest.mark.asyncio
+async def test_excerpt_is_maintained_on_write(posts_repository):
+    """Test that creates, bulk creates and body updates refresh the excerpt"""
+    created = await posts_repository.create_post(Post(title="Post", body="First\nbody", is_published=True))
+    assert created.excerpt == "First body"
+
+    [bulk_id] = await posts_repository.bulk_create_posts(
+        [PostCreate(title="Bulk", body="Bulk body", is_published=True)]
+    )
+    assert (await posts_repository.find_post(bulk_id)).excerpt == "Bulk body"
+
+    updated = await posts_repository.update_post(created.id, Post(body="Second body"))
+    assert updated.excerpt == "Second body"
+
+    retitled = await posts_repository.update_post(created.id, Post(title="Renamed", excerpt="made up"))
+    assert retitled.excerpt == "Second body"
+
+
+@pytest.mark.asyncio
+async def test_stream_posts(posts_repository):
+    """Test streaming every post in id order"""
+    for i in range(3):
+        _ = await posts_repository.create_post(Post(title=f"Post {i}", body="Body", is_published=True))
+
+    streamed = [post.title async for post in posts_repository.stream_posts()]
+
+    assert streamed == ["Post 0", "Post 1", "Post 2"]
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_posts(posts_repository, statements):
+    """Test that bulk creation is one statement (plus the change counter) and returns ids in input order"""
+    posts = [PostCreate(title=f"Post {i}", body="Body", is_published=i % 2 == 0) for i in range(10)]
+
+    ids = await posts_repository.bulk_create_posts(posts)
+
+    assert len(ids) == 10
+    assert len(statements) == 3
+    assert statements[1].startswith("INSERT INTO post")
+    assert statements[2].startswith("UPDATE table_version")  # As it commits
+    for post_id, post in zip(ids, posts, strict=True):
+        found_post = await posts_repository.find_post(post_id)
+        assert found_post is not None
+        assert found_post.title == post.title
+
+
 @pytest.mark.asyncio
 async def test_update_post(posts_repository):
     """Test updating a post"""
@@ -91,6 +241,50 @@ async def test_update_post(posts_repository):
     assert updated_post.id == created_post.id
 
 
+@pytest.mark.asyncio
+async def test_update_post_is_single_statement(posts_repository, statements):
+    """Test that an update is one UPDATE ... RETURNING statement, the change counter advancing as it commits"""
+    created_post = await posts_repository.create_post(Post(title="Original", body="Body", is_published=False))
+    created_version = created_post.version
+    statements.clear()
+
+    updated_post = await posts_repository.update_post(created_post.id, Post(title="Updated", is_published=True))
+
+    assert updated_post is not None
+    assert updated_post.title == "Updated"
+    assert updated_post.body == "Body"  # Unset fields are left untouched
+    assert updated_post.version > created_version
+    assert len(statements) == 2
+    assert statements[0].startswith("UPDATE post")
+    assert statements[1].startswith("UPDATE table_version")
+
+
+@pytest.mark.asyncio
+async def test_update_nonexistent_post(posts_repository, statements):
+    """Test that updating a missing post needs no extra lookup and leaves the change counter alone"""
+    updated_post = await posts_repository.update_post(999, Post(title="Updated", body="Body", is_published=True))
+
+    assert updated_post is None
+    assert len(statements) == 1
+    assert statements[0].startswith("UPDATE post")
+
+
+@pytest.mark.asyncio
+async def test_delete_post_is_single_statement(posts_repository, statements):
+    """Test that a delete is one DELETE ... RETURNING statement, bumping counters only when a row went"""
+    created_post = await posts_repository.create_post(Post(title="To Delete", body="Body", is_published=True))
+    statements.clear()
+
+    assert await posts_repository.delete_post(created_post.id) is True
+    assert await posts_repository.delete_post(created_post.id) is False
+    assert [statement.split(" ", 2)[:2] for statement in statements] == [
+        ["DELETE", "FROM"],
+        ["UPDATE", "table_version"],  # comment, cascaded to
+        ["UPDATE", "table_version"],  # post
+        ["DELETE", "FROM"],
+    ]
+
+
 @pytest.mark.asyncio
 async def test_delete_post(posts_repository):
     """Test deleting a post"""
@@ -111,6 +305,54 @@ async def test_delete_post(posts_repository):
     assert deleted_post is None
 
 
+@pytest.mark.asyncio
+async def test_writes_stamp_rows_with_the_table_version(posts_repository):
+    """Test that every write advances the post counter and stamps the rows it writes"""
+    created_post = await posts_repository.create_post(Post(title="First", body="Body", is_published=True))
+    created_version = created_post.version
+    bulk_ids = await posts_repository.bulk_create_posts([PostCreate(title="Bulk", body="Body", is_published=True)])
+    updated_post = await posts_repository.update_post(created_post.id, Post(title="Updated", version=99))
+
+    assert created_version == 1
+    assert (await posts_repository.find_post(bulk_ids[0])).version == 2
+    assert updated_post.version == 3  # A version sent by the client is ignored
+    assert await posts_repository.post_version(created_post.id) == 3
+    assert await posts_repository.post_version(999) is None
+    assert await posts_repository.table_versions(Post) == (3,)
+
+
+@pytest.mark.asyncio
+async def test_delete_post_bumps_cascaded_tables(posts_repository):
+    """Test that deleting a post also advances the counter of the comments it cascades to"""
+    created_post = await posts_repository.create_post(Post(title="To Delete", body="Body", is_published=True))
+    before = await posts_repository.table_versions(Post, Comment)
+
+    await posts_repository.delete_post(created_post.id)
+
+    after = await posts_repository.table_versions(Post, Comment)
+    assert after == (before[0] + 1, before[1] + 1)
+
+
+@pytest.mark.asyncio
+async def test_table_version_advances_as_the_unit_of_work_commits(test_session):
+    """Test that the counter is only written at commit, past every version stamped, and not after a rollback"""
+    posts_repository = PostsRepository(test_session, autocommit=False)
+    discarded = await posts_repository.create_post(Post(title="Discarded", body="Body", is_published=True))
+    assert discarded.version == 1
+    await test_session.rollback()
+
+    created_post = await posts_repository.create_post(Post(title="First", body="Body", is_published=True))
+    await posts_repository.update_post(created_post.id, Post(title="Second"))
+    updated_post = await posts_repository.update_post(created_post.id, Post(title="Third"))
+    assert await posts_repository.table_versions(Post) == (0,)
+
+    # Committing on the session, as the user manager does, advances it too
+    await test_session.commit()
+
+    assert updated_post.version == 3
+    assert await posts_repository.table_versions(Post) == (3,)
+
+
 @pytest.mark.asyncio
 async def test_find_nonexistent_post(posts_repository):
     """Test finding a post that doesn't exist"""
@@ -0,0 +1,48 @@
+# pyright: reportUnknownVariableType=false
+# pyright: reportMissingParameterType=false
+# pyright: reportUnknownParameterType=false
+# pyright: reportUnknownArgumentType=false
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+
+from fastapi import Request, Response
+
+from api.services.conditional import conditional, etag_matches, make_etag, versioned_etag
+from api.services.metrics import metrics
+
+
+def make_request(path: str, query: str = "", headers: dict[str, str] | None = None) -> Request:
+    raw_headers = [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    return Request(
+        {"type": "http", "method": "GET", "path": path, "query_string": query.encode(), "headers": raw_headers}
+    )
+
+
+def test_etag_matching_is_weak():
+    """Test that If-None-Match lists, weak tags and * all match"""
+    etag = make_etag("post", 1, 3)
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_versioned_etag_ignores_query_order():
+    """Test that equivalent queries get the same tag and a new version a different one"""
+    first = versioned_etag(make_request("/api/v1/posts", "limit=5&fields=id"), 3)
+
+    assert versioned_etag(make_request("/api/v1/posts", "fields=id&limit=5"), 3) == first
+    assert versioned_etag(make_request("/api/v1/posts", "fields=id&limit=5"), 4) != first
+
+
+def test_content_tagged_revalidation_is_not_modified():
+    """Test that a response tagged by its body answers a matching revalidation with 304"""
+    etag = conditional(make_request("/"), Response(b"body")).headers["etag"]
+
+    response = conditional(make_request("/", headers={"If-None-Match": etag}), Response(b"body"))
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert metrics.get("conditional.not_modified") == 1
@@ -0,0 +1,135 @@
+# pyright: reportUnknownVariableType=false
+# pyright: reportMissingParameterType=false
+# pyright: reportUnknownParameterType=false
+# pyright: reportUnknownArgumentType=false
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel
+
+from api.models.post import Post
+from api.services.entity_cache import EntityCache
+from api.services.metrics import metrics
+from api.services.repositories.posts_repository import PostsRepository
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def cache(clock):
+    return EntityCache(Post, max_entries=2, ttl=10, negative_ttl=1, clock=clock)
+
+
+@pytest_asyncio.fixture
+async def test_session():
+    """Create a test database session"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield session
+
+
+def loader(rows):
+    calls = []
+
+    async def load(key):
+        calls.append(key)
+        return rows.get(key)
+
+    return load, calls
+
+
+@pytest.mark.asyncio
+async def test_hits_are_fresh_copies(cache):
+    """Test that hits skip the load and cannot be changed through what an earlier caller got"""
+    load, calls = loader({1: Post(id=1, title="Cached", body="Body", is_published=True)})
+
+    first = await cache.get_or_load(1, lambda: load(1))
+    second = await cache.get_or_load(1, lambda: load(1))
+    second.title = "Mutated"
+    third = await cache.get_or_load(1, lambda: load(1))
+
+    assert calls == [1]
+    assert second is not first and third is not second
+    assert third.title == "Cached"
+    assert metrics.get("post_cache.misses") == 1
+    assert metrics.get("post_cache.hits") == 2
+
+
+@pytest.mark.asyncio
+async def test_missing_rows_are_cached_briefly(cache, clock):
+    """Test that a 404 is remembered for the negative TTL only"""
+    load, calls = loader({})
+
+    assert await cache.get_or_load(7, lambda: load(7)) is None
+    assert await cache.get_or_load(7, lambda: load(7)) is None
+    clock.now = 2
+    assert await cache.get_or_load(7, lambda: load(7)) is None
+
+    assert calls == [7, 7]
+    assert metrics.get("post_cache.expirations") == 1
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_entry_is_evicted(cache):
+    """Test that the cache holds at most max_entries rows"""
+    rows = {key: Post(id=key, title=f"Post {key}", body="Body", is_published=True) for key in (1, 2, 3)}
+    load, calls = loader(rows)
+
+    for key in (1, 2, 1, 3):
+        await cache.get_or_load(key, lambda key=key: load(key))
+    await cache.get_or_load(1, lambda: load(1))
+    await cache.get_or_load(2, lambda: load(2))
+
+    assert len(cache) == 2
+    assert calls == [1, 2, 3, 2]
+    assert metrics.get("post_cache.evictions") == 2
+
+
+@pytest.mark.asyncio
+async def test_load_overlapping_an_invalidation_is_not_stored(cache):
+    """Test that a read racing a write cannot cache the row it read before the write"""
+    stale = Post(id=1, title="Before", body="Body", is_published=True)
+
+    async def load_during_write():
+        cache.invalidate(1)
+        return stale
+
+    assert await cache.get_or_load(1, load_during_write) is stale
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_repository_writes_invalidate_cached_posts(test_session, clock):
+    """Test that create, update and delete through any repository drop the cached post"""
+    cache = EntityCache(Post, clock=clock)
+    reader = PostsRepository(test_session, cache=cache)
+    writer = PostsRepository(test_session, autocommit=False)
+
+    assert await reader.find_post(1) is None  # Cached as missing
+    created = await writer.create_post(Post(title="New", body="Body", is_published=True))
+    await writer.commit()
+    assert (await reader.find_post(created.id)).title == "New"
+
+    await writer.update_post(created.id, Post(title="Updated"))
+    await writer.commit()
+    assert (await reader.find_post(created.id)).title == "Updated"
+
+    await writer.delete_post(created.id)
+    await writer.commit()
+    assert await reader.find_post(created.id) is None
@@ -0,0 +1,46 @@
+# pyright: reportUnknownVariableType=false
+# pyright: reportMissingParameterType=false
+# pyright: reportUnknownParameterType=false
+# pyright: reportUnknownArgumentType=false
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+
+from api.models.post import Post
+from api.services.excerpts import EXCERPT_LENGTH, make_excerpt, refresh_excerpt
+
+
+def test_short_body_is_kept_with_whitespace_collapsed():
+    """Test that short bodies are used as-is apart from whitespace"""
+    assert make_excerpt("  Hello\n\n  world\t!  ") == "Hello world !"
+
+
+def test_long_body_is_cut_on_a_word_boundary():
+    """Test that long bodies are truncated between words with an ellipsis"""
+    excerpt = make_excerpt("lorem ipsum " * 100)
+
+    assert len(excerpt) <= EXCERPT_LENGTH
+    assert excerpt.endswith("…")
+    assert excerpt[:-1].split(" ")[-1] in {"lorem", "ipsum"}
+
+
+def test_long_single_word_is_hard_cut():
+    """Test that a body without spaces still fits the excerpt length"""
+    excerpt = make_excerpt("x" * 1000)
+
+    assert len(excerpt) == EXCERPT_LENGTH
+    assert excerpt.endswith("…")
+
+
+def test_refresh_excerpt_when_body_changes():
+    """Test that update data setting a body gets a fresh excerpt"""
+    update_data = Post(body="New body", excerpt="stale")
+
+    assert refresh_excerpt(update_data, {"id"}) == {"id"}
+    assert update_data.excerpt == "New body"
+
+
+def test_refresh_excerpt_ignores_client_excerpt_without_body():
+    """Test that an excerpt sent without a body is excluded from the update"""
+    update_data = Post(title="New title", excerpt="made up")
+
+    assert refresh_excerpt(update_data, {"id"}) == {"id", "excerpt"}
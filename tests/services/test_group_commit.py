@@ -0,0 +1,101 @@
+# pyright: reportUnknownVariableType=false
+# pyright: reportMissingParameterType=false
+# pyright: reportUnknownParameterType=false
+# pyright: reportUnknownArgumentType=false
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+
+import asyncio
+
+import pytest
+
+from api.services.group_commit import GroupCommitter
+from api.services.metrics import metrics
+
+
+class FakeStore:
+    """Assigns increasing IDs, recording each commit; rejects negative items"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.commits: list[list[int]] = []
+        self.next_id = 1
+
+    async def commit(self, items):
+        await asyncio.sleep(self.delay)
+        if any(item < 0 for item in items):
+            raise ValueError("negative item")
+        self.commits.append(list(items))
+        ids = list(range(self.next_id, self.next_id + len(items)))
+        self.next_id += len(items)
+        return ids
+
+
+@pytest.mark.asyncio
+async def test_concurrent_submits_share_one_commit():
+    """Test that items submitted within the window are committed together, each getting its own result"""
+    store = FakeStore()
+    committer = GroupCommitter(store.commit, window=0.01, max_items=100)
+
+    ids = await asyncio.gather(*(committer.submit(item) for item in [10, 20, 30]))
+
+    assert ids == [1, 2, 3]
+    assert store.commits == [[10, 20, 30]]
+    assert metrics.get("group_commit.groups") == 1
+    assert metrics.get("group_commit.items") == 3
+
+
+@pytest.mark.asyncio
+async def test_max_items_ends_the_window_early():
+    """Test that a full group is committed without waiting out the window"""
+    store = FakeStore()
+    committer = GroupCommitter(store.commit, window=60, max_items=2)
+
+    ids = await asyncio.wait_for(asyncio.gather(committer.submit(1), committer.submit(2)), timeout=1)
+
+    assert ids == [1, 2]
+    assert store.commits == [[1, 2]]
+
+
+@pytest.mark.asyncio
+async def test_items_arriving_during_a_commit_form_the_next_group():
+    """Test that only one group commits at a time, while the next one fills up"""
+    store = FakeStore(delay=0.05)
+    committer = GroupCommitter(store.commit, window=0.001, max_items=100)
+
+    first = asyncio.ensure_future(committer.submit(1))
+    await asyncio.sleep(0.02)
+    rest = [asyncio.ensure_future(committer.submit(item)) for item in [2, 3, 4]]
+
+    assert await asyncio.gather(first, *rest) == [1, 2, 3, 4]
+    assert store.commits == [[1], [2, 3, 4]]
+
+
+@pytest.mark.asyncio
+async def test_failed_group_is_retried_item_by_item():
+    """Test that one bad item fails only its own caller"""
+    store = FakeStore()
+    committer = GroupCommitter(store.commit, window=0.01, max_items=100)
+
+    results = await asyncio.gather(*(committer.submit(item) for item in [1, -1, 2]), return_exceptions=True)
+
+    assert results[0] == 1
+    assert isinstance(results[1], ValueError)
+    assert results[2] == 2
+    assert store.commits == [[1], [2]]
+    assert metrics.get("group_commit.fallbacks") == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_callers_are_left_out():
+    """Test that an item whose caller gave up before its group was written is not committed"""
+    store = FakeStore()
+    committer = GroupCommitter(store.commit, window=0.01, max_items=100)
+
+    cancelled = asyncio.ensure_future(committer.submit(1))
+    kept = asyncio.ensure_future(committer.submit(2))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    assert await kept == 1
+    assert store.commits == [[2]]
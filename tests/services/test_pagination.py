@@ -0,0 +1,53 @@
+# pyright: reportUnknownVariableType=false
+# pyright: reportMissingParameterType=false
+# pyright: reportUnknownParameterType=false
+# pyright: reportUnknownArgumentType=false
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+
+import pytest
+
+from api.models.post import Post
+from api.services.pagination import (
+    InvalidCursorError,
+    PageRequest,
+    build_page,
+    decode_cursor,
+    encode_cursor,
+)
+
+
+def test_cursor_round_trip():
+    """Test that an encoded cursor decodes back to the same id"""
+    cursor = encode_cursor(12345)
+    assert decode_cursor(cursor) == 12345
+    # Cursors are URL safe without escaping
+    assert "=" not in cursor
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_cursor(1)[:-2], "eyJpZCI6ICJ4In0", "eyJpZCI6dHJ1ZX0"])
+def test_decode_invalid_cursor(cursor):
+    """Test that malformed or tampered cursors are rejected"""
+    with pytest.raises(InvalidCursorError):
+        _ = decode_cursor(cursor)
+
+
+def test_build_page_with_more_rows():
+    """Test that the extra row is dropped and produces a cursor"""
+    rows = [Post(id=i, title=f"Post {i}", body="", is_published=True) for i in (1, 2, 3)]
+
+    page = build_page(rows, PageRequest(limit=2))
+
+    assert [post.id for post in page.items] == [1, 2]
+    assert page.next_cursor is not None
+    assert decode_cursor(page.next_cursor) == 2
+
+
+def test_build_page_last_page():
+    """Test that the last page has no cursor"""
+    rows = [Post(id=i, title=f"Post {i}", body="", is_published=True) for i in (1, 2)]
+
+    page = build_page(rows, PageRequest(limit=2))
+
+    assert len(page.items) == 2
+    assert page.next_cursor is None
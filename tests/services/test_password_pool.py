@@ -0,0 +1,81 @@
+# pyright: reportUnknownVariableType=false
+# pyright: reportMissingParameterType=false
+# pyright: reportUnknownParameterType=false
+# pyright: reportUnknownArgumentType=false
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+
+import asyncio
+import threading
+
+import pytest
+import pytest_asyncio
+from fastapi.security import OAuth2PasswordRequestForm
+from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel
+
+from api.models.user import User
+from api.schemas.user import UserCreate, UserUpdate
+from api.services.metrics import metrics
+from api.services.password_pool import PasswordPool
+from api.setup.auth import UserManager
+
+FIRST_PASSWORD = "first-password"  # noqa: S105
+SECOND_PASSWORD = "second-password"  # noqa: S105
+
+
+@pytest_asyncio.fixture
+async def user_manager():
+    """A user manager over an in-memory database"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield UserManager(SQLAlchemyUserDatabase(session, User))
+
+
+@pytest.mark.asyncio
+async def test_calls_run_off_the_event_loop():
+    """Test that calls run on pool threads, and queue once every thread is busy"""
+    pool = PasswordPool(max_workers=1)
+    release = threading.Event()
+
+    first = asyncio.create_task(pool.run(release.wait))
+    await asyncio.sleep(0.01)
+    second = asyncio.create_task(pool.run(threading.current_thread))
+    await asyncio.sleep(0.01)
+    release.set()
+
+    assert await first is True
+    assert (await second).name.startswith("password")
+    assert metrics.get("password_pool.calls") == 2
+    assert metrics.get("password_pool.queued") == 1
+    assert metrics.get("password_pool.wait_ms") >= 10
+
+
+@pytest.mark.asyncio
+async def test_zero_workers_runs_inline():
+    """Test that a pool without threads calls straight through"""
+    assert await PasswordPool(max_workers=0).run(threading.current_thread) is threading.current_thread()
+
+
+@pytest.mark.asyncio
+async def test_user_manager_hashes_through_the_pool(user_manager):
+    """Test that registering, logging in and changing a password all go through the pool"""
+    user = await user_manager.create(UserCreate(email="pooled@example.com", password=FIRST_PASSWORD))
+    logged_in = await user_manager.authenticate(
+        OAuth2PasswordRequestForm(username="pooled@example.com", password=FIRST_PASSWORD)
+    )
+    await user_manager.update(UserUpdate(password=SECOND_PASSWORD), user)
+    rejected = await user_manager.authenticate(
+        OAuth2PasswordRequestForm(username="pooled@example.com", password=FIRST_PASSWORD)
+    )
+    unknown = await user_manager.authenticate(
+        OAuth2PasswordRequestForm(username="nobody@example.com", password=FIRST_PASSWORD)
+    )
+
+    assert logged_in.id == user.id
+    assert rejected is None
+    assert unknown is None
+    assert metrics.get("password_pool.calls") == 5
@@ -0,0 +1,80 @@
+# pyright: reportUnknownVariableType=false
+# pyright: reportMissingParameterType=false
+# pyright: reportUnknownParameterType=false
+# pyright: reportUnknownArgumentType=false
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+
+import time
+from contextlib import contextmanager
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+
+from api.services.metrics import metrics
+from api.services.query_budget import QueryBudget, StatementCancelledError, StatementTimeoutError, current_budget
+from api.setup.database import create_database_engine
+
+# Counts to ten million, seconds of virtual machine steps: long enough to be
+# interrupted, yet finishing (and failing the test) should nothing interrupt it
+LONG = text("WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n LIMIT 10000000) SELECT count(*) FROM n")
+ROWS = text("WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n LIMIT :rows) SELECT x FROM n")
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_database_engine(f"sqlite+aiosqlite:///{tmp_path / 'app.sqlite'}")
+    yield engine
+    await engine.dispose()
+
+
+@contextmanager
+def budget_of(timeout: float | None):
+    budget = QueryBudget(lambda: timeout)
+    token = current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        current_budget.reset(token)
+
+
+@pytest.mark.asyncio
+async def test_sqlite_statement_past_its_budget_is_interrupted(engine):
+    """Test that a runaway statement stops at its budget, and the connection stays usable"""
+    async with engine.connect() as connection:
+        with budget_of(0.05):
+            started = time.perf_counter()
+            with pytest.raises(StatementTimeoutError, match=r"0\.05s budget"):
+                await connection.execute(LONG)
+            assert time.perf_counter() - started < 1
+            assert (await connection.execute(text("SELECT 1"))).scalar() == 1
+
+    assert metrics.get("db.statement_timeouts") == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_budget_interrupts_statements(engine):
+    """Test that statements of an abandoned request fail as cancelled rather than timed out"""
+    async with engine.connect() as connection:
+        with budget_of(None) as budget:
+            budget.cancel()
+            with pytest.raises(StatementCancelledError):
+                await connection.execute(LONG)
+
+    assert metrics.get("db.statement_cancellations") == 1
+
+
+@pytest.mark.asyncio
+async def test_streams_are_only_timed_until_their_first_row(engine):
+    """Test that a stream outlasting the budget is read to the end, while the same rows buffered time out"""
+    async with engine.connect() as connection:
+        with budget_of(0.02):
+            rows = [row.x async for row in await connection.stream(ROWS, {"rows": 50_000})]
+            assert len(rows) == 50_000
+            with pytest.raises(StatementTimeoutError):
+                await connection.execute(ROWS, {"rows": 50_000})
+        # Outside a request nothing is timed
+        assert len((await connection.execute(ROWS, {"rows": 50_000})).all()) == 50_000
+
+    assert metrics.get("db.statement_timeouts") == 1
@@ -0,0 +1,82 @@
+# pyright: reportUnknownVariableType=false
+# pyright: reportMissingParameterType=false
+# pyright: reportUnknownParameterType=false
+# pyright: reportUnknownArgumentType=false
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from api.services.metrics import metrics
+from api.services.replicas import RecentWrites, ReplicaSet
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_reads_rotate_over_replicas_and_fall_back_to_the_primary():
+    """Test round-robin choice, skipping a failed replica until it may be retried"""
+    clock = FakeClock()
+    primary, first, second = (create_async_engine("sqlite+aiosqlite://") for _ in range(3))
+    replicas = ReplicaSet(primary, [first, second], retry_after=30, clock=clock)
+
+    assert [replicas.choose() for _ in range(3)] == [first, second, first]
+
+    replicas.mark_down(second)
+    assert [replicas.choose() for _ in range(2)] == [first, first]
+
+    replicas.mark_down(first)
+    assert replicas.choose() is primary
+    assert metrics.get("replicas.fallbacks") == 1
+
+    clock.now = 30
+    assert {replicas.choose(), replicas.choose()} == {first, second}
+
+
+@pytest.mark.asyncio
+async def test_replica_that_fails_to_connect_is_taken_out_of_rotation(tmp_path):
+    """Test that a connection failure marks the replica down, while statement errors do not"""
+    primary = create_async_engine("sqlite+aiosqlite://")
+    unreachable = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'replica.sqlite'}")
+    healthy = create_async_engine("sqlite+aiosqlite://")
+    replicas = ReplicaSet(primary, [unreachable, healthy])
+
+    with pytest.raises(OperationalError):
+        async with healthy.connect() as connection:
+            await connection.execute(text("SELECT * FROM missing_table"))
+    with pytest.raises(OperationalError):
+        async with unreachable.connect():
+            pass
+
+    assert metrics.get("replicas.failures") == 1
+    assert [replicas.choose() for _ in range(3)] == [healthy, healthy, healthy]
+    await healthy.dispose()
+
+
+def test_recent_writes_expire_after_the_window():
+    """Test that a client's write is remembered for the window only, and the oldest clients are evicted"""
+    clock = FakeClock()
+    recent_writes = RecentWrites(window=5, max_entries=2, clock=clock)
+
+    recent_writes.mark("alice-token")
+    clock.now = 4.9
+    assert recent_writes.is_recent("alice-token")
+    assert not recent_writes.is_recent("bob-token")
+
+    clock.now = 5
+    assert not recent_writes.is_recent("alice-token")
+
+    recent_writes.mark("alice-token")
+    recent_writes.mark("bob-token")
+    recent_writes.mark("carol-token")
+    assert not recent_writes.is_recent("alice-token")
+    assert recent_writes.is_recent("carol-token")
@@ -0,0 +1,92 @@
+# pyright: reportUnknownVariableType=false
+# pyright: reportMissingParameterType=false
+# pyright: reportUnknownParameterType=false
+# pyright: reportUnknownArgumentType=false
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+
+import pytest
+from fastapi import Response
+
+from api.services.metrics import metrics
+from api.services.response_cache import (
+    MemoryResponseStore,
+    ResponseCache,
+    SQLiteResponseStore,
+    create_response_store,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    return create_response_store(request.param, max_bytes=10, path=str(tmp_path / "cache.sqlite"))
+
+
+@pytest.mark.asyncio
+async def test_store_is_bounded_by_bytes(store):
+    """Test that the oldest entries go once the byte budget is exceeded"""
+    await store.set("a", b"1234")
+    await store.set("b", b"5678")
+    await store.set("c", b"90ab")
+    await store.set("huge", b"x" * 11)
+
+    assert await store.get("a") is None
+    assert await store.get("b") == b"5678"
+    assert await store.get("c") == b"90ab"
+    assert await store.get("huge") is None
+    assert await store.usage() == (2, 8)
+    assert metrics.get("response_cache.evictions") == 1
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_is_shared_through_its_file(tmp_path):
+    """Test that stores opened on the same file (as in separate workers) see each other's entries"""
+    path = str(tmp_path / "cache.sqlite")
+    writer, reader = SQLiteResponseStore(path), SQLiteResponseStore(path)
+
+    await writer.set("key", b"body")
+
+    assert await reader.get("key") == b"body"
+    await reader.clear()
+    assert await writer.usage() == (0, 0)
+
+
+def test_unknown_backend_is_rejected():
+    """Test that a misspelt backend fails at startup rather than silently not caching"""
+    with pytest.raises(ValueError, match="Unknown response cache backend"):
+        create_response_store("redis", max_bytes=10, path="unused")
+
+
+@pytest.mark.asyncio
+async def test_fetch_renders_once_per_key():
+    """Test that a key is rendered on the first request and served from the store after"""
+    cache = ResponseCache(MemoryResponseStore())
+    renders = 0
+
+    async def render():
+        nonlocal renders
+        renders += 1
+        return Response(b'{"items":[]}', media_type="application/json")
+
+    first = await cache.fetch('"v1"', render)
+    second = await cache.fetch('"v1"', render)
+    stats = await cache.stats()
+
+    assert renders == 1
+    assert second.body == first.body
+    assert second.media_type == "application/json"
+    assert (stats.hits, stats.misses, stats.hit_ratio) == (1, 1, 0.5)
+    assert (stats.entries, stats.bytes) == (1, len(first.body))
+
+
+@pytest.mark.asyncio
+async def test_fetch_does_not_store_failures():
+    """Test that only successful responses are cached"""
+    cache = ResponseCache(MemoryResponseStore())
+
+    async def render():
+        return Response(b"error", status_code=500)
+
+    await cache.fetch("key", render)
+
+    assert await cache.store.get("key") is None
@@ -0,0 +1,49 @@
+# pyright: reportUnknownVariableType=false
+# pyright: reportMissingParameterType=false
+# pyright: reportUnknownParameterType=false
+# pyright: reportUnknownArgumentType=false
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+
+import json
+import uuid
+
+from api.models.post import Post
+from api.schemas.pagination import Page
+from api.schemas.post import PostRead
+from api.services.responses import FastJSONResponse
+
+
+def test_table_rows_are_encoded_directly():
+    """Test that table models are encoded without building read schemas"""
+    user_id = uuid.uuid4()
+    posts = [Post(id=1, title="First", body="Body", excerpt="Body", is_published=True, user_id=user_id)]
+
+    items = PostRead.from_posts(posts)
+    response = FastJSONResponse(Page(items=items, next_cursor="abc"))
+
+    assert items is posts
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == {
+        "items": [
+            {
+                "id": 1,
+                "title": "First",
+                "body": "Body",
+                "excerpt": "Body",
+                "is_published": True,
+                "version": 0,
+                "user_id": str(user_id),
+            }
+        ],
+        "next_cursor": "abc",
+    }
+
+
+def test_sparse_read_models_omit_unrequested_fields():
+    """Test that read schemas built for fields= only carry the requested fields"""
+    posts = [Post(id=1, title="First", body="Body", excerpt="Body", is_published=True)]
+
+    response = FastJSONResponse(PostRead.from_posts(posts, fields=frozenset({"id", "title"})))
+
+    assert json.loads(response.body) == [{"id": 1, "title": "First"}]
@@ -0,0 +1,138 @@
+# pyright: reportUnknownVariableType=false
+# pyright: reportMissingParameterType=false
+# pyright: reportUnknownParameterType=false
+# pyright: reportUnknownArgumentType=false
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+
+import asyncio
+import uuid
+from unittest.mock import create_autospec
+
+import httpx
+import pytest
+
+from api.models.post import Post
+from api.services.metrics import metrics
+from api.services.repositories.posts_repository import PostsRepository
+from api.services.singleflight import SingleFlight
+from api.setup.app import app
+from api.setup.dependencies import get_posts_reader
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    """Test that callers with the same key share the leader's result"""
+    flight: SingleFlight[str, int] = SingleFlight("test")
+    calls = 0
+    release = asyncio.Event()
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return 42
+
+    waiting = [asyncio.ensure_future(flight.do("key", compute)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*waiting) == [42] * 5
+    assert calls == 1
+    assert metrics.get("test.leaders") == 1
+    assert metrics.get("test.coalesced") == 4
+
+
+@pytest.mark.asyncio
+async def test_different_keys_and_sequential_calls_are_not_shared():
+    """Test that only concurrent calls with the same key are coalesced"""
+    flight: SingleFlight[str, str] = SingleFlight("test")
+    calls: list[str] = []
+
+    async def compute(key):
+        calls.append(key)
+        return key
+
+    results = await asyncio.gather(flight.do("a", lambda: compute("a")), flight.do("b", lambda: compute("b")))
+
+    assert results == ["a", "b"]
+    assert await flight.do("a", lambda: compute("a")) == "a"
+    assert calls == ["a", "b", "a"]
+    assert metrics.get("test.coalesced") == 0
+
+
+@pytest.mark.asyncio
+async def test_exception_is_shared_with_followers():
+    """Test that followers see the leader's exception"""
+    flight: SingleFlight[str, int] = SingleFlight("test")
+    calls = 0
+
+    async def fail():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0)
+        raise LookupError("missing")
+
+    results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+
+    assert all(isinstance(result, LookupError) for result in results)
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_followers_fall_back_when_leader_is_cancelled():
+    """Test that a cancelled leader does not fail the requests waiting on it"""
+    flight: SingleFlight[str, int] = SingleFlight("test")
+    calls = 0
+    release = asyncio.Event()
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return calls
+
+    leader = asyncio.ensure_future(flight.do("key", compute))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flight.do("key", compute))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await follower == 2
+    assert leader.cancelled()
+    assert metrics.get("test.fallbacks") == 1
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_gets_hit_the_repository_once():
+    """Test that the posts router coalesces identical concurrent GET requests"""
+    repository = create_autospec(PostsRepository, spec_set=True, instance=True)
+    release = asyncio.Event()
+
+    async def find_post(post_id, expand):
+        await release.wait()
+        return Post(id=post_id, title="Shared", body="Body", is_published=True, user_id=uuid.uuid4())
+
+    repository.find_post.side_effect = find_post
+    app.dependency_overrides[get_posts_reader] = lambda: repository
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            requests = [asyncio.ensure_future(client.get("/api/v1/posts/1")) for _ in range(3)]
+            other = asyncio.ensure_future(client.get("/api/v1/posts/2"))
+            while repository.find_post.await_count < 2:
+                await asyncio.sleep(0)
+            release.set()
+            responses = await asyncio.gather(*requests)
+            other_response = await other
+    finally:
+        app.dependency_overrides.clear()
+
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert {response.json()["title"] for response in responses} == {"Shared"}
+    assert other_response.json()["id"] == 2
+    assert repository.find_post.await_count == 2
+    assert metrics.get("singleflight.coalesced") == 2
@@ -0,0 +1,136 @@
+# pyright: reportUnknownVariableType=false
+# pyright: reportMissingParameterType=false
+# pyright: reportUnknownParameterType=false
+# pyright: reportUnknownArgumentType=false
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+
+import pytest
+import pytest_asyncio
+from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel
+
+from api.models.user import User
+from api.schemas.user import UserUpdate
+from api.services.metrics import metrics
+from api.services.token_cache import CachedJWTStrategy, TokenCache
+from api.setup.auth import UserManager, token_cache
+
+SECRET = "test-secret-that-is-long-enough-for-hs256"  # noqa: S105
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest_asyncio.fixture
+async def user_manager():
+    """A user manager over an in-memory database"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield UserManager(SQLAlchemyUserDatabase(session, User))
+
+
+@pytest.fixture
+def statements(user_manager):
+    """Record every SQL statement executed through the user manager's session"""
+    executed: list[str] = []
+
+    def record(_conn, _cursor, statement, _parameters, _context, _executemany):
+        executed.append(statement)
+
+    sync_engine = user_manager.user_db.session.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(sync_engine, "before_cursor_execute", record)
+
+
+@pytest_asyncio.fixture
+async def user(user_manager):
+    return await user_manager.user_db.create({"email": "reader@example.com", "hashed_password": "x"})
+
+
+@pytest.fixture
+def strategy():
+    """The app's strategy setup, over the cache the user manager invalidates"""
+    token_cache.clear()
+    yield CachedJWTStrategy(secret=SECRET, lifetime_seconds=3600, cache=token_cache)
+    token_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_repeated_token_skips_the_user_query(strategy, user_manager, user, statements):
+    """Test that a token is resolved with one query, then from the cache"""
+    token = await strategy.write_token(user)
+    statements.clear()
+
+    first = await strategy.read_token(token, user_manager)
+    second = await strategy.read_token(token, user_manager)
+
+    assert first.id == second.id == user.id
+    assert len(statements) == 1
+    assert metrics.get("token_cache.misses") == 1
+    assert metrics.get("token_cache.hits") == 1
+
+
+@pytest.mark.asyncio
+async def test_invalid_tokens_resolve_to_nobody(strategy, user_manager):
+    """Test that tokens that do not decode are rejected and not cached"""
+    assert await strategy.read_token(None, user_manager) is None
+    assert await strategy.read_token("not-a-jwt", user_manager) is None
+    assert len(strategy.cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_cached_user_can_be_updated(strategy, user_manager, user):
+    """Test that a user from the cache is attached to the session, and updating it invalidates the cache"""
+    token = await strategy.write_token(user)
+    await strategy.read_token(token, user_manager)
+    user_manager.user_db.session.expunge_all()
+
+    cached = await strategy.read_token(token, user_manager)
+    await user_manager.update(UserUpdate(is_active=False), cached)
+    reloaded = await strategy.read_token(token, user_manager)
+
+    assert reloaded.is_active is False
+    assert metrics.get("token_cache.invalidations") == 1
+    assert metrics.get("token_cache.misses") == 2
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_with_their_token(clock, user_manager, user):
+    """Test that an entry lasts no longer than the TTL or the token's expiry, whichever is sooner"""
+    cache = TokenCache(ttl=60, clock=clock, wall_clock=clock)
+    short_lived = CachedJWTStrategy(secret=SECRET, lifetime_seconds=10, cache=cache)
+    token = await short_lived.write_token(user)
+
+    cache.put(token, user, expires=clock.now + 10, generation=cache.generation)
+    clock.now += 11
+
+    assert cache.get(token) is None
+    assert metrics.get("token_cache.expirations") == 1
+
+
+def test_loads_overlapping_an_invalidation_are_not_stored(clock):
+    """Test that a user read before an invalidation cannot be cached after it"""
+    cache = TokenCache(clock=clock, wall_clock=clock)
+    user = User(email="a@example.com", hashed_password="x")  # noqa: S106
+    generation = cache.generation
+
+    cache.invalidate_user(user.id)
+    cache.put("token", user, expires=None, generation=generation)
+
+    assert cache.get("token") is None
@@ -0,0 +1,96 @@
+# pyright: reportUnknownVariableType=false
+# pyright: reportMissingParameterType=false
+# pyright: reportUnknownParameterType=false
+# pyright: reportUnknownArgumentType=false
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+import pytest_asyncio
+from fastapi_users.password import PasswordHelper
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel, select
+
+from api.models.user import User
+from api.services.user_import import import_users, read_rows
+
+
+@pytest_asyncio.fixture
+async def session_maker(tmp_path):
+    """Sessions on a database file, so each batch's session sees the others' writes"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'users.sqlite'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def all_users(session_maker) -> dict[str, User]:
+    async with session_maker() as session:
+        return {user.email: user for user in (await session.execute(select(User))).scalars()}
+
+
+@pytest.mark.asyncio
+async def test_import_csv_skips_duplicates_and_invalid_rows(session_maker, tmp_path):
+    """Test that valid rows are created in batches while duplicates and invalid rows are reported"""
+    async with session_maker() as session:
+        session.add(User(email="taken@example.com", hashed_password="existing"))  # noqa: S106
+        await session.commit()
+    file = tmp_path / "users.csv"
+    file.write_text(
+        "email,password,is_superuser\n"
+        "ada@example.com,first-secret,true\n"
+        "TAKEN@example.com,second-secret,\n"
+        "not-an-email,third-secret,\n"
+        "grace@example.com,fourth-secret,\n"
+        "Ada@example.com,fifth-secret,\n"
+        "linus@example.com,sixth-secret,\n"
+    )
+
+    with ThreadPoolExecutor(2) as executor:
+        report = await import_users(read_rows(file), session_maker, executor, workers=2, batch_size=2)
+    users = await all_users(session_maker)
+
+    assert (report.created, report.duplicates, report.rows) == (3, 2, 6)
+    assert [line for line, _ in report.invalid] == [4]
+    assert set(users) == {"taken@example.com", "ada@example.com", "grace@example.com", "linus@example.com"}
+    assert users["ada@example.com"].is_superuser is True
+    assert users["grace@example.com"].is_superuser is False
+    assert PasswordHelper().verify_and_update("fourth-secret", users["grace@example.com"].hashed_password)[0]
+
+
+@pytest.mark.asyncio
+async def test_import_ndjson_reports_malformed_lines(session_maker, tmp_path):
+    """Test that NDJSON lines are imported and a malformed line only skips that line"""
+    file = tmp_path / "users.ndjson"
+    file.write_text(
+        json.dumps({"email": "ada@example.com", "password": "secret", "is_verified": True})
+        + "\n{not json\n\n"
+        + json.dumps({"email": "grace@example.com", "password": "secret"})
+        + "\n"
+    )
+
+    with ThreadPoolExecutor(1) as executor:
+        report = await import_users(read_rows(file), session_maker, executor, workers=1)
+    users = await all_users(session_maker)
+
+    assert report.created == 2
+    assert [line for line, _ in report.invalid] == [2]
+    assert users["ada@example.com"].is_verified is True
+
+
+@pytest.mark.asyncio
+async def test_import_hashes_in_worker_processes(session_maker, tmp_path):
+    """Test that hashing works from spawned processes, as the CLI runs it"""
+    file = tmp_path / "users.jsonl"
+    file.write_text(json.dumps({"email": "ada@example.com", "password": "secret"}) + "\n")
+
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        report = await import_users(read_rows(file), session_maker, executor, workers=1)
+
+    assert report.created == 1
+    assert (await all_users(session_maker))["ada@example.com"].hashed_password.startswith("$argon2")
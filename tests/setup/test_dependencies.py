@@ -0,0 +1,53 @@
+# pyright: reportUnknownVariableType=false
+# pyright: reportMissingParameterType=false
+# pyright: reportUnknownParameterType=false
+# pyright: reportUnknownArgumentType=false
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.requests import Request
+
+from api.services.replicas import RecentWrites, ReplicaSet
+from api.setup import dependencies
+from api.setup.database import async_session_maker, engine
+
+
+def request_with_cookie(cookie: str | None) -> Request:
+    headers = [(b"cookie", f"auth={cookie}".encode())] if cookie else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+@asynccontextmanager
+async def session_from(dependency, request):
+    generator = dependency(request)
+    try:
+        yield await generator.__anext__()
+    finally:
+        await generator.aclose()
+
+
+@pytest.mark.asyncio
+async def test_reads_stick_to_the_primary_after_a_clients_write(monkeypatch):
+    """Test that a committed write sends that client's reads, and only its reads, to the primary"""
+    replica = create_async_engine("sqlite+aiosqlite://")
+    monkeypatch.setattr(dependencies, "replicas", ReplicaSet(engine, [replica]))
+    monkeypatch.setattr(dependencies, "recent_writes", RecentWrites(window=60))
+
+    async with session_from(dependencies.get_read_session, request_with_cookie("writer-token")) as session:
+        assert session.bind is replica
+
+    async with session_from(dependencies.get_write_session, request_with_cookie("writer-token")) as session:
+        assert session.bind is async_session_maker.kw["bind"]
+        await session.commit()
+
+    async with session_from(dependencies.get_read_session, request_with_cookie("writer-token")) as session:
+        assert session.bind is engine
+    async with session_from(dependencies.get_read_session, request_with_cookie("other-token")) as session:
+        assert session.bind is replica
+    async with session_from(dependencies.get_read_session, request_with_cookie(None)) as session:
+        assert session.bind is replica
+    await replica.dispose()
@@ -0,0 +1,160 @@
+# pyright: reportUnknownVariableType=false
+# pyright: reportMissingParameterType=false
+# pyright: reportUnknownParameterType=false
+# pyright: reportUnknownArgumentType=false
+# pyright: reportAny=false
+# pyright: reportUnknownMemberType=false
+
+import asyncio
+import sqlite3
+
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, text
+from sqlalchemy.exc import OperationalError
+from sqlmodel import SQLModel, select
+
+from api.models.comment import Comment
+from api.models.post import Post
+from api.models.user import User
+from api.services.group_commit import GroupCommitter
+from api.services.metrics import metrics
+from api.services.repositories.comments_repository import CommentsRepository
+from api.services.repositories.posts_repository import PostsRepository
+from api.setup.app import app
+from api.setup.auth import current_user
+from api.setup.database import create_session_maker
+from api.setup.dependencies import get_comment_writer, get_comments_repository
+from api.setup.sqlite import create_sqlite_engines
+
+
+@pytest.fixture
+def database_path(tmp_path):
+    return tmp_path / "app.sqlite"
+
+
+@pytest_asyncio.fixture
+async def engines(database_path):
+    """Production profile engines with short lock waits"""
+    writer, reader = create_sqlite_engines(
+        f"sqlite+aiosqlite:///{database_path}", readers=2, busy_timeout_ms=20, retries=2, backoff_ms=20
+    )
+    async with writer.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    yield writer, reader
+    await writer.dispose()
+    await reader.dispose()
+
+
+@pytest.fixture
+def session_maker(engines):
+    """Sessions that may write, on the writer"""
+    return create_session_maker(engines[0])
+
+
+@pytest.fixture
+def read_session_maker(engines):
+    """Sessions of read-only handlers, on the reader pool"""
+    return create_session_maker(engines[1])
+
+
+async def count_posts(session) -> int:
+    return (await session.execute(select(func.count()).select_from(Post))).scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_connections_use_the_production_pragmas(engines):
+    """Test that every connection runs in WAL mode, and reader connections are read-only"""
+    writer, reader = engines
+    async with reader.connect() as conn:
+        assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+        assert (await conn.execute(text("PRAGMA synchronous"))).scalar() == 1
+        assert (await conn.execute(text("PRAGMA busy_timeout"))).scalar() == 20
+        assert (await conn.execute(text("PRAGMA foreign_keys"))).scalar() == 1
+        assert (await conn.execute(text("PRAGMA query_only"))).scalar() == 1
+    async with writer.connect() as conn:
+        assert (await conn.execute(text("PRAGMA query_only"))).scalar() == 0
+
+
+@pytest.mark.asyncio
+async def test_write_sessions_read_inside_their_write_transaction(engines, database_path, session_maker):
+    """Test that a session that may write takes the write lock at its first read, and reads its own writes"""
+    writer, _reader = engines
+    async with session_maker() as session:
+        assert session.sync_session.get_bind(clause=select(Post)) is writer.sync_engine
+        assert await count_posts(session) == 0
+
+        other_process = sqlite3.connect(database_path, timeout=0, isolation_level=None)
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            other_process.execute("BEGIN IMMEDIATE")
+        other_process.close()
+
+        await PostsRepository(session, autocommit=False).create_post(Post(title="T", body="B", is_published=True))
+        assert await count_posts(session) == 1
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_reads_do_not_wait_for_an_open_write(session_maker, read_session_maker):
+    """Test that a reader sees the last committed state while a write transaction is open"""
+    async with session_maker() as writing, read_session_maker() as reading:
+        await PostsRepository(writing, autocommit=False).create_post(Post(title="T", body="B", is_published=True))
+
+        assert await asyncio.wait_for(count_posts(reading), timeout=1) == 0
+
+
+@pytest.mark.asyncio
+async def test_writes_retry_while_another_process_holds_the_lock(database_path, session_maker):
+    """Test that the writer backs off and retries, and gives up after the bounded number of retries"""
+    other_process = sqlite3.connect(database_path, isolation_level=None)
+    other_process.execute("BEGIN IMMEDIATE")
+    async with session_maker() as session:
+        with pytest.raises(OperationalError, match="locked"):
+            await PostsRepository(session).create_post(Post(title="T", body="B", is_published=True))
+    assert metrics.get("sqlite.write_retries") == 2
+    assert metrics.get("sqlite.write_lock_timeouts") == 1
+
+    asyncio.get_running_loop().call_later(0.03, other_process.execute, "ROLLBACK")
+    async with session_maker() as session:
+        await PostsRepository(session).create_post(Post(title="T", body="B", is_published=True))
+        assert await count_posts(session) == 1
+    assert metrics.get("sqlite.write_retries") >= 3
+    other_process.close()
+
+
+@pytest.mark.asyncio
+async def test_grouped_comments_leave_the_writer_free_for_their_group(session_maker):
+    """Test that comment requests hand the single writer connection back before their group commits"""
+    async with session_maker() as session:
+        user = User.model_validate({"email": "writer@example.com", "hashed_password": "x"})
+        post = Post(title="T", body="B", is_published=True, user_id=user.id)
+        session.add_all([user, post])
+        await session.commit()
+
+    async def commit_comments(comments):
+        async with session_maker() as session:
+            comments_repository = CommentsRepository(session, autocommit=False)
+            created_comments = await comments_repository.create_comments(comments)
+            await comments_repository.commit()
+            return created_comments
+
+    async def get_repository():
+        async with session_maker() as session:
+            yield CommentsRepository(session, autocommit=False)
+
+    comment_writer = GroupCommitter(commit_comments, window=0.002, max_items=100)
+    app.dependency_overrides[get_comments_repository] = get_repository
+    app.dependency_overrides[get_comment_writer] = lambda: comment_writer
+    app.dependency_overrides[current_user] = lambda: user
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            requests = (client.post("/api/v1/comments", json={"body": f"C{i}", "post_id": post.id}) for i in range(3))
+            responses = await asyncio.wait_for(asyncio.gather(*requests), timeout=5)
+    finally:
+        app.dependency_overrides.clear()
+
+    assert [response.status_code for response in responses] == [201, 201, 201]
+    async with session_maker() as session:
+        assert (await session.execute(select(func.count()).select_from(Comment))).scalar_one() == 3
+    assert metrics.get("db.pool_timeouts") == 0